@@ -0,0 +1,136 @@
+########################################################################################################################
+# batch_isochrones.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Creates isochrones (supply sheds) for every point in a point layer, such as the sawmills feature class,
+#          on the native road graph. Points are solved in parallel workers and every polygon is written to one
+#          GeoPackage layer keyed by the point's OBJECTID and break.
+# Usage: <road tile directory> <point layer> <output GeoPackage> <travel mode> <cutoffs> [<workers>] [<hull>]
+#        [<cache file>]
+#        cutoffs are separated by ';', in miles for Length and minutes for Time. hull is concave or convex. The
+#        isochrone cache defaults to isochrone_cache.sqlite in the tile directory.
+########################################################################################################################
+
+import sys, os, time
+from concurrent.futures import ProcessPoolExecutor
+from road_graph import TiledRoadGraph
+from service_area import ServiceAreaSolver, ServiceAreaError
+from geometry_utils import multipolygon_wkb
+from geopackage_writer import GeoPackageWriter
+from point_layers import read_points
+from isochrone_cache import IsochroneCache
+
+# service area solver of the current worker process
+_worker_solver = None
+
+def init_isochrone_worker(tile_dir, bbox, cost, cache_path):
+    """Loads the road graph in a worker. Workers forked from the parent already share its graph."""
+    global _worker_solver
+    if _worker_solver is None or _worker_solver.cost != cost:
+        _worker_solver = ServiceAreaSolver(TiledRoadGraph(tile_dir, bbox), cost, cache=IsochroneCache(cache_path))
+
+def solve_isochrone_task(task):
+    """Solves the service areas of one point. Returns (oid, [(cutoff, polygons), ...]) or (oid, error message)."""
+    oid, lon, lat, cutoffs, hull = task
+    try:
+        return oid, _worker_solver.solve(lon, lat, cutoffs, hull)
+    except ServiceAreaError as e:
+        return oid, str(e)
+
+class BatchIsochrone:
+    """Calculates isochrones for every point of a layer"""
+
+    def __init__(
+            self,
+            tile_dir,
+            point_layer,
+            output_path,
+            travel_mode,
+            cutoffs,
+            workers=1,
+            hull="concave",
+            cache_path=None
+        ):
+        self.tile_dir = tile_dir
+        self.cache_path = cache_path or os.path.join(tile_dir, "isochrone_cache.sqlite")
+        self.point_layer = point_layer
+        self.output_path = output_path
+        self.travel_mode = travel_mode
+        if self.travel_mode == "Length":
+            self.cutoffs = [float(cutoff) for cutoff in cutoffs.split(";")]
+        elif self.travel_mode == "Time":
+            self.cutoffs = [float(cutoff) / 60 for cutoff in cutoffs.split(";")]
+        else:
+            raise ValueError(f"Unknown travel mode {travel_mode}, expected Length or Time")
+        self.workers = max(1, int(workers))
+        self.hull = hull
+        self.failures = {}
+
+    def tasks(self, points):
+        for oid, (lon, lat) in points.items():
+            yield oid, lon, lat, self.cutoffs, self.hull
+
+    def process(self):
+        global _worker_solver
+        start = time.perf_counter()
+        points = read_points(self.point_layer)
+        if not points:
+            raise ValueError(f"No points found in {self.point_layer}")
+        # tiles around the points are loaded once here, forked workers share them and load border tiles as needed
+        bbox = [
+            min(xy[0] for xy in points.values()),
+            min(xy[1] for xy in points.values()),
+            max(xy[0] for xy in points.values()),
+            max(xy[1] for xy in points.values())
+        ]
+        init_isochrone_worker(self.tile_dir, bbox, self.travel_mode, self.cache_path)
+
+        fields = [("mill_oid", "INTEGER"), ("FromBreak", "DOUBLE"), ("ToBreak", "DOUBLE")]
+        with GeoPackageWriter(self.output_path, "isochrones", fields, "MULTIPOLYGON") as writer:
+            if self.workers == 1:
+                results = map(solve_isochrone_task, self.tasks(points))
+                self.write_results(writer, results)
+            else:
+                with ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=init_isochrone_worker,
+                        initargs=(self.tile_dir, bbox, self.travel_mode, self.cache_path)
+                ) as executor:
+                    results = executor.map(solve_isochrone_task, self.tasks(points), chunksize=8)
+                    self.write_results(writer, results)
+        _worker_solver.cache.close()
+        _worker_solver = None
+        print(f"Created isochrones for {len(points) - len(self.failures)} of {len(points)} points in "
+              f"{time.perf_counter() - start:.1f} s, written to {self.output_path}")
+        for oid, error in self.failures.items():
+            print(f"OBJECTID {oid} failed: {error}")
+
+    def write_results(self, writer, results):
+        for oid, areas in results:
+            if isinstance(areas, str):
+                self.failures[oid] = areas
+                continue
+            for cutoff, polygons in areas:
+                writer.add({"mill_oid": oid, "FromBreak": 0, "ToBreak": cutoff}, multipolygon_wkb(polygons))
+
+def main():
+    tile_dir = sys.argv[1]
+    point_layer = sys.argv[2]
+    output_path = sys.argv[3]
+    travel_mode = sys.argv[4]
+    cutoffs = sys.argv[5]
+    workers = os.cpu_count() or 1
+    if len(sys.argv) > 6:
+        workers = int(sys.argv[6])
+    hull = "concave"
+    if len(sys.argv) > 7:
+        hull = sys.argv[7]
+    cache_path = None
+    if len(sys.argv) > 8:
+        cache_path = sys.argv[8]
+
+    batch = BatchIsochrone(tile_dir, point_layer, output_path, travel_mode, cutoffs, workers, hull, cache_path)
+    batch.process()
+
+if __name__ == "__main__":
+    main()
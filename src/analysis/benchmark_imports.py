@@ -0,0 +1,60 @@
+########################################################################################################################
+# benchmark_imports.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Times the import of analysis modules in fresh interpreters and lists the heavy packages each one loads, to
+#          check that script startup and routing worker processes do not pay for the plotting and statistics stack.
+# Usage: [<module> ...] [--repeat <n>]
+########################################################################################################################
+
+import sys, os, subprocess, statistics, json
+
+HEAVY_MODULES = ["matplotlib", "statsmodels", "pandas", "scipy", "arcpy", "osgeo"]
+
+DEFAULT_MODULES = ["circuity_factor", "cf_from_calc_data", "district_cf", "bootstrap_analysis", "regression"]
+
+PROBE = """
+import sys, time, json
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+error = None
+try:
+    import {module}
+except ImportError as e:
+    error = str(e)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "error": error, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def time_import(module, repeat=3):
+    """Imports a module in repeat fresh interpreters. Returns the median import time in seconds, the heavy
+       modules it loaded and the import error, if any."""
+    path = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(path=path, module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return statistics.median(run["seconds"] for run in runs), runs[-1]["loaded"], runs[-1]["error"]
+
+def main():
+    args = sys.argv[1:]
+    repeat = 3
+    if "--repeat" in args:
+        i = args.index("--repeat")
+        repeat = int(args[i + 1])
+        del args[i:i + 2]
+    modules = args or DEFAULT_MODULES
+    for module in modules:
+        seconds, loaded, error = time_import(module, repeat)
+        if error:
+            print(f"{module}: import failed after {seconds * 1000:.0f} ms ({error})")
+        else:
+            print(f"{module}: {seconds * 1000:.0f} ms, heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+if __name__ == "__main__":
+    main()
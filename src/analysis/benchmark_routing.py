@@ -0,0 +1,72 @@
+########################################################################################################################
+# benchmark_routing.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Times the routing loop (SamplingScheduler and GraphRoutingBackend) on a road tile directory without arcpy.
+#          Random graph nodes stand in for harvest sites and sawmills, so the per pair cost of the scheduler and
+#          backend can be measured on Linux.
+# Usage: <tile directory> <number of pairs> [<workers>] [<cost>]
+########################################################################################################################
+
+import sys, time, random
+from concurrent.futures import ProcessPoolExecutor
+from road_graph import TiledRoadGraph, node_coords
+from routing_backend import GraphRoutingBackend, RouteSolveError
+from route_executor import InlineExecutor, SamplingScheduler
+
+# routing backend of the current worker process
+_worker_backend = None
+
+def init_benchmark_worker(backend):
+    global _worker_backend
+    backend.open()
+    _worker_backend = backend
+
+def solve_pair(backend, task):
+    try:
+        return backend.solve(*task)[0]
+    except RouteSolveError:
+        return None
+
+def solve_worker_pair(task):
+    return solve_pair(_worker_backend, task)
+
+def random_points(graph, count, seed=0):
+    """Picks graph nodes as points keyed by a string id like OBJECTIDs"""
+    nodes = sorted(graph.adj.keys())
+    rng = random.Random(seed)
+    return {str(i): node_coords(node) for i, node in enumerate(rng.sample(nodes, min(count, len(nodes))))}
+
+def main():
+    tile_dir = sys.argv[1]
+    pair_count = int(sys.argv[2])
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    cost = sys.argv[4] if len(sys.argv) > 4 else "Length"
+
+    graph = TiledRoadGraph(tile_dir)
+    graph.load_bbox([-180, -90, 180, 90])
+    sites = random_points(graph, pair_count, seed=1)
+    mills = random_points(graph, max(1, pair_count // 10), seed=2)
+    mill_ids = list(mills.keys())
+    rng = random.Random(3)
+    tasks = [(hs_oid, rng.choice(mill_ids)) for hs_oid in sites]
+
+    backend = GraphRoutingBackend(sites, mills, cost, tile_dir=tile_dir)
+    start = time.perf_counter()
+    if workers == 1:
+        backend.graph = graph
+        executor = InlineExecutor()
+        submit = lambda task: executor.submit(solve_pair, backend, task)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_benchmark_worker, initargs=(backend,))
+        submit = lambda task: executor.submit(solve_worker_pair, task)
+    try:
+        solved = SamplingScheduler(submit, workers).run(tasks, lambda task, result: result)
+    finally:
+        executor.shutdown(cancel_futures=True)
+    elapsed = time.perf_counter() - start
+    print(f"Solved {solved} of {len(tasks)} pairs with {workers} worker(s) in {elapsed:.2f} s "
+          f"({1000 * elapsed / max(1, len(tasks)):.2f} ms per pair)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+########################################################################################################################
+# bootstrap.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Vectorized bootstrap of mean multipliers and of the regression circuity factor. Resample indices are drawn
+#          as (B, n) integer arrays from a seeded numpy Generator in memory bounded chunks and the replicate means are
+#          array reductions. Replicates can be split across processes, each with an independent stream spawned from one
+#          SeedSequence, so a seed and worker count always give the same replicates.
+########################################################################################################################
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from regression import SUM_FIELDS, regression_sums, coefficients_from_sums
+
+# largest number of resampled values held in memory at once per sample
+DEFAULT_CHUNK_ELEMENTS = 4000000
+
+def chunk_rows(n, iterations, max_elements=DEFAULT_CHUNK_ELEMENTS):
+    """Number of replicates drawn at once for a sample of size n"""
+    return max(1, min(iterations, max_elements // max(n, 1)))
+
+def bootstrap_means(samples, iterations, rng, max_elements=DEFAULT_CHUNK_ELEMENTS, weights=None):
+    """Bootstraps the mean of each sample. Returns an (iterations, len(samples) + 1) array holding the replicate
+       mean of every sample followed by the mean of all resampled values together (the sample means weighted by
+       sample size). Empty samples give NaN. weights holds the design weights of every sample, the resampled
+       values then give weighted means."""
+    samples = [np.asarray(sample, dtype=np.float64) for sample in samples]
+    if weights is None:
+        weights = [np.ones(len(sample)) for sample in samples]
+    weights = [np.asarray(sample_weights, dtype=np.float64) for sample_weights in weights]
+    sizes = np.array([len(sample) for sample in samples], dtype=np.int64)
+    replicates = np.full((iterations, len(samples) + 1), np.nan)
+    rows = chunk_rows(int(sizes.max()) if len(sizes) else 1, iterations, max_elements)
+    for start in range(0, iterations, rows):
+        stop = min(start + rows, iterations)
+        weighted_total = np.zeros(stop - start)
+        weight_total = np.zeros(stop - start)
+        for k, sample in enumerate(samples):
+            if len(sample):
+                idx = rng.integers(0, len(sample), size=(stop - start, len(sample)))
+                sample_weights = weights[k][idx]
+                weighted_sum = (sample[idx] * sample_weights).sum(axis=1)
+                weight_sum = sample_weights.sum(axis=1)
+                replicates[start:stop, k] = weighted_sum / weight_sum
+                weighted_total += weighted_sum
+                weight_total += weight_sum
+        if sizes.sum():
+            replicates[start:stop, -1] = weighted_total / weight_total
+    return replicates
+
+def bootstrap_regression(samples, iterations, rng, max_elements=DEFAULT_CHUNK_ELEMENTS, weights=None):
+    """Bootstraps the regression coefficients by resampling (ed, rd) pairs within each sample. samples is a list
+       of (ed array, rd array). Returns an (iterations, len(samples) + 1, 3) array of (b1, b2, b3) for every sample
+       followed by all samples pooled, whose sums are the sum of the samples' sums. With the design weights of
+       every sample the replicates are weighted least squares fits."""
+    samples = [(np.asarray(ed, dtype=np.float64), np.asarray(rd, dtype=np.float64)) for ed, rd in samples]
+    if weights is not None:
+        weights = [np.asarray(sample_weights, dtype=np.float64) for sample_weights in weights]
+    sizes = [len(ed) for ed, _ in samples]
+    replicates = np.full((iterations, len(samples) + 1, 3), np.nan)
+    # x, y and their products are held at once
+    rows = chunk_rows(max(sizes) if sizes else 1, iterations, max_elements // 4)
+    for start in range(0, iterations, rows):
+        stop = min(start + rows, iterations)
+        total = np.zeros((stop - start, len(SUM_FIELDS)))
+        for k, (ed, rd) in enumerate(samples):
+            if len(ed):
+                idx = rng.integers(0, len(ed), size=(stop - start, len(ed)))
+                sums = regression_sums(ed[idx], rd[idx], weights[k][idx] if weights is not None else None)
+                replicates[start:stop, k] = np.stack(coefficients_from_sums(sums), axis=-1)
+                total += sums
+        if sum(sizes):
+            replicates[start:stop, -1] = np.stack(coefficients_from_sums(total), axis=-1)
+    return replicates
+
+def split_iterations(iterations, parts):
+    """Splits iterations into parts as evenly as possible"""
+    return [iterations // parts + (1 if i < iterations % parts else 0) for i in range(parts)]
+
+def _bootstrap_part(statistic, data, iterations, seed_seq, max_elements):
+    return statistic(data, iterations, np.random.default_rng(seed_seq), max_elements)
+
+def parallel_bootstrap(statistic, data, iterations, seed=None, workers=1, max_elements=DEFAULT_CHUNK_ELEMENTS):
+    """Runs statistic(data, iterations, rng, max_elements) with the iterations split across worker processes.
+       Every worker gets its own stream spawned from SeedSequence(seed) and the parts are joined in order. Returns
+       the replicates and the SeedSequence entropy, which reproduces the run when passed back as the seed."""
+    workers = max(1, min(int(workers), iterations))
+    seed_seq = np.random.SeedSequence(seed)
+    streams = seed_seq.spawn(workers)
+    sizes = split_iterations(iterations, workers)
+    if workers == 1:
+        parts = [_bootstrap_part(statistic, data, sizes[0], streams[0], max_elements)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_bootstrap_part, statistic, data, size, stream, max_elements)
+                for size, stream in zip(sizes, streams)
+            ]
+            parts = [future.result() for future in futures]
+    return np.concatenate(parts), seed_seq.entropy
+
+def percentile_intervals(replicates, confidence=0.95):
+    """Percentile confidence interval of every replicate column. Returns (lower, upper) arrays."""
+    alpha = (1 - confidence) / 2
+    lower = np.nanpercentile(replicates, 100 * alpha, axis=0)
+    upper = np.nanpercentile(replicates, 100 * (1 - alpha), axis=0)
+    return lower, upper
@@ -3,73 +3,167 @@
 # Author: James Jin
 # unity ID: cjjin
 # Purpose: Repeatedly samples using bootstrapping to collect multiplier data, produces a circuity factor
+# Usage: <output directory> [<workspace>] [<iterations>] [<seed>] [<workers>] [<mode>]
+#        mode is mean (resample multipliers, the default) or regression (resample distance pairs and refit the
+#        circuity factor regressions)
 ########################################################################################################################
 
-import sys, arcpy, csv, os, random
+import sys, arcpy, csv, os
 import datetime
+from functools import partial
+import numpy as np
+from bootstrap import bootstrap_means, bootstrap_regression, parallel_bootstrap, percentile_intervals
+from regression import SUM_FIELDS, regression_sums, coefficients_from_sums
+from result_store import read_results
 
-output_dir = sys.argv[1]
-
-#set workspace
-try:
-    proj = arcpy.mp.ArcGISProject("CURRENT")
-    workspace = proj.defaultGeodatabase
-except OSError:
-    workspace = sys.argv[2]
-arcpy.env.workspace = workspace
-arcpy.env.overwriteOutput = True
-arcpy.env.addOutputsToMap = False
-
-# dictionary to store multipliers
-rd_dict = {
-    "Lumber/Solid Wood": [],
-    "Pellet": [],
-    "Chip": [],
-    "Pulp/Paper": [],
-    "Composite Panel/Engineered Wood Product": [],
-    "Plywood/Veneer": []
-}
-
-#read in distance calculations from CSV
-for sm_type in rd_dict:
-    csv_in = os.path.join(output_dir, f"{sm_type[:3]}_distance.csv")
+SM_TYPES = [
+    "Lumber/Solid Wood",
+    "Pellet",
+    "Chip",
+    "Pulp/Paper",
+    "Composite Panel/Engineered Wood Product",
+    "Plywood/Veneer"
+]
+
+def read_distances(output_dir):
+    """Reads the road distance results and returns the (straight-line, road) distances and design weights of each
+       type. Results of a disproportionate sample (cf_from_calc_data.py) carry weights, all others weigh 1."""
+    dist_dict = {}
     try:
-        rd_in = open(csv_in, "r", newline="\n")
+        for sm_type in SM_TYPES:
+            results = read_results(output_dir, sm_type=sm_type, columns=["ed", "rd", "weight"])
+            dist_dict[sm_type] = (results["ed"].tolist(), results["rd"].tolist(), results["weight"].tolist())
     except FileNotFoundError:
-        arcpy.AddError("Road distance csv files not found, rerun Circuity Factor script tool with calculations.")
+        arcpy.AddError("Road distance results not found, rerun Circuity Factor script tool with calculations.")
         raise arcpy.ExecuteError()
-    rd_reader = csv.reader(rd_in)
-    for row in rd_reader:
-        multiplier = float(row[3]) / float(row[2])
-        rd_dict[sm_type].append(multiplier)
-    rd_in.close()
-
-#resample from the calculated distances, output mean multiplier of each resample to CSV file
-mean_multipliers_out = os.path.join(
-    os.path.abspath(output_dir), f"mean_multipliers_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-)
-csv_out = open(mean_multipliers_out, "w", newline="\n")
-csv_writer = csv.writer(csv_out)
-csv_writer.writerow(["Lumber/Solid Wood", "Pellet", "Chip", "Pulp/Paper", "Composite Panel/Engineered Wood Product",
-                     "Plywood/Veneer", "Combined Average"])
-
-for i in range(0, 10000):
-    total_multiplier_list = []
-    output_dict = {}
-    for sm_type in rd_dict:
-        random_sample = random.choices(rd_dict[sm_type], k=len(rd_dict[sm_type]))
-        sample_mean = sum(random_sample) / len(rd_dict[sm_type])
-        output_dict[sm_type] = sample_mean
-        total_multiplier_list.extend(random_sample)
-    total_sample_mean = sum(total_multiplier_list) / len(total_multiplier_list)
-    csv_writer.writerow([output_dict["Lumber/Solid Wood"],
-                         output_dict["Pellet"],
-                         output_dict["Chip"],
-                         output_dict["Pulp/Paper"],
-                         output_dict["Composite Panel/Engineered Wood Product"],
-                         output_dict["Plywood/Veneer"],
-                         total_sample_mean]
-    )
-csv_out.close()
-
-arcpy.AddMessage(f"Results can be found in {output_dir}")
\ No newline at end of file
+    return dist_dict
+
+def read_multipliers(output_dir):
+    """Reads the road distance results and returns the multipliers and design weights of each type"""
+    return {
+        sm_type: ([rd / ed for ed, rd in zip(ed_list, rd_list)], weights)
+        for sm_type, (ed_list, rd_list, weights) in read_distances(output_dir).items()
+    }
+
+def bootstrap_regression_cf(output_dir, iterations, seed, workers, timestamp):
+    """Bootstraps the regression coefficients of every sawmill type and all types together. Writes the circuity
+       factor (b3) replicates and the intervals of b1, b2 and b3."""
+    dist_dict = read_distances(output_dir)
+    samples = [dist_dict[sm_type][:2] for sm_type in SM_TYPES]
+    weights = [dist_dict[sm_type][2] for sm_type in SM_TYPES]
+    statistic = partial(bootstrap_regression, weights=weights)
+    replicates, entropy = parallel_bootstrap(statistic, samples, iterations, seed, workers)
+    arcpy.AddMessage(f"{iterations} regression replicates on {workers} worker(s), seed {entropy}")
+
+    cf_out = os.path.join(os.path.abspath(output_dir), f"regression_cf_{timestamp}.csv")
+    with open(cf_out, "w", newline="\n") as csv_out:
+        csv_writer = csv.writer(csv_out)
+        csv_writer.writerow(SM_TYPES + ["All"])
+        csv_writer.writerows(replicates[:, :, 2].tolist())
+
+    # coefficients of the original data from the same closed form sums
+    sums = [
+        regression_sums(ed, rd, sample_weights) if ed else np.zeros(len(SUM_FIELDS))
+        for (ed, rd), sample_weights in zip(samples, weights)
+    ]
+    sums.append(np.sum(sums, axis=0))
+    estimates = np.stack(coefficients_from_sums(np.array(sums)), axis=-1)
+    lower, upper = percentile_intervals(replicates, 0.95)
+    ci_out = os.path.join(os.path.abspath(output_dir), f"regression_cf_ci_{timestamp}.csv")
+    with open(ci_out, "w", newline="\n") as csv_out:
+        csv_writer = csv.writer(csv_out)
+        csv_writer.writerow(
+            ["Sawmill Type", "Coefficient", "Estimate", "Bootstrap Mean", "Standard Error", "Lower 95%", "Upper 95%"]
+        )
+        for i, name in enumerate(SM_TYPES + ["All"]):
+            for j, coefficient in enumerate(["b1", "b2", "b3"]):
+                csv_writer.writerow([
+                    name,
+                    coefficient,
+                    estimates[i, j],
+                    np.nanmean(replicates[:, i, j]),
+                    np.nanstd(replicates[:, i, j], ddof=1),
+                    lower[i, j],
+                    upper[i, j]
+                ])
+        csv_writer.writerow(["Seed", entropy, "Workers", workers, "Iterations", iterations])
+
+def main():
+    output_dir = sys.argv[1]
+
+    #set workspace
+    try:
+        proj = arcpy.mp.ArcGISProject("CURRENT")
+        workspace = proj.defaultGeodatabase
+    except OSError:
+        workspace = sys.argv[2]
+    arcpy.env.workspace = workspace
+    arcpy.env.overwriteOutput = True
+    arcpy.env.addOutputsToMap = False
+
+    iterations = 10000
+    if len(sys.argv) > 3 and sys.argv[3] != "#":
+        iterations = int(sys.argv[3])
+    seed = None
+    if len(sys.argv) > 4 and sys.argv[4] != "#":
+        seed = int(sys.argv[4])
+    workers = 1
+    if len(sys.argv) > 5 and sys.argv[5] != "#":
+        workers = int(sys.argv[5])
+    mode = "mean"
+    if len(sys.argv) > 6 and sys.argv[6] != "#":
+        mode = sys.argv[6].lower()
+    if mode not in ["mean", "regression"]:
+        arcpy.AddError(f"Unknown bootstrap mode {mode}, use mean or regression.")
+        raise arcpy.ExecuteError()
+
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M')
+    if mode == "regression":
+        bootstrap_regression_cf(output_dir, iterations, seed, workers, timestamp)
+        arcpy.AddMessage(f"Results can be found in {output_dir}")
+        return
+
+    rd_dict = read_multipliers(output_dir)
+
+    #resample from the calculated distances, output mean multiplier of each resample to CSV file
+    samples = [rd_dict[sm_type][0] for sm_type in SM_TYPES]
+    weights = [rd_dict[sm_type][1] for sm_type in SM_TYPES]
+    statistic = partial(bootstrap_means, weights=weights)
+    replicates, entropy = parallel_bootstrap(statistic, samples, iterations, seed, workers)
+    arcpy.AddMessage(f"{iterations} replicates on {workers} worker(s), seed {entropy}")
+
+    mean_multipliers_out = os.path.join(os.path.abspath(output_dir), f"mean_multipliers_{timestamp}.csv")
+    with open(mean_multipliers_out, "w", newline="\n") as csv_out:
+        csv_writer = csv.writer(csv_out)
+        csv_writer.writerow(SM_TYPES + ["Combined Average"])
+        csv_writer.writerows(replicates.tolist())
+
+    # percentile confidence intervals next to the design weighted mean of the original data
+    all_multipliers = [multiplier for sample in samples for multiplier in sample]
+    all_weights = [weight for sample_weights in weights for weight in sample_weights]
+    sample_means = [
+        np.average(sample, weights=sample_weights) if sample else np.nan
+        for sample, sample_weights in zip(samples, weights)
+    ] + [np.average(all_multipliers, weights=all_weights)]
+    lower, upper = percentile_intervals(replicates, 0.95)
+    ci_out = os.path.join(os.path.abspath(output_dir), f"mean_multiplier_ci_{timestamp}.csv")
+    with open(ci_out, "w", newline="\n") as csv_out:
+        csv_writer = csv.writer(csv_out)
+        csv_writer.writerow(
+            ["Sawmill Type", "Sample Mean", "Bootstrap Mean", "Standard Error", "Lower 95%", "Upper 95%"]
+        )
+        for i, name in enumerate(SM_TYPES + ["Combined Average"]):
+            csv_writer.writerow([
+                name,
+                sample_means[i],
+                np.nanmean(replicates[:, i]),
+                np.nanstd(replicates[:, i], ddof=1),
+                lower[i],
+                upper[i]
+            ])
+        csv_writer.writerow(["Seed", entropy, "Workers", workers, "Iterations", iterations])
+
+    arcpy.AddMessage(f"Results can be found in {output_dir}")
+
+if __name__ == "__main__":
+    main()
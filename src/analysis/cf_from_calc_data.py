@@ -3,149 +3,73 @@
 # Author: James Jin
 # unity ID: cjjin
 # Purpose: Calculates circuity factor from existing data. Samples data using Neyman Allocation.
+# Usage: <results directory> <output directory> [<strata: district or type>] [<sample budget>] [<workers>]
+#        [<render histograms: true or false>]
 ########################################################################################################################
 
 
-import sys, csv, os, random, math, statistics
+import sys, csv, os
 import numpy as np
-import pandas as pd
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+from sampling import group_stats, stratified_sample_size, neyman_allocation, stratified_sample, weighted_median
+from regression import circuity_regressions, write_regression_report
+from histograms import distance_histogram, overlaid_histogram, write_histograms, render_pdf
+from result_store import ResultWriter, read_results
 
-def calculate_circuity_factor_from_csv(rd_csv, output_name, op_dir, sawmill_type, pdf_file):
+def calculate_circuity_factor_from_lists(ed_list, rd_list, output_name, sawmill_type, histograms, weights=None):
     """Reads in road distance csv created by the road distance calculation functions. Returns coefficent
-       for each regression."""
-    rd_list = []
-    ed_list = []
-
-    rd_in = open(rd_csv, "r", newline="\n")
-    rd_reader = csv.reader(rd_in)
-    for row in rd_reader:
-        ed_list.append(float(row[2]))
-        rd_list.append(float(row[3]))
-    rd_in.close()
-
+       for each regression, weighted by the sampling weights if given."""
     road_distance = np.array(rd_list)
     euclidean_distance = np.array(ed_list)
 
-    generate_histogram(road_distance, "Road Distance", sawmill_type, 40, pdf_file)
-    generate_histogram(euclidean_distance, "Euclidean Distance", sawmill_type, 40, pdf_file)
+    generate_histogram(road_distance, "Road Distance", sawmill_type, 40, histograms)
+    generate_histogram(euclidean_distance, "Euclidean Distance", sawmill_type, 40, histograms)
     generate_overlaid_histogram(
         [road_distance, euclidean_distance],
         ["Road Distance", "Euclidean Distance"],
         sawmill_type,
         60,
-        pdf_file
+        histograms
     )
 
-    df = pd.DataFrame({
-        'sl': euclidean_distance,
-        'sl_sq': euclidean_distance ** 2,
-        'rd': road_distance
-    })
-
-    X1 = sm.add_constant(df[['sl', 'sl_sq']])
-    y = df['rd']
-
-    model1 = sm.OLS(y, X1).fit()
-
-    X2 = sm.add_constant(df[['sl']])
-    model2 = sm.OLS(y, X2).fit()
-
-    X3 = df[['sl']]
-    model3 = sm.OLS(y, X3).fit()
-
-    b1 = model1.params['sl']
-    b2 = model2.params['sl']
-    b3 = model3.params['sl']
-
-    results_file = open(os.path.join(op_dir, output_name), "w+")
-    results_file.write(str(model1.summary()) + "\n")
-    results_file.write(str(model2.summary()) + "\n")
-    results_file.write(str(model3.summary()) + "\n")
-    results_file.write(f"Circuity factor: {b3}")
-    results_file.close()
+    b1, b2, b3 = circuity_regressions(euclidean_distance, road_distance, weights)
+    if output_name:
+        write_regression_report(output_name, euclidean_distance, road_distance, weights)
 
     return b1, b2, b3
 
-def calculate_circuity_factor_from_lists(ed_list, rd_list, output_name, sawmill_type, pdf_file):
-    """Reads in road distance csv created by the road distance calculation functions. Returns coefficent
-       for each regression."""
-    road_distance = np.array(rd_list)
-    euclidean_distance = np.array(ed_list)
-
-    generate_histogram(road_distance, "Road Distance", sawmill_type, 40, pdf_file)
-    generate_histogram(euclidean_distance, "Euclidean Distance", sawmill_type, 40, pdf_file)
-    generate_overlaid_histogram(
-        [road_distance, euclidean_distance],
-        ["Road Distance", "Euclidean Distance"],
-        sawmill_type,
-        60,
-        pdf_file
-    )
-
-    df = pd.DataFrame({
-        'sl': euclidean_distance,
-        'sl_sq': euclidean_distance ** 2,
-        'rd': road_distance
-    })
-
-    X1 = sm.add_constant(df[['sl', 'sl_sq']])
-    y = df['rd']
-
-    model1 = sm.OLS(y, X1).fit()
+def generate_histogram(arr, value_name, sm_type, bin_num, histograms):
+    """Bins an array for a sawmill type into a histogram page added to the histograms list"""
+    histograms.append(distance_histogram(arr, value_name, sm_type, bin_num))
 
-    X2 = sm.add_constant(df[['sl']])
-    model2 = sm.OLS(y, X2).fit()
-
-    X3 = df[['sl']]
-    model3 = sm.OLS(y, X3).fit()
-
-    b1 = model1.params['sl']
-    b2 = model2.params['sl']
-    b3 = model3.params['sl']
-
-    results_file = open(output_name, "w+")
-    results_file.write(str(model1.summary()) + "\n")
-    results_file.write(str(model2.summary()) + "\n")
-    results_file.write(str(model3.summary()) + "\n")
-    results_file.write(f"Circuity factor: {b3}")
-    results_file.close()
-
-    return b1, b2, b3
-
-def generate_histogram(arr, value_name, sm_type, bin_num, pdf):
-    """Generates a histogram based off an array for a sawmill type. Outputs to a pdf file."""
-    plt.hist(arr, bins=bin_num, edgecolor="black", linewidth=1.2)
-    plt.xlim(0, 120)
-    plt.xlabel(value_name + " (Miles)")
-    plt.ylabel("Frequency")
-    plt.title(f"Histogram of {value_name} for {sm_type}")
-    pdf.savefig()
-    plt.close()
-
-def generate_overlaid_histogram(arr_list, value_list, sm_type, bin_num, pdf):
-    """Generates an overlaid histogram based off two arrays (of both road and eucldiean distance for a sawmill type.
-       Outputs to a pdf file."""
-    plt.hist(arr_list, label=value_list, bins=bin_num, edgecolor="black", linewidth=0.5, color=["blue", "red"])
-    plt.xlim(0, 120)
-    plt.xlabel("Distance (Miles)")
-    plt.ylabel("Frequency")
-    plt.legend()
-    plt.title(f"Histogram of Road and Euclidean Distances for {sm_type}")
-    pdf.savefig()
-    plt.close()
+def generate_overlaid_histogram(arr_list, value_list, sm_type, bin_num, histograms):
+    """Bins road and euclidean distances for a sawmill type into an overlaid histogram page added to the histograms
+       list"""
+    histograms.append(overlaid_histogram(arr_list, value_list, sm_type, bin_num))
 
 class CfFromDataCalculator:
 
-    def __init__(self, csv_dir, out_dir, min_sample_size=30, seed_val=None):
-        """Sets up attributes"""
+    def __init__(
+            self,
+            csv_dir,
+            out_dir,
+            min_sample_size=30,
+            seed_val=None,
+            render_histograms=True,
+            workers=1,
+            strata="district",
+            budget=None
+        ):
+        """Sets up attributes. strata is district (ranger districts within each sawmill type) or type. budget is the
+           total number of samples across all types, by default every type gets the sample its margin of error
+           needs."""
         self.csv_dir = csv_dir
         self.out_dir = out_dir
+        self.render_histograms = render_histograms
+        self.workers = workers
         self.min_sample_size = min_sample_size
-        if seed_val:
-            random.seed(seed_val)
+        self.strata = strata
+        self.budget = budget
+        self.rng = np.random.default_rng(seed_val)
         self.results_dict = {
             "Lumber/Solid Wood": [],
             "Pellet": [],
@@ -155,88 +79,102 @@ class CfFromDataCalculator:
             "Plywood/Veneer": []
         }
         self.samples_dict = {}
+        # sm_type: [design weight of every sample], stratum size / stratum sample size
+        self.weights_dict = {}
         self.cf_list = []
 
     def import_distance_results(self):
-        """Read in the distance results from calculations of all sites"""
+        """Read in the distance results from calculations of all sites as (hs_oid, sm_oid, ed, rd, time, district,
+           weight)"""
         for sm_type in self.results_dict:
-            csv_out = os.path.join(self.csv_dir, f"{sm_type[:3]}_distance.csv")
-            in_file = open(csv_out, "r+", newline="\n")
-            in_reader = csv.reader(in_file)
-
-            for line in in_reader:
-                self.results_dict[sm_type].append((line[0], line[1], line[2], line[3]))
+            columns = read_results(self.csv_dir, sm_type=sm_type)
+            self.results_dict[sm_type] = list(zip(
+                *(columns[name].tolist() for name in ("hs_oid", "sm_oid", "ed", "rd", "time", "district", "weight"))
+            ))
 
     def collect_samples(self):
-        """Collect random samples. Determine sample sizes using Neyman Allocation based on the standard deviation
-           of multipliers."""
+        """Collect a stratified random sample. Sample sizes follow Neyman allocation from the standard deviation of the
+           multipliers in each stratum. Without a budget each type gets the sample size its mean multiplier needs for
+           the margin of error, with one the budget is split across the strata of all types."""
         z = 1.96
         e = 0.1
 
-        for sm_type in self.results_dict:
-            multi_list = []
-            samples = []
-            rand_idx_list = random.sample(range(0, len(self.results_dict[sm_type])), len(self.results_dict[sm_type]))
-            sample_size = self.min_sample_size
-            count = 0
-            collected_sample_size = False
-            while count < sample_size and not collected_sample_size:
-                count += 1
-                if count == sample_size:
-                    std_dev = np.std(multi_list)
-                    n = (z ** 2 * float(std_dev) ** 2) / e ** 2
-                    n = math.ceil(n)
-                    if n > sample_size:
-                        sample_size = n
-                        collected_sample_size = True
-                sample = self.results_dict[sm_type][rand_idx_list[count]]
-                multi_list.append(float(sample[2]) / float(sample[3]))
-                samples.append(sample)
-            self.samples_dict[sm_type] = samples
+        sm_types = list(self.results_dict)
+        rows = [(t, sample) for t, sm_type in enumerate(sm_types) for sample in self.results_dict[sm_type]]
+        multipliers = np.array([float(sample[3]) / float(sample[2]) for _, sample in rows])
+        # strata are numbered across all types
+        codes = {}
+        strata = np.array(
+            [codes.setdefault((t, sample[5] if self.strata == "district" else ""), len(codes)) for t, sample in rows],
+            dtype=np.int64
+        )
+        stratum_types = np.array([t for t, _ in codes], dtype=np.int64)
+        sizes, _, stds = group_stats(strata, multipliers, len(codes))
+
+        if self.budget is not None:
+            allocation = neyman_allocation(sizes, stds, self.budget)
+        else:
+            allocation = np.zeros(len(codes), dtype=np.int64)
+            for t in range(len(sm_types)):
+                in_type = stratum_types == t
+                type_size = int(sizes[in_type].sum())
+                sample_size = max(stratified_sample_size(sizes[in_type], stds[in_type], z, e), self.min_sample_size)
+                allocation[in_type] = neyman_allocation(sizes[in_type], stds[in_type], min(sample_size, type_size))
+
+        self.samples_dict = {sm_type: [] for sm_type in sm_types}
+        self.weights_dict = {sm_type: [] for sm_type in sm_types}
+        for stratum, indices in enumerate(stratified_sample(strata, allocation, self.rng)):
+            sm_type = sm_types[stratum_types[stratum]]
+            self.samples_dict[sm_type] += [rows[i][1] for i in indices.tolist()]
+            # results that are already a weighted sample keep standing for their own weight
+            self.weights_dict[sm_type] += [
+                rows[i][1][6] * sizes[stratum] / allocation[stratum] for i in indices.tolist()
+            ]
 
     def export_sampling_results(self):
-        """Write out the sampling results"""
-        for sm_type in self.samples_dict:
-            csv_out = os.path.join(self.out_dir, f"{sm_type[:3]}_distance.csv")
-            output_file = open(csv_out, "w+", newline="\n")
-            output_writer = csv.writer(output_file)
-            for sample in self.samples_dict[sm_type]:
-                output_writer.writerow(sample)
+        """Write out the sampling results with their design weights to a result store, so later stages can weight
+           the disproportionate sample"""
+        with ResultWriter(self.out_dir) as writer:
+            for sm_type in self.samples_dict:
+                for sample, weight in zip(self.samples_dict[sm_type], self.weights_dict[sm_type]):
+                    hs_oid, sm_oid, ed, rd, time, district, _ = sample
+                    writer.add(sm_type, hs_oid, sm_oid, ed, rd, time, district, weight=weight)
+
+    def estimate(self, sm_type, ed_list, rd_list, weights, histograms, output_name=None):
+        """Circuity factor and multipliers of a sample. Strata are sampled at different rates, so the regressions,
+           mean and median are weighted by the design weights to estimate the whole population. Returns a row of
+           total_results.csv."""
+        b1, b2, b3 = calculate_circuity_factor_from_lists(ed_list, rd_list, output_name, sm_type, histograms, weights)
+        multiplier_list = np.asarray(rd_list, dtype=np.float64) / np.asarray(ed_list, dtype=np.float64)
+        mean_multiplier = float(np.average(multiplier_list, weights=weights))
+        median_multiplier = weighted_median(multiplier_list, weights)
+        return [sm_type, b1, b2, b3, mean_multiplier, median_multiplier]
 
     def calculate_cf(self):
         """Calculates the circuity factor and outputs the results"""
-        pdf = PdfPages(os.path.join(self.out_dir, "histograms.pdf"))
-        for sm_type in self.samples_dict:
-            b1, b2, b3 = calculate_circuity_factor_from_csv(
-                os.path.join(self.out_dir, f"{sm_type[:3]}_distance.csv"),
-                f"{sm_type[:3]}_circuity_factor.txt",
-                self.out_dir,
-                sm_type,
-                pdf
-            )
-            samples = self.samples_dict[sm_type]
-            ed_list = [float(sample[2]) for sample in samples]
-            rd_list = [float(sample[3]) for sample in samples]
-            multiplier_list = [ed / rd for rd, ed in zip(rd_list, ed_list)]
-            mean_multiplier = statistics.mean(multiplier_list)
-            median_multiplier = statistics.median(multiplier_list)
-            self.cf_list.append([sm_type, b1, b2, b3, mean_multiplier, median_multiplier])
-
+        histograms = []
         ed_list = []
         rd_list = []
+        weights = []
         for sm_type in self.samples_dict:
-            type_ed_list = [float(sample[2]) for sample in self.samples_dict[sm_type]]
-            type_rd_list = [float(sample[3]) for sample in self.samples_dict[sm_type]]
+            samples = self.samples_dict[sm_type]
+            type_ed_list = [float(sample[2]) for sample in samples]
+            type_rd_list = [float(sample[3]) for sample in samples]
+            self.cf_list.append(self.estimate(
+                sm_type,
+                type_ed_list,
+                type_rd_list,
+                self.weights_dict[sm_type],
+                histograms,
+                os.path.join(self.out_dir, f"{sm_type[:3]}_circuity_factor.txt")
+            ))
             ed_list += type_ed_list
             rd_list += type_rd_list
-        b1, b2, b3 = calculate_circuity_factor_from_lists(
-            ed_list, rd_list, os.path.join(self.out_dir, f"All_circuity_factor.txt"), "All Sawmills", pdf
-        )
-        multiplier_list = [ed / rd for rd, ed in zip(rd_list, ed_list)]
-        mean_multiplier = statistics.mean(multiplier_list)
-        median_multiplier = statistics.median(multiplier_list)
-        self.cf_list.append(["All Sawmills", b1, b2, b3, mean_multiplier, median_multiplier])
-        pdf.close()
+            weights += self.weights_dict[sm_type]
+        self.cf_list.append(self.estimate(
+            "All Sawmills", ed_list, rd_list, weights, histograms, os.path.join(self.out_dir, "All_circuity_factor.txt")
+        ))
+        write_histograms(os.path.join(self.out_dir, "histograms.json"), histograms)
 
         output_csv = open(os.path.join(self.out_dir, "total_results.csv"), "w", newline="\n")
         output_writer = csv.writer(output_csv)
@@ -247,6 +185,9 @@ class CfFromDataCalculator:
             output_writer.writerow(row)
         output_csv.close()
 
+        if self.render_histograms:
+            render_pdf(histograms, os.path.join(self.out_dir, "histograms.pdf"), self.workers)
+
     def process(self):
         """Runs the full process"""
         if not os.path.exists(self.out_dir):
@@ -259,7 +200,28 @@ class CfFromDataCalculator:
 def main():
     csv_dir = sys.argv[1]
     out_dir = sys.argv[2]
-    cf_calc = CfFromDataCalculator(csv_dir, out_dir)
+    strata = "district"
+    if len(sys.argv) > 3 and sys.argv[3] != "#":
+        strata = sys.argv[3].lower()
+    budget = None
+    if len(sys.argv) > 4 and sys.argv[4] != "#":
+        budget = int(sys.argv[4])
+    # optional number of worker processes for drawing histograms.pdf
+    workers = 1
+    if len(sys.argv) > 5 and sys.argv[5] != "#":
+        workers = max(1, int(sys.argv[5]))
+    # histograms.pdf can be skipped and drawn later from histograms.json with histograms.py
+    render_histograms = True
+    if len(sys.argv) > 6 and sys.argv[6] != "#":
+        render_histograms = sys.argv[6].lower() == "true"
+    cf_calc = CfFromDataCalculator(
+        csv_dir,
+        out_dir,
+        render_histograms=render_histograms,
+        workers=workers,
+        strata=strata,
+        budget=budget
+    )
     cf_calc.process()
 
 if __name__ == "__main__":
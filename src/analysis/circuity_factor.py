@@ -6,167 +6,178 @@
 #          sawmills. Outputs mean and median multipliers as well as circuity factor for each sawmill type.
 ########################################################################################################################
 
-import sys, arcpy, csv, os, random, gc, math, statistics
-import statsmodels.api as sm
+import sys, arcpy, csv, os, statistics
 import numpy as np
-import pandas as pd
 import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+from regression import circuity_regressions, write_regression_report
+from routing_backend import RoutingBackend, GraphRoutingBackend, RouteSolveError
+from route_collector import RouteCollector
+from histograms import distance_histogram, overlaid_histogram, write_histograms, render_pdf
+from result_store import read_results
 
-class RouteFinder:
-    """Calculates the route between two points and finds the distance"""
+class ArcGISRoutingBackend(RoutingBackend):
+    """Routes with Network Analyst. One route analysis layer is created in open() and reused for every pair, only the
+       stops are replaced between solves."""
 
-    def __init__(self, network_ds, start_point, end_point, output_path, travel_mode):
+    def __init__(
+            self,
+            network_ds,
+            harvest_sites,
+            sawmills,
+            oid_field,
+            cost,
+            record_district,
+            hs_districts_fields,
+            keep_output_paths,
+            workspace=None
+        ):
         self.network_ds = network_ds
-        self.start_point = start_point
-        self.end_point = end_point
-        self.output_path = output_path
-        self.travel_mode = travel_mode
-
-    def calculate_route_distance(self):
-        """Finds the route from the starting point to the end point then calculates travel distance"""
-        self.calculate_road_distance_nd()
-        road_dist = self.calculate_distance_for_fc()
-        arcpy.analysis.Near(self.start_point, self.output_path, search_radius="3 Miles", distance_unit="Miles")
-        sc = arcpy.da.SearchCursor(self.start_point, ["NEAR_DIST"])
-        for row in sc:
-            road_dist += row[0]
-            break
-        del sc, row
-        return road_dist
-
-    def calculate_road_distance_nd(self):
-        """Finds the road distance from a starting point to an end point using network analyst"""
+        self.harvest_sites = harvest_sites
+        self.sawmills = sawmills
+        self.oid_field = oid_field
+        self.cost = cost
+        self.record_district = record_district
+        self.hs_districts_fields = hs_districts_fields
+        self.keep_output_paths = keep_output_paths
+        self.workspace = workspace
+        self.route_layer = None
+        self.route_layer_name = None
+        self.stops_layer_name = None
+        self.routes_layer = None
+        self.hs_layer = None
+        self.sm_layer = None
+        self.total_fields = []
+        # hs_oid: point geometry / ranger district, read once instead of per pair
+        self.site_points = {}
+        self.districts = {}
+
+    def open(self):
+        """Checks out Network Analyst and creates the route layer and the point layers used for every solve"""
+        if self.workspace:
+            arcpy.env.workspace = self.workspace
+        arcpy.env.overwriteOutput = True
+        arcpy.env.addOutputsToMap = False
         arcpy.CheckOutExtension("Network")
-        route_layer_name = "sawmill_route"
-        result = arcpy.na.MakeRouteAnalysisLayer(
-            self.network_ds,
-            layer_name=route_layer_name,
-            travel_mode=self.travel_mode
-        )
-        route_layer = result.getOutput(0)
+        self.route_layer_name = f"sawmill_route_{os.getpid()}"
+        try:
+            # accumulate both costs so kept routes carry their length and travel time
+            result = arcpy.na.MakeRouteAnalysisLayer(
+                self.network_ds,
+                layer_name=self.route_layer_name,
+                travel_mode=self.cost,
+                accumulate_attributes=["Length", "Time"]
+            )
+            self.total_fields = ["Total_Length", "Total_Time"]
+        except arcpy.ExecuteError:
+            result = arcpy.na.MakeRouteAnalysisLayer(
+                self.network_ds,
+                layer_name=self.route_layer_name,
+                travel_mode=self.cost
+            )
+            self.total_fields = []
+        self.route_layer = result.getOutput(0)
         try:
-            solver = arcpy.na.GetSolverProperties(route_layer)
+            solver = arcpy.na.GetSolverProperties(self.route_layer)
             solver.restrictions = ["Oneway"]
         except arcpy.ExecuteError:
             print("No oneway restriction implemented, solution will not include oneway functionality")
-        sub_layers = arcpy.na.GetNAClassNames(route_layer)
-        stops_layer_name = sub_layers["Stops"]
-
-        arcpy.na.AddLocations(
-            in_network_analysis_layer=route_layer,
-            sub_layer=stops_layer_name,
-            in_table=self.start_point,
-            append="CLEAR",
-            search_tolerance="20000 Feet"
-        )
-
-        arcpy.na.AddLocations(
-            in_network_analysis_layer=route_layer,
-            sub_layer=stops_layer_name,
-            in_table=self.end_point,
-            append="APPEND",
-            search_tolerance="20000 Feet"
-        )
+        sub_layers = arcpy.na.GetNAClassNames(self.route_layer)
+        self.stops_layer_name = sub_layers["Stops"]
+        self.routes_layer = arcpy.na.GetNASublayer(self.route_layer, "Routes")
+
+        self.hs_layer = f"harvest_site_layer_{os.getpid()}"
+        self.sm_layer = f"sawmill_layer_{os.getpid()}"
+        arcpy.management.MakeFeatureLayer(self.harvest_sites, self.hs_layer)
+        arcpy.management.MakeFeatureLayer(self.sawmills, self.sm_layer)
+
+        fields = [self.oid_field, "SHAPE@"]
+        if self.record_district:
+            fields += self.hs_districts_fields
+        with arcpy.da.SearchCursor(self.harvest_sites, fields) as sc:
+            for row in sc:
+                self.site_points[str(row[0])] = row[1]
+                if self.record_district:
+                    if row[2] and row[2].strip():
+                        self.districts[str(row[0])] = row[2]
+                    elif row[3]:
+                        self.districts[str(row[0])] = row[3]
+
+    def solve(self, hs_oid, sm_oid):
         try:
-            arcpy.na.Solve(route_layer, ignore_invalids="SKIP")
-            if int(arcpy.management.GetCount(sub_layers["Routes"])[0]) == 0:
-                raise arcpy.ExecuteError("Solve resulted in a failure")
+            arcpy.management.SelectLayerByAttribute(self.hs_layer, "NEW_SELECTION", f"{self.oid_field} = {hs_oid}")
+            arcpy.management.SelectLayerByAttribute(self.sm_layer, "NEW_SELECTION", f"OBJECTID = {sm_oid}")
+            arcpy.na.AddLocations(
+                in_network_analysis_layer=self.route_layer,
+                sub_layer=self.stops_layer_name,
+                in_table=self.hs_layer,
+                append="CLEAR",
+                search_tolerance="20000 Feet"
+            )
+            arcpy.na.AddLocations(
+                in_network_analysis_layer=self.route_layer,
+                sub_layer=self.stops_layer_name,
+                in_table=self.sm_layer,
+                append="APPEND",
+                search_tolerance="20000 Feet"
+            )
+            result = arcpy.na.Solve(self.route_layer, ignore_invalids="SKIP")
         except arcpy.ExecuteError as e:
-            arcpy.management.Delete(route_layer_name)
-            raise arcpy.ExecuteError(e)
-        arcpy.management.CopyFeatures(sub_layers["Routes"], self.output_path)
-        arcpy.management.Delete(route_layer_name)
-        arcpy.management.Delete(route_layer)
-        del result, route_layer
+            raise RouteSolveError(str(e))
+        if str(result.getOutput(1)).lower() != "true":
+            raise RouteSolveError("Solve resulted in a failure")
+
+        route_geom = None
+        totals = [None, None]
+        with arcpy.da.SearchCursor(self.routes_layer, ["SHAPE@"] + self.total_fields) as sc:
+            for row in sc:
+                route_geom = row[0]
+                if self.total_fields:
+                    totals = list(row[1:])
+                break
+        if route_geom is None:
+            raise RouteSolveError("Solve resulted in a failure")
+
+        road_dist = route_geom.getLength("GEODESIC", "MILES_US")
+        # distance from the harvest site to the start of the route
+        road_dist += self.connector_distance(self.site_points.get(hs_oid), route_geom)
+        wkb = bytes(route_geom.WKB) if self.keep_output_paths else None
+        return road_dist, self.districts.get(hs_oid, ""), (wkb, totals[0], totals[1])
+
+    @staticmethod
+    def connector_distance(point, route_geom):
+        """Geodesic distance in miles from a point to the closest point of the route. Like the 3 mile Near search
+           radius, anything farther is not counted."""
+        if point is None:
+            return 0
+        if point.spatialReference.factoryCode != route_geom.spatialReference.factoryCode:
+            point = point.projectAs(route_geom.spatialReference)
+        nearest = route_geom.queryPointAndDistance(point)[0]
+        dist = point.angleAndDistanceTo(nearest, "GEODESIC")[1] / 1609.347219
+        if dist > 3:
+            return 0
+        return dist
+
+    def close(self):
+        """Deletes the layers and checks the Network Analyst extension back in"""
+        for layer in [self.hs_layer, self.sm_layer, self.route_layer_name]:
+            if layer and arcpy.Exists(layer):
+                arcpy.management.Delete(layer)
+        self.route_layer = None
         arcpy.CheckInExtension("Network")
 
-    def calculate_distance_for_fc(self):
-        """Calculates distance for a given polyline feature class"""
-        arcpy.management.AddField(self.output_path, "distance", "DOUBLE")
-        arcpy.management.CalculateGeometryAttributes(
-            self.output_path, [["distance", "LENGTH_GEODESIC"]], "MILES_US"
-        )
-        distance = 0
-        sc = arcpy.da.SearchCursor(self.output_path, ["distance"])
-        for row in sc:
-            try:
-                distance += row[0]
-            except TypeError:
-                continue
-        del row, sc
-        return distance
-
 class CircuityCalculator:
     """Reads in data and conducts circuity analysis, producing multiple statistics"""
 
-    def __init__(self, output_name, sawmill_type, pdf_file, rd_csv=None, rd_list=None, ed_list=None):
+    def __init__(self, output_name, sawmill_type, histograms, rd_list=None, ed_list=None):
+        """histograms is a list the histogram pages of this sawmill type are added to"""
         self.output_name = output_name
         self.sawmill_type = sawmill_type
-        self.pdf_file = pdf_file
-        self.rd_csv = rd_csv
+        self.histograms = histograms
         self.rd_list = rd_list
         self.ed_list = ed_list
-        self.use_lists = True
-        if rd_csv:
-            self.use_lists = False
-        if not rd_csv and not rd_list and not ed_list:
+        if not rd_list and not ed_list:
             raise arcpy.ExecuteError("Invalid input.")
 
-    def calculate_circuity_factor_from_csv(self):
-        """Reads in road distance csv created by the road distance calculation functions. Returns coefficient
-           for each regression."""
-        rd_list = []
-        ed_list = []
-
-        rd_in = open(self.rd_csv, "r", newline="\n")
-        rd_reader = csv.reader(rd_in)
-        for row in rd_reader:
-            ed_list.append(float(row[2]))
-            rd_list.append(float(row[3]))
-        rd_in.close()
-
-        road_distance = np.array(rd_list)
-        euclidean_distance = np.array(ed_list)
-
-        self.generate_histogram(road_distance, "Road Distance")
-        self.generate_histogram(euclidean_distance, "Euclidean Distance")
-        self.generate_overlaid_histogram(
-            [road_distance, euclidean_distance],
-            ["Road Distance", "Euclidean Distance"],
-        )
-
-        df = pd.DataFrame({
-            'sl': euclidean_distance,
-            'sl_sq': euclidean_distance ** 2,
-            'rd': road_distance
-        })
-
-        X1 = sm.add_constant(df[['sl', 'sl_sq']])
-        y = df['rd']
-
-        model1 = sm.OLS(y, X1).fit()
-
-        X2 = sm.add_constant(df[['sl']])
-        model2 = sm.OLS(y, X2).fit()
-
-        X3 = df[['sl']]
-        model3 = sm.OLS(y, X3).fit()
-
-        b1 = model1.params['sl']
-        b2 = model2.params['sl']
-        b3 = model3.params['sl']
-
-        results_file = open(self.output_name, "w+")
-        results_file.write(str(model1.summary()) + "\n")
-        results_file.write(str(model2.summary()) + "\n")
-        results_file.write(str(model3.summary()) + "\n")
-        results_file.write(f"Circuity factor: {b3}")
-        results_file.close()
-
-        return b1, b2, b3
-
     def calculate_circuity_factor_from_lists(self):
         """Reads in road distance csv created by the road distance calculation functions. Returns coefficient
            for each regression."""
@@ -180,67 +191,25 @@ class CircuityCalculator:
             ["Road Distance", "Euclidean Distance"],
         )
 
-        df = pd.DataFrame({
-            'sl': euclidean_distance,
-            'sl_sq': euclidean_distance ** 2,
-            'rd': road_distance
-        })
-
-        X1 = sm.add_constant(df[['sl', 'sl_sq']])
-        y = df['rd']
-
-        model1 = sm.OLS(y, X1).fit()
-
-        X2 = sm.add_constant(df[['sl']])
-        model2 = sm.OLS(y, X2).fit()
-
-        X3 = df[['sl']]
-        model3 = sm.OLS(y, X3).fit()
-
-        b1 = model1.params['sl']
-        b2 = model2.params['sl']
-        b3 = model3.params['sl']
-
-        results_file = open(self.output_name, "w+")
-        results_file.write(str(model1.summary()) + "\n")
-        results_file.write(str(model2.summary()) + "\n")
-        results_file.write(str(model3.summary()) + "\n")
-        results_file.write(f"Circuity factor: {b3}")
-        results_file.close()
+        b1, b2, b3 = circuity_regressions(euclidean_distance, road_distance)
+        if self.output_name:
+            write_regression_report(self.output_name, euclidean_distance, road_distance)
 
         return b1, b2, b3
 
     def generate_histogram(self, arr, value_name):
-        """Generates a histogram based off an array for a sawmill type. Outputs to a pdf file."""
-        plt.hist(arr, bins=40, edgecolor="black", linewidth=1.2)
-        plt.xlim(0, 120)
-        plt.xlabel(value_name + " (Miles)")
-        plt.ylabel("Frequency")
-        plt.title(f"Histogram of {value_name} for {self.sawmill_type}")
-        self.pdf_file.savefig()
-        plt.close()
+        """Bins an array for a sawmill type into a histogram page"""
+        self.histograms.append(distance_histogram(arr, value_name, self.sawmill_type))
 
     def generate_overlaid_histogram(self, arr_list, value_list):
-        """Generates an overlaid histogram based off two arrays of both road and euclidean distance for a sawmill type.
-           Outputs to a pdf file."""
-        plt.hist(arr_list, label=value_list, bins=40, edgecolor="black", linewidth=0.5, color=["blue", "red"])
-        plt.xlim(0, 120)
-        plt.xlabel("Distance (Miles)")
-        plt.ylabel("Frequency")
-        plt.legend()
-        plt.title(f"Histogram of Road and Euclidean Distances for {self.sawmill_type}")
-        self.pdf_file.savefig()
-        plt.close()
+        """Bins road and euclidean distances for a sawmill type into an overlaid histogram page"""
+        self.histograms.append(overlaid_histogram(arr_list, value_list, self.sawmill_type))
 
     def process(self):
-        if self.use_lists:
-            b1, b2, b3 = self.calculate_circuity_factor_from_lists()
-            return b1, b2, b3
-        else:
-            b1, b2, b3 = self.calculate_circuity_factor_from_csv()
-            return b1, b2, b3
+        b1, b2, b3 = self.calculate_circuity_factor_from_lists()
+        return b1, b2, b3
 
-class CircuityFactorAnalyzer:
+class CircuityFactorAnalyzer(RouteCollector):
     """Runs the total circuity factor analysis. Collects data and calculates circuity results."""
 
     def __init__(
@@ -255,24 +224,22 @@ class CircuityFactorAnalyzer:
             single_sawmill_type,
             keep_output_paths,
             calculate_road_distances,
-            workspace
+            workspace,
+            workers=1,
+            recycle_after=1000,
+            max_worker_rss_mb=4096,
+            render_histograms=True
         ):
-        self.sl_dist_csv = sl_dist_csv
         self.output_dir = output_dir
         self.network_dataset = network_dataset
         self.sawmills = sawmills
         self.harvest_sites = harvest_sites
-        self.pairs_per_type = pairs_per_type
-        self.calculate_all = False
-        if self.pairs_per_type == "All":
-            self.calculate_all = True
-        else:
+        if pairs_per_type != "All":
             try:
-                self.pairs_per_type = int(pairs_per_type)
+                pairs_per_type = int(pairs_per_type)
             except ValueError:
                 raise arcpy.ExecuteError("Invalid pairs-per-type input.")
         self.cost = cost
-        self.single_sawmill_type = single_sawmill_type
         # set string inputs to proper boolean values
         if keep_output_paths.lower() == "true":
             self.keep_output_paths = True
@@ -283,6 +250,12 @@ class CircuityFactorAnalyzer:
         else:
             self.calculate_road_distances = False
         self.workspace = workspace
+        try:
+            workers = max(1, int(workers))
+        except ValueError:
+            raise arcpy.ExecuteError("Invalid worker count input.")
+        # histograms.pdf is drawn from the saved bin counts after the analysis, see histograms.py
+        self.render_histograms = render_histograms
         arcpy.env.workspace = self.workspace
         arcpy.env.overwriteOutput = True
         arcpy.env.addOutputsToMap = False
@@ -325,58 +298,25 @@ class CircuityFactorAnalyzer:
                 os.makedirs(output_dir)
             self.output_dir = os.path.abspath(output_dir)
 
-        # dict to store straight line distance and ids
-        self.dist_id_dict = {
-            "Lumber/Solid Wood": {},
-            "Pellet": {},
-            "Chip": {},
-            "Pulp/Paper": {},
-            "Composite Panel/Engineered Wood Product": {},
-            "Plywood/Veneer": {}
-        }
-
-        # dictionary to store multipliers
-        self.multi_dict = {
-            "Lumber/Solid Wood": [],
-            "Pellet": [],
-            "Chip": [],
-            "Pulp/Paper": [],
-            "Composite Panel/Engineered Wood Product": [],
-            "Plywood/Veneer": []
-        }
-
-        # create a pdf for histograms
-        self.pdf = PdfPages(os.path.join(output_dir, "histograms.pdf"))
-        # string for printing to log file
-        self.log_str = ""
-        # counts for successful/failed calculations
-        self.calc_counts = {
-            "Lumber/Solid Wood": 0,
-            "Pellet": 0,
-            "Chip": 0,
-            "Pulp/Paper": 0,
-            "Composite Panel/Engineered Wood Product": 0,
-            "Plywood/Veneer": 0,
-            "All": 0
-        }
-        self.dist_fail_counts = {
-            "Lumber/Solid Wood": 0,
-            "Pellet": 0,
-            "Chip": 0,
-            "Pulp/Paper": 0,
-            "Composite Panel/Engineered Wood Product": 0,
-            "Plywood/Veneer": 0,
-            "All": 0
-        }
-        self.con_fail_counts = {
-            "Lumber/Solid Wood": 0,
-            "Pellet": 0,
-            "Chip": 0,
-            "Pulp/Paper": 0,
-            "Composite Panel/Engineered Wood Product": 0,
-            "Plywood/Veneer": 0,
-            "All": 0
-        }
+        # routing backend, opened in every worker process. Routing and recording the results is done by
+        # RouteCollector, see route_collector.py.
+        districts = self.read_districts()
+        super().__init__(
+            self.create_backend(districts),
+            sl_dist_csv,
+            self.output_dir,
+            pairs_per_type,
+            single_sawmill_type,
+            self.keep_output_paths,
+            self.record_district,
+            districts,
+            workers,
+            recycle_after,
+            max_worker_rss_mb
+        )
+
+        # histogram pages with bin counts, saved to histograms.json
+        self.histograms = []
 
     def print_arc(self, string, warning=False):
         """Prints to ArcGIS and adds string to log"""
@@ -386,252 +326,62 @@ class CircuityFactorAnalyzer:
             arcpy.AddMessage(string)
         self.log_str = self.log_str + string + "\n"
 
-    def read_sl_distance_csv(self):
-        """Reads in from straight line distance csv file"""
-        sl_in = open(self.sl_dist_csv, "r", newline="\n")
-        sl_reader = csv.reader(sl_in)
-        for row in sl_reader:
-            self.dist_id_dict[row[0]][row[1]] = (row[2], row[3])
-        sl_in.close()
-
-        # remove all other sawmill types from dictionaries if desired
-        if self.single_sawmill_type != "All":
-            temp_dict = self.dist_id_dict[self.single_sawmill_type]
-            self.dist_id_dict = {self.single_sawmill_type: temp_dict}
-            self.multi_dict = {self.single_sawmill_type: []}
-
-    def calculate_road_distances_with_sampling(self):
-        """Calculates the road distances using sampling."""
-        # Z-score and margin of error values
-        z = 1.96
-        E = 0.1
-
-        self.print_arc("Starting Road Distance Calculations")
-        for sm_type in self.dist_id_dict:
-            self.print_arc(f"Starting Calculations for {sm_type}")
-            # output file for distance results so the full script doesn't have to run every time
-            csv_out = os.path.join(self.output_dir, f"{sm_type[:3]}_distance.csv")
-            output_file = open(csv_out, "w+", newline="\n")
-            output_writer = csv.writer(output_file)
-
-            oid_list = list(self.dist_id_dict[sm_type].keys())
-            rand_id_list = random.sample(oid_list, len(oid_list))
-            sample_size = self.pairs_per_type
-            count = 0
-            for i, rand_id in enumerate(rand_id_list):
-                if count == self.pairs_per_type:
-                    # calculate new sample size based on first pairs_per_type number of samples
-                    # if less than originally set sample size
-                    std_dev = np.std(self.multi_dict[sm_type])
-                    n = (z ** 2 * float(std_dev) ** 2) / E ** 2
-                    n = math.ceil(n)
-                    if n > sample_size:
-                        sample_size = n
-                        self.print_arc(f"Calculated sample size for {sm_type} is greater than {self.pairs_per_type}.")
-                        self.print_arc(f"New sample size for {sm_type} is {n}.")
-                if count == sample_size:
-                    break
-                try:
-                    # calculate route distance between harvest site and sawmill
-                    # store results in dictionary and CSV file
-                    # time.sleep(0.5)
-                    gc.collect()
-                    arcpy.management.MakeFeatureLayer(self.harvest_sites, f"harvest_site_{rand_id}")
-                    arcpy.management.MakeFeatureLayer(self.sawmills, f"sawmill_layer_{rand_id}")
-                    arcpy.management.SelectLayerByAttribute(
-                        f"harvest_site_{rand_id}",
-                        "NEW_SELECTION",
-                        f"{self.oid_field} = {rand_id}"
-                    )
-                    arcpy.management.SelectLayerByAttribute(
-                        f"sawmill_layer_{rand_id}",
-                        "NEW_SELECTION",
-                        f"OBJECTID = {self.dist_id_dict[sm_type][rand_id][0]}"
-                    )
-                    out_path = os.path.join(arcpy.env.workspace, f"path_{sm_type[:3]}_{rand_id}")
-                    route_calc = RouteFinder(
-                        self.network_dataset,
-                        f"harvest_site_{rand_id}",
-                        f"sawmill_layer_{rand_id}",
-                        out_path,
-                        self.cost)
-                    road_dist = route_calc.calculate_route_distance()
-
-                    rang_district = ""
-                    if self.record_district:
-                        with arcpy.da.SearchCursor(f"harvest_site_{rand_id}", self.hs_districts_fields) as sc:
-                            for row in sc:
-                                if row[0].strip():
-                                    rang_district = row[0]
-                                elif row[1]:
-                                    rang_district = row[1]
-                                break
-                    # time.sleep(0.5)
-                    gc.collect()
-                    if not self.keep_output_paths:
-                        arcpy.management.Delete(out_path)
-                    if road_dist == 0:
-                        self.con_fail_counts[sm_type] += 1
-                        self.con_fail_counts["All"] += 1
-                        raise arcpy.ExecuteError("Solve resulted in failure")
-                    if road_dist > 120:
-                        self.dist_fail_counts[sm_type] += 1
-                        self.dist_fail_counts["All"] += 1
-                        raise arcpy.ExecuteError("Route is longer than 120 miles")
-                    if self.record_district:
-                        output_writer.writerow(
-                            [rand_id,
-                             self.dist_id_dict[sm_type][rand_id][0],
-                             self.dist_id_dict[sm_type][rand_id][1],
-                             road_dist,
-                             rang_district]
-                        )
-                    else:
-                        output_writer.writerow(
-                            [rand_id,
-                             self.dist_id_dict[sm_type][rand_id][0],
-                             self.dist_id_dict[sm_type][rand_id][1],
-                             road_dist]
-                        )
-                    multiplier = road_dist / float(self.dist_id_dict[sm_type][rand_id][1])
-                    self.multi_dict[sm_type].append(multiplier)
-                    self.calc_counts[sm_type] += 1
-                    self.calc_counts["All"] += 1
-                except arcpy.ExecuteError as e:
-                    if str(e) != "Route is longer than 120 miles" and str(e) != "Solve resulted in failure":
-                        self.con_fail_counts[sm_type] += 1
-                        self.con_fail_counts["All"] += 1
-                    warning = f"{sm_type}:{rand_id},{self.dist_id_dict[sm_type][rand_id][0]} failed: {str(e)}"
-                    self.print_arc(warning, True)
-                    if i < len(rand_id_list) - 1:
-                        attempt_id = self.dist_id_dict[sm_type][rand_id_list[i + 1]][0]
-                        self.print_arc(f"Attempting new ID: {rand_id_list[i + 1]}, {attempt_id}")
-                        continue
-                    else:
-                        self.print_arc("No more IDs to try, skipping this distance calculation", True)
-                        break
-                finally:
-                    # delete temporary layers, feature classes, and solvers
-                    arcpy.management.Delete(f"harvest_site_{rand_id}")
-                    arcpy.management.Delete(f"sawmill_layer_{rand_id}")
-                    for name in arcpy.ListDatasets("*Solver*"):
-                        arcpy.management.Delete(name)
-                    # time.sleep(0.5)
-                    gc.collect()
-                    arcpy.management.ClearWorkspaceCache()
-                count += 1
-                if count % 5 == 0:
-                    self.print_arc(f"{count} calculations done for {sm_type}.")
-            self.print_arc(f"{sm_type} calculations have been completed. Sample size has been set to {sample_size}.")
-            output_file.close()
-
-    def calculate_road_distances_all_sites(self):
-        """Calculates the road distances for every harvest site"""
-        self.print_arc("Starting Road Distance Calculations")
-        for sm_type in self.dist_id_dict:
-            self.print_arc(f"Starting Calculations for {sm_type}")
-            # output file for distance results so the full script doesn't have to run every time
-            csv_out = os.path.join(self.output_dir, f"{sm_type[:3]}_distance.csv")
-            output_file = open(csv_out, "w+", newline="\n")
-            output_writer = csv.writer(output_file)
-
-            oid_list = list(self.dist_id_dict[sm_type].keys())
-            count = 0
-            for i, oid in enumerate(oid_list):
-                try:
-                    # calculate route distance between harvest site and sawmill
-                    # store results in dictionary and CSV file
-                    # time.sleep(0.5)
-                    gc.collect()
-                    arcpy.management.MakeFeatureLayer(self.harvest_sites, f"harvest_site_{oid}")
-                    arcpy.management.MakeFeatureLayer(self.sawmills, f"sawmill_layer_{oid}")
-                    arcpy.management.SelectLayerByAttribute(
-                        f"harvest_site_{oid}",
-                        "NEW_SELECTION",
-                        f"{self.oid_field} = {oid}"
-                    )
-                    arcpy.management.SelectLayerByAttribute(
-                        f"sawmill_layer_{oid}",
-                        "NEW_SELECTION",
-                        f"OBJECTID = {self.dist_id_dict[sm_type][oid][0]}"
-                    )
-                    out_path = os.path.join(arcpy.env.workspace, f"path_{sm_type[:3]}_{oid}")
-                    route_calc = RouteFinder(
-                        self.network_dataset,
-                        f"harvest_site_{oid}",
-                        f"sawmill_layer_{oid}",
-                        out_path,
-                        self.cost)
-                    road_dist = route_calc.calculate_route_distance()
-
-                    rang_district = ""
-                    if self.record_district:
-                        with arcpy.da.SearchCursor(f"harvest_site_{oid}", self.hs_districts_fields) as sc:
-                            for row in sc:
-                                if row[0].strip():
-                                    rang_district = row[0]
-                                elif row[1]:
-                                    rang_district = row[1]
-                                break
-                    # time.sleep(0.5)
-                    gc.collect()
-                    if not self.keep_output_paths:
-                        arcpy.management.Delete(out_path)
-                    if road_dist == 0:
-                        self.con_fail_counts[sm_type] += 1
-                        self.con_fail_counts["All"] += 1
-                        raise arcpy.ExecuteError("Solve resulted in failure")
-                    if road_dist > 120:
-                        self.dist_fail_counts[sm_type] += 1
-                        self.dist_fail_counts["All"] += 1
-                        raise arcpy.ExecuteError("Route is longer than 120 miles")
-                    if self.record_district:
-                        output_writer.writerow(
-                            [oid,
-                             self.dist_id_dict[sm_type][oid][0],
-                             self.dist_id_dict[sm_type][oid][1],
-                             road_dist,
-                             rang_district]
-                        )
-                    else:
-                        output_writer.writerow(
-                            [oid,
-                             self.dist_id_dict[sm_type][oid][0],
-                             self.dist_id_dict[sm_type][oid][1],
-                             road_dist]
-                        )
-                    multiplier = road_dist / float(self.dist_id_dict[sm_type][oid][1])
-                    self.multi_dict[sm_type].append(multiplier)
-                    self.calc_counts[sm_type] += 1
-                    self.calc_counts["All"] += 1
-                except arcpy.ExecuteError as e:
-                    if str(e) != "Route is longer than 120 miles" and str(e) != "Solve resulted in failure":
-                        self.con_fail_counts[sm_type] += 1
-                        self.con_fail_counts["All"] += 1
-                    warning = f"{sm_type}:{oid},{self.dist_id_dict[sm_type][oid][0]} failed: {str(e)}"
-                    self.print_arc(warning, True)
-                    if i < len(oid_list) - 1:
-                        msg = f"Attempting new ID: {oid_list[i + 1]}, {self.dist_id_dict[sm_type][oid_list[i + 1]][0]}"
-                        self.print_arc(msg)
-                        continue
-                    else:
-                        self.print_arc("No more IDs to try, skipping this distance calculation", True)
-                        break
-                finally:
-                    # delete temporary layers, feature classes, and solvers
-                    arcpy.management.Delete(f"harvest_site_{oid}")
-                    arcpy.management.Delete(f"sawmill_layer_{oid}")
-                    for name in arcpy.ListDatasets("*Solver*"):
-                        arcpy.management.Delete(name)
-                    # time.sleep(0.5)
-                    gc.collect()
-                    arcpy.management.ClearWorkspaceCache()
-                count += 1
-                if count % 5 == 0:
-                    self.print_arc(f"{count} calculations done for {sm_type}.")
-            msg = f"{sm_type} calculations have been completed. Sample size has been set to {count}."
-            self.print_arc(msg)
-            output_file.close()
+    def create_backend(self, districts):
+        """Creates the routing backend. A directory of road tiles from create_road_tiles.py uses the native road
+           graph, anything else is treated as a network dataset and uses Network Analyst."""
+        if os.path.isfile(os.path.join(self.network_dataset, "index.json")):
+            site_coords = self.read_point_coords(self.harvest_sites)
+            mill_coords = self.read_point_coords(self.sawmills)
+            all_coords = list(site_coords.values()) + list(mill_coords.values())
+            bbox = [
+                min(xy[0] for xy in all_coords),
+                min(xy[1] for xy in all_coords),
+                max(xy[0] for xy in all_coords),
+                max(xy[1] for xy in all_coords)
+            ]
+            return GraphRoutingBackend(
+                site_coords,
+                mill_coords,
+                self.cost,
+                tile_dir=self.network_dataset,
+                bbox=bbox,
+                districts=districts,
+                keep_output_paths=self.keep_output_paths
+            )
+        return ArcGISRoutingBackend(
+            self.network_dataset,
+            self.harvest_sites,
+            self.sawmills,
+            self.oid_field,
+            self.cost,
+            self.record_district,
+            self.hs_districts_fields,
+            self.keep_output_paths,
+            self.workspace
+        )
+
+    @staticmethod
+    def read_point_coords(fc):
+        """Reads the lon/lat of every point in a feature class keyed by OBJECTID"""
+        coords = {}
+        with arcpy.da.SearchCursor(fc, ["OID@", "SHAPE@XY"], spatial_reference=arcpy.SpatialReference(4326)) as sc:
+            for oid, xy in sc:
+                if xy and xy[0] is not None:
+                    coords[str(oid)] = xy
+        return coords
+
+    def read_districts(self):
+        """Reads the ranger district of every harvest site keyed by OBJECTID"""
+        districts = {}
+        if not self.record_district:
+            return districts
+        with arcpy.da.SearchCursor(self.harvest_sites, [self.oid_field] + self.hs_districts_fields) as sc:
+            for row in sc:
+                if row[1] and row[1].strip():
+                    districts[str(row[0])] = row[1]
+                elif row[2]:
+                    districts[str(row[0])] = row[2]
+        return districts
 
     def calculate_circuity_factor(self):
         """Calculates circuity factor from straight line and road distances"""
@@ -643,17 +393,19 @@ class CircuityFactorAnalyzer:
 
         # find circuity factor for individual sawmill types
         for sm_type in self.dist_id_dict:
-            multiplier_list = []
-            csv_in = os.path.join(self.output_dir, f"{sm_type[:3]}_distance.csv")
-            input_file = open(csv_in, "r", newline="\n")
-            in_reader = csv.reader(input_file)
-            for row in in_reader:
-                rd_list.append(float(row[3]))
-                ed_list.append(float(row[2]))
-                multiplier_list.append(float(row[3]) / float(row[2]))
-            input_file.close()
+            # successful routes of the type, the filter skips the row groups of other types
+            results = read_results(self.output_dir, sm_type=sm_type, columns=["ed", "rd"])
+            type_ed_list = results["ed"].tolist()
+            type_rd_list = results["rd"].tolist()
+            ed_list += type_ed_list
+            rd_list += type_rd_list
+            multiplier_list = [rd / ed for rd, ed in zip(type_rd_list, type_ed_list)]
             circuity_results = CircuityCalculator(
-                os.path.join(self.output_dir, f"{sm_type[:3]}_circuity_factor.txt"), sm_type, self.pdf, rd_csv=csv_in
+                os.path.join(self.output_dir, f"{sm_type[:3]}_circuity_factor.txt"),
+                sm_type,
+                self.histograms,
+                rd_list=type_rd_list,
+                ed_list=type_ed_list
             )
             b1, b2, b3 = circuity_results.process()
             self.print_arc(f"Circuity Factor for {sm_type}: {b3}")
@@ -666,7 +418,7 @@ class CircuityFactorAnalyzer:
             total_circuity_results = CircuityCalculator(
                 os.path.join(self.output_dir, f"All_circuity_factor.txt"),
                 "All Sawmills",
-                self.pdf,
+                self.histograms,
                 rd_list=rd_list,
                 ed_list=ed_list
             )
@@ -685,35 +437,16 @@ class CircuityFactorAnalyzer:
                 output_writer.writerow(row)
             output_csv.close()
 
-    def print_counts(self):
-        """Prints successful and failed calculation counts"""
-        self.print_arc("Success/Fail counts:")
-        self.print_arc("Key: distance failure count / connectivity failure count / success count")
-        for sm_type in self.calc_counts:
-            pass_count = self.calc_counts[sm_type]
-            con_fail_count = self.con_fail_counts[sm_type]
-            dist_fail_count = self.dist_fail_counts[sm_type]
-            total = pass_count + con_fail_count + dist_fail_count
-            count_str = f"{sm_type}: {dist_fail_count} / {con_fail_count} / {pass_count} ({total} total calculations)"
-            self.print_arc(count_str)
-
-    def print_log(self):
-        """Prints log"""
-        log_file = os.path.join(self.output_dir, f"log_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log")
-        with open(log_file, "w") as f:
-            f.write(self.log_str)
-
     def process(self):
         if self.calculate_road_distances:
             self.read_sl_distance_csv()
-            if self.calculate_all:
-                self.calculate_road_distances_all_sites()
-            else:
-                self.calculate_road_distances_with_sampling()
+            self.collect_road_distances()
         self.calculate_circuity_factor()
-        self.pdf.close()
+        write_histograms(os.path.join(self.output_dir, "histograms.json"), self.histograms)
         self.print_counts()
         self.print_log()
+        if self.render_histograms:
+            render_pdf(self.histograms, os.path.join(self.output_dir, "histograms.pdf"), self.workers)
 
 def main():
     sl_dist_csv = sys.argv[1]
@@ -726,6 +459,14 @@ def main():
     single_sawmill_type = sys.argv[8]
     keep_output_paths = sys.argv[9]
     calculate_road_distances = sys.argv[10]
+    # optional number of worker processes for route solves, given after the workspace
+    workers = 1
+    if len(sys.argv) > 12:
+        workers = sys.argv[12]
+    # histograms.pdf can be skipped and drawn later from histograms.json with histograms.py
+    render_histograms = True
+    if len(sys.argv) > 13:
+        render_histograms = sys.argv[13].lower() == "true"
 
     # get workspace
     try:
@@ -745,7 +486,9 @@ def main():
         single_sawmill_type,
         keep_output_paths,
         calculate_road_distances,
-        workspace
+        workspace,
+        workers,
+        render_histograms=render_histograms
     )
     cf_analysis.process()
 
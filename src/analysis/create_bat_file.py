@@ -19,7 +19,14 @@ try:
 except OSError:
     workspace = sys.argv[12]
 
-cmd = ["\"" + path + "\"" for path in [python_exe, python_script] + params + [workspace]]
+# optional number of worker processes for route solves and whether to draw the histogram PDF, forwarded in the order
+# circuity_factor.py reads them after the workspace
+optional = sys.argv[13:15]
+if len(optional) == 2 and optional[0] in ("", "#"):
+    optional[0] = "1"
+optional = [value for value in optional if value not in ("", "#")]
+
+cmd = ["\"" + path + "\"" for path in [python_exe, python_script] + params + [workspace] + optional]
 cmd = " ".join(cmd)
 cmd += "\npause\n"
 
@@ -3,36 +3,63 @@
 # Author: James Jin
 # unity ID: cjjin
 # Purpose: Creates an isochrone polygon given a point and a network dataset. Allows for multiple cutoff inputs.
+#          With the native engine the network dataset is a road tile directory from create_road_tiles.py and the
+#          isochrones are calculated without Network Analyst.
 ########################################################################################################################
 
-import arcpy, os, sys
+import os, sys
+from road_graph import TiledRoadGraph
+from service_area import ServiceAreaSolver, ServiceAreaError
+from geometry_utils import multipolygon_wkb
+from geojson_writer import GeoJSONWriter, multipolygon_geometry
+from isochrone_cache import IsochroneCache
+
+try:
+    import arcpy
+except ImportError:
+    # only the native engine is available without ArcGIS
+    arcpy = None
 
 class Isochrone:
     """Calculates the isochrone for a given point"""
 
-    def __init__(self, network_ds, lat, lon, output_dir, travel_mode, output_convex_hull, cutoffs):
+    def __init__(self, network_ds, lat, lon, output_dir, travel_mode, output_convex_hull, cutoffs, engine="arcgis",
+                 geojson_format="breaks", cache_path=None):
         self.network_ds = network_ds
         self.output_dir = output_dir
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
-        arcpy.env.workspace = self.output_dir
-        arcpy.env.overwriteOutput = True
+        self.engine = engine.lower()
+        if self.engine not in ["arcgis", "native"]:
+            raise ValueError(f"Unknown isochrone engine {engine}, expected arcgis or native")
+        self.geojson_format = geojson_format
+        # native isochrones are cached next to the road tiles unless another cache file is given
+        self.cache_path = cache_path
+        if self.engine == "native" and self.cache_path is None:
+            self.cache_path = os.path.join(self.network_ds, "isochrone_cache.sqlite")
         self.lat = lat
         self.lon = lon
-        self.point = f"point_{lat:.3f}_{lon:.3f}".replace(".", "_") + ".shp"
-
-        point_geom = arcpy.PointGeometry(arcpy.Point(lon, lat), arcpy.SpatialReference(4326))
-        arcpy.management.CreateFeatureclass(
-            self.output_dir,
-            self.point,
-            geometry_type="POINT",
-            spatial_reference=arcpy.SpatialReference(4326)
-        )
-        with arcpy.da.InsertCursor(self.point, ["SHAPE@"]) as ic:
-            ic.insertRow([point_geom])
-
-        output_isochrone = f"isochrone_{lat:.3f}_{lon:.3f}".replace(".", "_") + ".shp"
-        self.output_path = os.path.join(output_dir, output_isochrone)
+        # service areas from the native engine as [(cutoff, polygons), ...]
+        self.service_areas = []
+        output_isochrone = f"isochrone_{lat:.3f}_{lon:.3f}".replace(".", "_")
+
+        if self.engine == "native":
+            self.output_path = os.path.join(output_dir, output_isochrone + ".gpkg")
+        else:
+            arcpy.env.workspace = self.output_dir
+            arcpy.env.overwriteOutput = True
+            self.point = f"point_{lat:.3f}_{lon:.3f}".replace(".", "_") + ".shp"
+
+            point_geom = arcpy.PointGeometry(arcpy.Point(lon, lat), arcpy.SpatialReference(4326))
+            arcpy.management.CreateFeatureclass(
+                self.output_dir,
+                self.point,
+                geometry_type="POINT",
+                spatial_reference=arcpy.SpatialReference(4326)
+            )
+            with arcpy.da.InsertCursor(self.point, ["SHAPE@"]) as ic:
+                ic.insertRow([point_geom])
+            self.output_path = os.path.join(output_dir, output_isochrone + ".shp")
         self.travel_mode = travel_mode
         if self.travel_mode == "Length":
             self.cutoffs = [int(cutoff) for cutoff in cutoffs.split(";")]
@@ -83,6 +110,26 @@ class Isochrone:
 
         return self.output_path
 
+    def calculate_isochrone_native(self):
+        """Calculates every cutoff from one search on the road tiles and writes the polygons to a GeoPackage"""
+        graph = TiledRoadGraph(self.network_ds)
+        cache = IsochroneCache(self.cache_path)
+        solver = ServiceAreaSolver(graph, self.travel_mode, cache=cache)
+        hull = "convex" if self.output_convex_hull else "concave"
+        try:
+            self.service_areas = solver.solve(self.lon, self.lat, self.cutoffs, hull)
+        except ServiceAreaError as e:
+            raise ValueError(f"Solve resulted in a failure: {e}")
+        finally:
+            cache.close()
+        # GDAL is only needed when the GeoPackage is written
+        from geopackage_writer import GeoPackageWriter
+        fields = [("FromBreak", "DOUBLE"), ("ToBreak", "DOUBLE")]
+        with GeoPackageWriter(self.output_path, "isochrone", fields, "MULTIPOLYGON") as writer:
+            for cutoff, polygons in self.service_areas:
+                writer.add({"FromBreak": 0, "ToBreak": cutoff}, multipolygon_wkb(polygons))
+        return self.output_path
+
     def convex_hull(self):
         """Creates new feature class from isochrones with convex hull"""
         arcpy.management.MinimumBoundingGeometry(
@@ -113,40 +160,57 @@ class Isochrone:
 
         layer.symbology = sym
 
-    def fc_to_geojson(self):
-        """Split the output fc into individual geojson files"""
-        desc = arcpy.Describe(self.output_path)
-        oid_field = desc.OIDFieldName
-
-        temp_layer = "temp_layer"
-        arcpy.management.MakeFeatureLayer(self.output_path, temp_layer)
-
-        with arcpy.da.SearchCursor(temp_layer, [oid_field, "ToBreak"]) as sc:
+    def break_features(self):
+        """Yields (properties, GeoJSON geometry) for every break, read in one pass from the output"""
+        if self.engine == "native":
+            for cutoff, polygons in self.service_areas:
+                yield {"FromBreak": 0, "ToBreak": cutoff}, multipolygon_geometry(polygons)
+            return
+        fields = ["FromBreak", "ToBreak", "SHAPE@"]
+        with arcpy.da.SearchCursor(self.output_path, fields, spatial_reference=arcpy.SpatialReference(4326)) as sc:
             for row in sc:
-                arcpy.management.SelectLayerByAttribute(
-                    temp_layer,
-                    "NEW_SELECTION",
-                    f"{oid_field} = {row[0]}"
-                )
-                to_break = float(row[1])
-                if self.travel_mode == "Time":
-                    to_break = int(to_break * 60)
-                json_out = f"isochrone_{self.lat:.3f}_{self.lon:.3f}_{to_break}".replace(".", "_") + ".json"
-                if self.output_convex_hull:
-                    json_out = "convex_hull_" + json_out
-                arcpy.conversion.FeaturesToJSON(
-                    temp_layer,
-                    out_json_file=os.path.join(self.output_dir, json_out),
-                    geoJSON="GEOJSON"
-                )
-        arcpy.management.Delete(temp_layer)
+                yield {"FromBreak": row[0], "ToBreak": row[1]}, row[2].__geo_interface__
+
+    def geojson_name(self, to_break=None, extension=".json"):
+        """Output file name for one break or for all of them"""
+        name = f"isochrone_{self.lat:.3f}_{self.lon:.3f}"
+        if to_break is not None:
+            to_break = float(to_break)
+            if self.travel_mode == "Time":
+                to_break = int(round(to_break * 60))
+            name += f"_{to_break}"
+        name = name.replace(".", "_") + extension
+        if self.output_convex_hull:
+            name = "convex_hull_" + name
+        return os.path.join(self.output_dir, name)
+
+    def fc_to_geojson(self, output_format="breaks"):
+        """Writes the isochrones to GeoJSON: one file per break ("breaks"), one FeatureCollection ("collection") or
+           newline-delimited GeoJSON ("lines")"""
+        if output_format == "breaks":
+            for properties, geometry in self.break_features():
+                with GeoJSONWriter(self.geojson_name(properties["ToBreak"])) as writer:
+                    writer.add(properties, geometry)
+        elif output_format in ["collection", "lines"]:
+            newline_delimited = output_format == "lines"
+            path = self.geojson_name(extension=".geojsonl" if newline_delimited else ".geojson")
+            with GeoJSONWriter(path, newline_delimited) as writer:
+                for properties, geometry in self.break_features():
+                    writer.add(properties, geometry)
+        else:
+            raise ValueError(f"Unknown GeoJSON format {output_format}, expected breaks, collection or lines")
 
     def process(self):
+        if self.engine == "native":
+            # the hull is built by the engine and there is no map to symbolize outside ArcGIS Pro
+            self.calculate_isochrone_native()
+            self.fc_to_geojson(self.geojson_format)
+            return
         self.calculate_isochrone()
         if self.output_convex_hull:
             self.convex_hull()
         self.set_symbology()
-        self.fc_to_geojson()
+        self.fc_to_geojson(self.geojson_format)
 
 def main():
     network_dataset = sys.argv[1]
@@ -156,8 +220,20 @@ def main():
     travel_mode = sys.argv[5]
     output_convex_hull = sys.argv[6]
     cutoffs = sys.argv[7]
-
-    isochrone = Isochrone(network_dataset, lat, lon, output_dir, travel_mode, output_convex_hull, cutoffs)
+    engine = "arcgis"
+    if len(sys.argv) > 8:
+        engine = sys.argv[8]
+    geojson_format = "breaks"
+    if len(sys.argv) > 9:
+        geojson_format = sys.argv[9]
+    cache_path = None
+    if len(sys.argv) > 10:
+        cache_path = sys.argv[10]
+
+    isochrone = Isochrone(
+        network_dataset, lat, lon, output_dir, travel_mode, output_convex_hull, cutoffs, engine, geojson_format,
+        cache_path
+    )
     isochrone.process()
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+########################################################################################################################
+# create_road_tiles.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Builds the tiled road store used by road_graph.py from one or more prepared road feature classes (the
+#          nd_ roads inside the Transportation feature dataset). Overlapping regional road feature classes can be
+#          passed together, duplicated roads are only stored once, so every region can share one national network.
+# Usage: <tile directory> <tile size in degrees> <roads feature class> [<roads feature class> ...]
+########################################################################################################################
+
+import sys, os, json, hashlib
+import numpy as np
+from road_graph import quantize, node_key, tile_key, tile_file_name, write_tile, TILE_INDEX
+
+class RoadTileBuilder:
+    """Splits roads into fixed lat/lon tiles. A road crossing a tile border is written to both tiles so searches can
+       cross into the neighbouring tile."""
+
+    def __init__(self, tile_dir, tile_size=0.5):
+        self.tile_dir = tile_dir
+        if not os.path.exists(self.tile_dir):
+            os.makedirs(self.tile_dir)
+        self.tile_size = float(tile_size)
+        # tile: {"edge_ids": [], "source_oids": [], "coords": [], "lengths": [], "times": [], "directions": []}
+        self.tiles = {}
+        self.seen_roads = set()
+        self.edge_count = 0
+        self.duplicate_count = 0
+
+    def add_road(self, source_oid, coords, length, time, direction=0):
+        """Adds one road given as a list of (lon, lat) vertices"""
+        coords = np.asarray(coords, dtype=np.float64)
+        if len(coords) < 2:
+            return
+        qx, qy = quantize(coords[:, 0], coords[:, 1])
+        u = int(node_key(qx[0], qy[0]))
+        v = int(node_key(qx[-1], qy[-1]))
+        # roads from overlapping regions are identical once quantized, a road digitized the other way round is the
+        # same road with its oneway direction flipped
+        vertices = np.column_stack((qx, qy))
+        key_direction = direction
+        if (v, u) < (u, v):
+            vertices = vertices[::-1]
+            key_direction = -direction
+        road_key = (hashlib.blake2b(np.ascontiguousarray(vertices).tobytes(), digest_size=16).digest(),
+                    round(length, 6), key_direction)
+        if road_key in self.seen_roads:
+            self.duplicate_count += 1
+            return
+        self.seen_roads.add(road_key)
+
+        edge_id = self.edge_count
+        self.edge_count += 1
+        keys = {tile_key(coords[0][0], coords[0][1], self.tile_size),
+                tile_key(coords[-1][0], coords[-1][1], self.tile_size)}
+        for key in keys:
+            if key not in self.tiles:
+                self.tiles[key] = {
+                    "edge_ids": [],
+                    "source_oids": [],
+                    "coords": [],
+                    "lengths": [],
+                    "times": [],
+                    "directions": []
+                }
+            tile = self.tiles[key]
+            tile["edge_ids"].append(edge_id)
+            tile["source_oids"].append(source_oid)
+            tile["coords"].append(coords)
+            tile["lengths"].append(length)
+            tile["times"].append(time)
+            tile["directions"].append(direction)
+
+    def add_feature_class(self, roads_fc):
+        """Reads a prepared roads feature class. Uses the distance, travel_time, oneway and reversed fields written
+           by the data preparation scripts."""
+        import arcpy
+        field_names = [field.name for field in arcpy.ListFields(roads_fc)]
+        fields = ["OID@", "SHAPE@", "distance", "travel_time"]
+        has_oneway = "oneway" in field_names and "reversed" in field_names
+        if has_oneway:
+            fields += ["oneway", "reversed"]
+        else:
+            arcpy.AddWarning(f"{roads_fc} has no oneway/reversed fields, all roads will be two-way")
+
+        with arcpy.da.SearchCursor(roads_fc, fields, spatial_reference=arcpy.SpatialReference(4326)) as sc:
+            for row in sc:
+                shape = row[1]
+                if shape is None or row[2] is None:
+                    continue
+                length = float(row[2])
+                time = float(row[3]) if row[3] is not None else float("inf")
+                direction = 0
+                if has_oneway and row[4] == 1:
+                    # matches the Oneway restriction on the network dataset
+                    direction = -1 if row[5] == 1 else 1
+                parts = [[(pnt.X, pnt.Y) for pnt in part if pnt] for part in shape]
+                total = sum(self._part_length(part) for part in parts) or 1.0
+                for part in parts:
+                    share = self._part_length(part) / total if len(parts) > 1 else 1.0
+                    self.add_road(row[0], part, length * share, time * share, direction)
+
+    @staticmethod
+    def _part_length(part):
+        """Planar length of a part in degrees, only used to split attributes of multipart roads"""
+        coords = np.asarray(part, dtype=np.float64)
+        if len(coords) < 2:
+            return 0.0
+        return float(np.hypot(*np.diff(coords, axis=0).T).sum())
+
+    def write(self):
+        """Writes every tile and the tile index. The index holds a fingerprint of the network for caching."""
+        digest = hashlib.sha1()
+        for key in sorted(self.tiles):
+            tile = self.tiles[key]
+            path = os.path.join(self.tile_dir, tile_file_name(key))
+            write_tile(
+                path,
+                tile["edge_ids"],
+                tile["source_oids"],
+                tile["coords"],
+                tile["lengths"],
+                tile["times"],
+                tile["directions"]
+            )
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        index = {
+            "tile_size": self.tile_size,
+            "tiles": [list(key) for key in sorted(self.tiles)],
+            "edge_count": self.edge_count,
+            "fingerprint": digest.hexdigest()
+        }
+        with open(os.path.join(self.tile_dir, TILE_INDEX), "w") as f:
+            json.dump(index, f)
+        return index
+
+def main():
+    tile_dir = sys.argv[1]
+    tile_size = float(sys.argv[2])
+    roads_fcs = sys.argv[3:]
+    if not roads_fcs:
+        print("Provide at least one roads feature class.")
+        exit(1)
+
+    builder = RoadTileBuilder(tile_dir, tile_size)
+    for roads_fc in roads_fcs:
+        builder.add_feature_class(roads_fc)
+    index = builder.write()
+    print(f"Wrote {len(index['tiles'])} tiles with {builder.edge_count} roads to {tile_dir} "
+          f"({builder.duplicate_count} duplicate roads skipped)")
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,36 @@
 # district_cf.py
 # Author: James Jin
 # unity ID: cjjin
-# Purpose: Finds circuity factors for ranger districts
+# Purpose: Finds circuity factors for ranger districts. All distance rows are read into one set of columns and
+#          the circuity factor of every district and sawmill type comes from grouped regression sums. The results
+#          are joined to the ranger districts in one GeoPackage layer through OGR, keeping their spatial reference.
+#          GDAL is only imported for the join.
 ########################################################################################################################
 
-import csv, os, sys, arcpy
-import pandas as pd
+import csv, os, sys
 import numpy as np
-import statsmodels.api as sm
+from regression import MODELS, grouped_sums, fit_from_sums
+from result_store import read_results
+
+# OGR field type names and the GeoPackageWriter types they are copied as, other types are copied as TEXT
+OGR_FIELD_TYPES = {
+    "Integer": "INTEGER",
+    "Integer64": "INTEGER",
+    "Real": "DOUBLE"
+}
+
+def open_layer(path):
+    """Opens a vector layer through OGR. Feature classes inside a file geodatabase are given as
+       <geodatabase>.gdb/<feature class>. Returns the data source, which must be kept open, and the layer."""
+    from osgeo import ogr
+    ogr.UseExceptions()
+    parts = os.path.normpath(path).split(os.sep)
+    for i, part in enumerate(parts[:-1]):
+        if part.lower().endswith(".gdb"):
+            ds = ogr.Open(os.sep.join(parts[:i + 1]))
+            return ds, ds.GetLayerByName(parts[-1])
+    ds = ogr.Open(path)
+    return ds, ds.GetLayer(0)
 
 class DistrictCF:
 
@@ -19,66 +42,83 @@ class DistrictCF:
         self.ranger_districts = ranger_districts
         self.csv_dir_list = csv_dir_list
         self.write_out = write_out
-        #sm_type: {district: [(hs_oid, sm_oid, ed, rd), (hs_oid, sm_oid, ed, rd), ...]}
-        self.district_dict = {
-            "Lumber/Solid Wood": {},
-            "Pellet": {},
-            "Chip": {},
-            "Pulp/Paper": {},
-            "Composite Panel/Engineered Wood Product": {},
-            "Plywood/Veneer": {}
-        }
+        self.sm_types = [
+            "Lumber/Solid Wood",
+            "Pellet",
+            "Chip",
+            "Pulp/Paper",
+            "Composite Panel/Engineered Wood Product",
+            "Plywood/Veneer"
+        ]
+        # compiled rows as columns: sawmill type and district indices, hs_oid, sm_oid, ed, rd and design weight
+        self.frame = None
+        # district names in the order they were first read, indexed by the frame's district column
+        self.districts = []
         # sm_type: {district: (cf, sample size)}
-        self.district_results_dict = {
-            "Lumber/Solid Wood": {},
-            "Pellet": {},
-            "Chip": {},
-            "Pulp/Paper": {},
-            "Composite Panel/Engineered Wood Product": {},
-            "Plywood/Veneer": {}
-        }
+        self.district_results_dict = {sm_type: {} for sm_type in self.sm_types}
         # district: (cf, sample size)
         self.district_total_results = {}
 
     def compile_data(self):
-        """Reads in the data from the csv outputs from circuity_factor.py/cf_all_sites.py"""
+        """Reads in the road distance results of circuity_factor.py/cf_all_sites.py from every directory. Rows
+           repeated for the same sawmill type and district are kept once, rows without a district are kept under the
+           empty district name. Sampled results keep their design weights."""
+        names = ("district", "hs_oid", "sm_oid", "ed", "rd", "weight")
+        parts = []
         for csv_dir in self.csv_dir_list:
-            for sm_type in self.district_dict:
-                csv_in = os.path.join(csv_dir, f"{sm_type[:3]}_distance.csv")
-                input_file = open(csv_in, "r", newline="\n")
-                in_reader = csv.reader(input_file)
-                for line in in_reader:
-                    if self.district_dict[sm_type].get(line[4]):
-                        if (line[0], line[1], line[2], line[3]) not in self.district_dict[sm_type][line[4]]:
-                            self.district_dict[sm_type][line[4]].append((line[0], line[1], line[2], line[3]))
-                    else:
-                        self.district_dict[sm_type][line[4]] = [(line[0], line[1], line[2], line[3])]
-                input_file.close()
+            for type_index, sm_type in enumerate(self.sm_types):
+                results = read_results(csv_dir, sm_type=sm_type, columns=list(names))
+                results["type"] = np.full(len(results["rd"]), type_index, dtype=np.int64)
+                parts.append(results)
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in ("type",) + names}
+
+        # district codes in the order the districts were first read
+        district_names, first, inverse = np.unique(columns["district"].astype(str), return_index=True,
+                                                   return_inverse=True)
+        order = np.argsort(first, kind="stable")
+        codes = np.empty(len(order), dtype=np.int64)
+        codes[order] = np.arange(len(order))
+        self.districts = district_names[order].tolist()
+
+        keys = np.empty(len(inverse), dtype=[("type", np.int64), ("district", np.int64), ("hs_oid", np.int64),
+                                             ("sm_oid", np.int64), ("ed", np.float64), ("rd", np.float64),
+                                             ("weight", np.float64)])
+        keys["district"] = codes[inverse.reshape(-1)]
+        for name in ("type", "hs_oid", "sm_oid", "ed", "rd", "weight"):
+            keys[name] = columns[name]
+        # the first of every repeated row, in the order the rows were read
+        _, keep = np.unique(keys[["type", "district", "hs_oid", "sm_oid", "ed", "rd"]], return_index=True)
+        keep.sort()
+        self.frame = {name: np.ascontiguousarray(keys[name][keep]) for name in keys.dtype.names}
+
+    def group_slopes(self, groups, group_count):
+        """Design weighted circuity factor, sample size and first row of every group of frame rows"""
+        sums = grouped_sums(groups, self.frame["ed"], self.frame["rd"], group_count, self.frame["weight"])
+        slopes = fit_from_sums(sums, MODELS["origin"])["params"][:, 0]
+        first = np.full(group_count, len(groups))
+        np.minimum.at(first, groups, np.arange(len(groups)))
+        return slopes, np.bincount(groups, minlength=group_count), first
 
     def build_results_dict(self):
-        """Calculates the circuity factor from results for each ranger district"""
-        for sm_type in self.district_dict:
-            for district in self.district_dict[sm_type]:
-                ed_list = []
-                rd_list = []
-                for site in self.district_dict[sm_type][district]:
-                    ed_list.append(float(site[2]))
-                    rd_list.append(float(site[3]))
-                road_distance = np.array(rd_list)
-                euclidean_distance = np.array(ed_list)
-
-                df = pd.DataFrame({
-                    'sl': euclidean_distance,
-                    'rd': road_distance
-                })
-                model = sm.OLS(df['rd'], df[['sl']]).fit()
-                result = model.params['sl']
-
-                self.district_results_dict[sm_type][district] = (result, len(ed_list))
+        """Calculates the circuity factor of every ranger district and sawmill type from grouped sums"""
+        district_count = len(self.districts)
+        groups = self.frame["type"] * district_count + self.frame["district"]
+        slopes, counts, first = self.group_slopes(groups, len(self.sm_types) * district_count)
+        # districts are listed in the order they were first read for each type
+        for group in np.argsort(first, kind="stable"):
+            if counts[group]:
+                sm_type = self.sm_types[group // district_count]
+                district = self.districts[group % district_count]
+                self.district_results_dict[sm_type][district] = (float(slopes[group]), int(counts[group]))
 
     def get_district_dict(self):
-        """Getter function for all Euclidean and road distances"""
-        return self.district_dict
+        """Getter function for all Euclidean and road distances as
+           {sm_type: {district: [(hs_oid, sm_oid, ed, rd), ...]}}"""
+        district_dict = {sm_type: {} for sm_type in self.sm_types}
+        for row in zip(*(self.frame[name].tolist() for name in ("type", "district", "hs_oid", "sm_oid", "ed", "rd"))):
+            type_dict = district_dict[self.sm_types[row[0]]]
+            type_dict.setdefault(self.districts[row[1]], []).append(row[2:])
+        return district_dict
 
     def get_district_results_dict(self):
         """Getter function for all results"""
@@ -99,107 +139,75 @@ class DistrictCF:
             output_file.close()
 
     def write_total_cf_output(self):
-        """Writes out the total circuity factor results for each ranger district into csv file"""
-        #district: [(ed_list, rd_list), (ed_list, rd_list), ...]
-        by_districts = {}
-        for sm_type in self.district_dict:
-            for district in self.district_dict[sm_type]:
-                compiled_list = self.district_dict[sm_type][district]
-                ed_list = [float(entry[2]) for entry in compiled_list]
-                rd_list = [float(entry[3]) for entry in compiled_list]
-                if not by_districts.get(district):
-                    by_districts[district] = []
-                by_districts[district].append((ed_list, rd_list))
-
+        """Writes out the total circuity factor results for each ranger district, all sawmill types together, into
+           csv file"""
+        slopes, counts, first = self.group_slopes(self.frame["district"], len(self.districts))
         csv_out = os.path.join(self.output_dir, f"total_cf_by_district.csv")
         output_file = open(csv_out, "w", newline="\n")
         out_writer = csv.writer(output_file)
-        for district in by_districts:
-            ed_rd_lists = by_districts[district]
-
-            ed_list = []
-            rd_list = []
-
-            for pair in ed_rd_lists:
-                ed_list += pair[0]
-                rd_list += pair[1]
-
-            road_distance = np.array(rd_list)
-            euclidean_distance = np.array(ed_list)
-
-            df = pd.DataFrame({
-                'sl': euclidean_distance,
-                'rd': road_distance
-            })
-            model = sm.OLS(df['rd'], df[['sl']]).fit()
-            result = model.params['sl']
-            out_writer.writerow([district, result, len(ed_list)])
-            self.district_total_results[district] = (result, len(ed_list))
+        for district_index, district in enumerate(self.districts):
+            result = float(slopes[district_index])
+            out_writer.writerow([district, result, int(counts[district_index])])
+            self.district_total_results[district] = (result, int(counts[district_index]))
         output_file.close()
 
     def write_compiled_data_out(self):
-        """Writes out the compiled data into a csv file"""
+        """Writes out the compiled data into a csv file, grouped by sawmill type and district"""
         csv_out = os.path.join(self.output_dir, f"compiled_data.csv")
         output_file = open(csv_out, "w", newline="\n")
         out_writer = csv.writer(output_file)
-        for sm_type in self.district_dict:
-            for district in self.district_dict[sm_type]:
-                district_entry = self.district_dict[sm_type][district]
-                for data_entry in district_entry:
-                    out_writer.writerow([sm_type, district, data_entry[2], data_entry[3]])
+        district_count = len(self.districts)
+        groups = self.frame["type"] * district_count + self.frame["district"]
+        _, _, first = self.group_slopes(groups, len(self.sm_types) * district_count)
+        # rows of a group follow each other, districts of a type in the order they were first read
+        order = np.lexsort((np.arange(len(groups)), first[groups], self.frame["type"]))
+        for i in order.tolist():
+            out_writer.writerow([
+                self.sm_types[self.frame["type"][i]],
+                self.districts[self.frame["district"][i]],
+                self.frame["ed"][i],
+                self.frame["rd"][i]
+            ])
         output_file.close()
 
-    def join_with_district_fc(self):
-        """Joins the circuity factor results with ranger districts feature class"""
-        if not os.path.exists(os.path.join(self.output_dir, "spatial_data")):
-            os.makedirs(os.path.join(self.output_dir, "spatial_data"))
-        arcpy.env.workspace = os.path.join(self.output_dir, "spatial_data")
-        arcpy.env.overwriteOutput = True
-
-        for sm_type in self.district_results_dict:
-            out_fc = f"districts_with_cf_{sm_type[:3]}.shp"
-            arcpy.management.CopyFeatures(self.ranger_districts, out_fc)
-            arcpy.management.AddField(
-                f"districts_with_cf_{sm_type[:3]}.shp",
-                "CIRCUITYFA",
-                "DOUBLE"
-            )
-            arcpy.management.AddField(
-                f"districts_with_cf_{sm_type[:3]}.shp",
-                "NUM_SITES",
-                "LONG"
-            )
-            with arcpy.da.UpdateCursor(out_fc, ["DISTRICTNA", "CIRCUITYFA", "NUM_SITES"]) as uc:
-                for row in uc:
-                    try:
-                        cf, num = self.district_results_dict[sm_type][row[0]]
-                        row[1] = cf
-                        row[2] = num
-                        uc.updateRow(row)
-                    except KeyError:
-                        continue
-
-        total_fc = f"districts_with_cf_total.shp"
-        arcpy.management.CopyFeatures(self.ranger_districts, total_fc)
-        arcpy.management.AddField(
-            f"districts_with_cf_total.shp",
-            "CIRCUITYFA",
-            "DOUBLE"
-        )
-        arcpy.management.AddField(
-            f"districts_with_cf_total.shp",
-            "NUM_SITES",
-            "LONG"
-        )
-        with arcpy.da.UpdateCursor(total_fc, ["DISTRICTNA", "CIRCUITYFA", "NUM_SITES"]) as uc:
-            for row in uc:
-                try:
-                    cf, num = self.district_total_results[row[0]]
-                    row[1] = cf
-                    row[2] = num
-                    uc.updateRow(row)
-                except KeyError:
-                    continue
+    def join_with_district_fc(self, name_field="DISTRICTNA"):
+        """Writes the ranger districts with the circuity factor and site count of every sawmill type and of all types
+           to one GeoPackage layer in the spatial reference of the districts. Each district is read and written
+           once."""
+        # GDAL is only needed for the join
+        from osgeo import ogr
+        from geopackage_writer import GeoPackageWriter
+        spatial_dir = os.path.join(self.output_dir, "spatial_data")
+        if not os.path.exists(spatial_dir):
+            os.makedirs(spatial_dir)
+        out_path = os.path.join(spatial_dir, "districts_with_cf.gpkg")
+
+        ds, layer = open_layer(self.ranger_districts)
+        layer_defn = layer.GetLayerDefn()
+        source_fields = []
+        for i in range(layer_defn.GetFieldCount()):
+            field_defn = layer_defn.GetFieldDefn(i)
+            field_type = ogr.GetFieldTypeName(field_defn.GetType())
+            source_fields.append((field_defn.GetName(), OGR_FIELD_TYPES.get(field_type, "TEXT")))
+        # CF_<type prefix> and N_<type prefix> for every type, then CF_total and N_total
+        results = [(sm_type[:3], self.district_results_dict[sm_type]) for sm_type in self.sm_types]
+        results.append(("total", self.district_total_results))
+        cf_fields = []
+        for prefix, _ in results:
+            cf_fields += [(f"CF_{prefix}", "DOUBLE"), (f"N_{prefix}", "INTEGER")]
+
+        with GeoPackageWriter(out_path, "districts_with_cf", source_fields + cf_fields, "MULTIPOLYGON",
+                              srs=layer.GetSpatialRef()) as writer:
+            for feature in layer:
+                attributes = {name: feature.GetField(name) for name, _ in source_fields}
+                district = attributes.get(name_field)
+                for prefix, district_results in results:
+                    if district in district_results:
+                        attributes[f"CF_{prefix}"], attributes[f"N_{prefix}"] = district_results[district]
+                geom = feature.GetGeometryRef()
+                writer.add(attributes, geom.ExportToWkb() if geom is not None else None)
+        ds = None
+        return out_path
 
     def process(self):
         self.compile_data()
@@ -0,0 +1,51 @@
+########################################################################################################################
+# geojson_writer.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Streams features to GeoJSON straight from geometry in memory. Features are written one at a time either
+#          inside a FeatureCollection or as newline-delimited GeoJSON (one feature per line).
+########################################################################################################################
+
+import json
+import numpy as np
+
+def multipolygon_geometry(polygons, precision=6):
+    """GeoJSON MultiPolygon from a list of polygons, each a list of (n, 2) rings"""
+    return {
+        "type": "MultiPolygon",
+        "coordinates": [[np.round(np.asarray(ring), precision).tolist() for ring in polygon] for polygon in polygons]
+    }
+
+class GeoJSONWriter:
+    """Writes features to a GeoJSON file as they are added"""
+
+    def __init__(self, path, newline_delimited=False):
+        self.path = path
+        self.newline_delimited = newline_delimited
+        self.count = 0
+        self.file = open(path, "w")
+        if not self.newline_delimited:
+            self.file.write('{"type": "FeatureCollection", "features": [\n')
+
+    def add(self, properties, geometry):
+        """Writes one feature given a dictionary of properties and a GeoJSON geometry dictionary"""
+        feature = json.dumps({"type": "Feature", "properties": properties, "geometry": geometry})
+        if self.newline_delimited:
+            self.file.write(feature + "\n")
+        else:
+            self.file.write((",\n" if self.count else "") + feature)
+        self.count += 1
+
+    def close(self):
+        if self.file is None:
+            return
+        if not self.newline_delimited:
+            self.file.write("\n]}\n")
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,64 @@
+########################################################################################################################
+# geometry_utils.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Small geometry helpers for the native road graph: Douglas-Peucker simplification and WKB encoding of
+#          coordinate arrays so geometries can be written without arcpy.
+########################################################################################################################
+
+import struct
+import numpy as np
+
+WKB_LINESTRING = 2
+WKB_POLYGON = 3
+WKB_MULTILINESTRING = 5
+WKB_MULTIPOLYGON = 6
+
+def douglas_peucker(coords, tolerance):
+    """Simplifies a line given as an (n, 2) array. Points closer than tolerance (in coordinate units) to the
+       simplified line are dropped, the end points are always kept."""
+    coords = np.asarray(coords, dtype=np.float64)
+    if tolerance is None or tolerance <= 0 or len(coords) < 3:
+        return coords
+    keep = np.zeros(len(coords), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(coords) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = coords[end] - coords[start]
+        points = coords[start + 1:end] - coords[start]
+        seg_len = np.hypot(segment[0], segment[1])
+        if seg_len == 0:
+            dists = np.hypot(points[:, 0], points[:, 1])
+        else:
+            dists = np.abs(segment[0] * points[:, 1] - segment[1] * points[:, 0]) / seg_len
+        idx = int(np.argmax(dists))
+        if dists[idx] > tolerance:
+            split = start + 1 + idx
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return coords[keep]
+
+def _points_wkb(coords):
+    coords = np.asarray(coords, dtype="<f8").reshape(-1, 2)
+    return struct.pack("<I", len(coords)) + coords.tobytes()
+
+def linestring_wkb(coords):
+    """Little endian WKB for a line string"""
+    return struct.pack("<BI", 1, WKB_LINESTRING) + _points_wkb(coords)
+
+def multilinestring_wkb(lines):
+    """Little endian WKB for a list of line strings"""
+    return struct.pack("<BII", 1, WKB_MULTILINESTRING, len(lines)) + b"".join(linestring_wkb(line) for line in lines)
+
+def polygon_wkb(rings):
+    """Little endian WKB for a polygon given as a list of rings, the first ring is the exterior"""
+    body = b"".join(_points_wkb(ring) for ring in rings)
+    return struct.pack("<BII", 1, WKB_POLYGON, len(rings)) + body
+
+def multipolygon_wkb(polygons):
+    """Little endian WKB for a list of polygons, each a list of rings"""
+    return struct.pack("<BII", 1, WKB_MULTIPOLYGON, len(polygons)) + b"".join(polygon_wkb(p) for p in polygons)
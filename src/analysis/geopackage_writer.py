@@ -0,0 +1,115 @@
+########################################################################################################################
+# geopackage_writer.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Writes features to a single GeoPackage layer through OGR. Features are buffered and written in batched
+#          transactions and the spatial index is only built once, when the writer is closed.
+########################################################################################################################
+
+import os
+from osgeo import ogr, osr
+
+ogr.UseExceptions()
+
+FIELD_TYPES = {
+    "INTEGER": ogr.OFTInteger64,
+    "DOUBLE": ogr.OFTReal,
+    "TEXT": ogr.OFTString
+}
+
+GEOMETRY_TYPES = {
+    "POINT": ogr.wkbPoint,
+    "MULTILINESTRING": ogr.wkbMultiLineString,
+    "MULTIPOLYGON": ogr.wkbMultiPolygon
+}
+
+class GeoPackageWriter:
+    """Buffered writer for one GeoPackage layer"""
+
+    def __init__(
+            self,
+            gpkg_path,
+            layer_name,
+            fields,
+            geometry_type="MULTILINESTRING",
+            epsg=4326,
+            batch_size=1000,
+            srs=None
+        ):
+        """fields is a list of (name, type) with types INTEGER, DOUBLE or TEXT. srs is an osr.SpatialReference
+           written instead of the epsg code, such as the spatial reference of a copied layer."""
+        self.gpkg_path = gpkg_path
+        self.layer_name = layer_name
+        self.fields = fields
+        self.geometry_type = geometry_type
+        self.batch_size = batch_size
+        self.buffer = []
+        self.count = 0
+
+        driver = ogr.GetDriverByName("GPKG")
+        if os.path.exists(gpkg_path):
+            self.ds = ogr.Open(gpkg_path, 1)
+            if self.ds.GetLayerByName(layer_name) is not None:
+                self.ds.DeleteLayer(layer_name)
+        else:
+            self.ds = driver.CreateDataSource(gpkg_path)
+        if srs is None:
+            srs = osr.SpatialReference()
+            srs.ImportFromEPSG(epsg)
+            srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        # the spatial index is built once in close() instead of being updated for every feature
+        self.layer = self.ds.CreateLayer(
+            layer_name,
+            srs,
+            GEOMETRY_TYPES[geometry_type],
+            options=["SPATIAL_INDEX=NO"]
+        )
+        for name, field_type in fields:
+            self.layer.CreateField(ogr.FieldDefn(name, FIELD_TYPES[field_type]))
+        self.layer_defn = self.layer.GetLayerDefn()
+
+    def add(self, attributes, wkb):
+        """Queues a feature given as a dictionary of attributes and WKB geometry"""
+        self.buffer.append((attributes, wkb))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the queued features in one transaction"""
+        if not self.buffer:
+            return
+        self.layer.StartTransaction()
+        for attributes, wkb in self.buffer:
+            feature = ogr.Feature(self.layer_defn)
+            for name, _ in self.fields:
+                value = attributes.get(name)
+                if value is not None:
+                    feature.SetField(name, value)
+            if wkb is not None:
+                geom = ogr.CreateGeometryFromWkb(bytes(wkb))
+                if self.geometry_type == "MULTILINESTRING":
+                    geom = ogr.ForceToMultiLineString(geom)
+                elif self.geometry_type == "MULTIPOLYGON":
+                    geom = ogr.ForceToMultiPolygon(geom)
+                feature.SetGeometry(geom)
+            self.layer.CreateFeature(feature)
+            feature = None
+        self.layer.CommitTransaction()
+        self.count += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        """Writes the remaining features and builds the spatial index"""
+        if self.ds is None:
+            return
+        self.flush()
+        geom_column = self.layer.GetGeometryColumn()
+        self.ds.ExecuteSQL(f"SELECT CreateSpatialIndex('{self.layer_name}', '{geom_column}')")
+        self.layer = None
+        self.ds = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,127 @@
+########################################################################################################################
+# histograms.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Histograms of road and Euclidean distances. Bin counts are computed with numpy during the analysis and
+#          saved as JSON with the results. Drawing the PDF is a separate stage that can run later or in parallel: pages
+#          are split across worker processes and the parts merged with pypdf when it is installed.
+# Usage: <histograms JSON> <output PDF> [<workers>]
+########################################################################################################################
+
+import sys, os, json
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from lazy_imports import lazy_import
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+figure = lazy_import("matplotlib.figure")
+backend_pdf = lazy_import("matplotlib.backends.backend_pdf")
+
+def histogram_page(arrays, labels, bins, title, xlabel, linewidth=1.2, colors=None):
+    """Bins one or more arrays on shared bin edges, like plt.hist with a list of arrays. Returns a page as a
+       dictionary that can be saved to JSON."""
+    arrays = [np.asarray(arr, dtype=np.float64) for arr in arrays]
+    values = np.concatenate(arrays) if arrays else np.zeros(0)
+    edges = np.histogram_bin_edges(values, bins=bins)
+    return {
+        "title": title,
+        "xlabel": xlabel,
+        "labels": labels,
+        "colors": colors,
+        "linewidth": linewidth,
+        "edges": edges.tolist(),
+        "counts": [np.histogram(arr, bins=edges)[0].tolist() for arr in arrays]
+    }
+
+def distance_histogram(arr, value_name, sm_type, bins=40):
+    """Page for the histogram of one distance for a sawmill type"""
+    return histogram_page([arr], None, bins, f"Histogram of {value_name} for {sm_type}", value_name + " (Miles)")
+
+def overlaid_histogram(arr_list, value_list, sm_type, bins=40):
+    """Page for the overlaid histogram of road and Euclidean distances for a sawmill type"""
+    return histogram_page(
+        arr_list,
+        value_list,
+        bins,
+        f"Histogram of Road and Euclidean Distances for {sm_type}",
+        "Distance (Miles)",
+        linewidth=0.5,
+        colors=["blue", "red"]
+    )
+
+def write_histograms(path, pages):
+    with open(path, "w") as output_file:
+        json.dump(pages, output_file)
+
+def read_histograms(path):
+    with open(path, "r") as input_file:
+        return json.load(input_file)
+
+def draw_page(page):
+    """Draws a page from its bin counts. Returns a matplotlib Figure."""
+    fig = figure.Figure()
+    ax = fig.subplots()
+    edges = np.asarray(page["edges"])
+    centers = [edges[:-1]] * len(page["counts"])
+    ax.hist(
+        centers if len(centers) > 1 else centers[0],
+        bins=edges,
+        weights=page["counts"] if len(centers) > 1 else page["counts"][0],
+        label=page["labels"],
+        color=page["colors"],
+        edgecolor="black",
+        linewidth=page["linewidth"]
+    )
+    ax.set_xlim(0, 120)
+    ax.set_xlabel(page["xlabel"])
+    ax.set_ylabel("Frequency")
+    if page["labels"]:
+        ax.legend()
+    ax.set_title(page["title"])
+    return fig
+
+def render_pages(pages, pdf_path):
+    """Draws pages into one PDF"""
+    with backend_pdf.PdfPages(pdf_path) as pdf:
+        for page in pages:
+            pdf.savefig(draw_page(page))
+    return pdf_path
+
+def render_pdf(pages, pdf_path, workers=1):
+    """Draws pages into a PDF. With more than one worker and pypdf installed the pages are drawn in worker
+       processes and merged in order, otherwise they are drawn here one after another."""
+    workers = max(1, min(int(workers), len(pages)))
+    if workers == 1 or pypdf is None:
+        return render_pages(pages, pdf_path)
+    size = -(-len(pages) // workers)
+    parts = [f"{pdf_path}.part{i}.pdf" for i in range(0, len(pages), size)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(render_pages, [pages[i:i + size] for i in range(0, len(pages), size)], parts))
+        writer = pypdf.PdfWriter()
+        for part in parts:
+            writer.append(part)
+        with open(pdf_path, "wb") as output_file:
+            writer.write(output_file)
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+    return pdf_path
+
+def main():
+    histograms_json = sys.argv[1]
+    pdf_path = sys.argv[2]
+    workers = 1
+    if len(sys.argv) > 3:
+        workers = int(sys.argv[3])
+    pages = read_histograms(histograms_json)
+    render_pdf(pages, pdf_path, workers)
+    print(f"{len(pages)} histograms drawn to {pdf_path}")
+
+if __name__ == "__main__":
+    main()
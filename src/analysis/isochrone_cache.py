@@ -0,0 +1,81 @@
+########################################################################################################################
+# isochrone_cache.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Persistent sqlite cache of native service area polygons. Entries are keyed by the road network
+#          fingerprint, cost, snapped origin node, hull type and cutoff, so a request for a subset of cached breaks or
+#          a nearby point snapping to the same node is answered without searching.
+########################################################################################################################
+
+import os, json, sqlite3
+import numpy as np
+
+class IsochroneCache:
+    """Stores [(cutoff, polygons), ...] service areas, polygons are lists of (n, 2) rings"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.pid = None
+
+    def connect(self):
+        # connections are not shared with forked worker processes
+        if self.conn is None or self.pid != os.getpid():
+            self.conn = sqlite3.connect(self.path, timeout=60)
+            self.pid = os.getpid()
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS isochrones ("
+                "fingerprint TEXT, cost TEXT, node INTEGER, hull TEXT, cutoff REAL, polygons TEXT, "
+                "PRIMARY KEY (fingerprint, cost, node, hull, cutoff))"
+            )
+            self.conn.commit()
+        return self.conn
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["conn"] = None
+        state["pid"] = None
+        return state
+
+    @staticmethod
+    def cutoff_key(cutoff):
+        # cutoffs in hours come from minutes / 60, rounding keeps equal inputs on the same key
+        return round(float(cutoff), 9)
+
+    def get(self, fingerprint, cost, node, hull, cutoffs):
+        """Returns {cutoff: polygons} for the cutoffs found in the cache"""
+        keys = {self.cutoff_key(cutoff): cutoff for cutoff in cutoffs}
+        rows = self.connect().execute(
+            f"SELECT cutoff, polygons FROM isochrones WHERE fingerprint = ? AND cost = ? AND node = ? AND hull = ? "
+            f"AND cutoff IN ({', '.join('?' * len(keys))})",
+            [fingerprint, cost, int(node), hull] + list(keys)
+        ).fetchall()
+        return {
+            keys[self.cutoff_key(cutoff)]: [[np.array(ring) for ring in polygon] for polygon in json.loads(polygons)]
+            for cutoff, polygons in rows
+        }
+
+    def put(self, fingerprint, cost, node, hull, areas):
+        """Stores the service areas of a node"""
+        conn = self.connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO isochrones VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        fingerprint,
+                        cost,
+                        int(node),
+                        hull,
+                        self.cutoff_key(cutoff),
+                        json.dumps([[np.asarray(ring).tolist() for ring in polygon] for polygon in polygons])
+                    )
+                    for cutoff, polygons in areas
+                ]
+            )
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,41 @@
+########################################################################################################################
+# lazy_imports.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Defers heavy imports (matplotlib, statsmodels) until they are first used, so scripts start quickly and
+#          routing worker processes, which re-import the script module, never load the plotting stack.
+########################################################################################################################
+
+import importlib, sys
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name):
+    """Returns the module if it is already imported, otherwise a LazyModule for it"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+def is_loaded(name):
+    """Whether a module has actually been imported in this process"""
+    return name in sys.modules
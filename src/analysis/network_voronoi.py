@@ -0,0 +1,108 @@
+########################################################################################################################
+# network_voronoi.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Splits a region into network Voronoi catchments, the area that is closest by road to each sawmill of a
+#          type. One multi-source search per type assigns every road to the mill it can be driven to most cheaply,
+#          one-way roads included. The assignment is rasterized (see travel_cost_surface.py), polygonized and
+#          dissolved into one polygon per mill, and is also written as a second layer with the mill of every road.
+# Usage: <road tile directory> <sawmills> <output GeoPackage> <travel mode> <cell size in degrees>
+#        <min lon,min lat,max lon,max lat> [<max cost>] [<mill type field>]
+########################################################################################################################
+
+import sys
+import numpy as np
+from osgeo import gdal, ogr
+from road_graph import TiledRoadGraph
+from point_layers import read_points_by_value
+from travel_cost_surface import TravelCostSurface, geo_transform, parse_bbox
+from raster_writer import wgs84_wkt
+from geopackage_writer import GeoPackageWriter
+from geometry_utils import multilinestring_wkb
+
+gdal.UseExceptions()
+
+def catchment_polygons(owner_grid, bbox, cell_size):
+    """Polygonizes a grid of mill OBJECTIDs (-1 where unreached) and dissolves the pieces of each mill. Returns
+       {mill OBJECTID: MultiPolygon WKB}."""
+    rows, cols = owner_grid.shape
+    raster = gdal.GetDriverByName("MEM").Create("", cols, rows, 1, gdal.GDT_Int32)
+    raster.SetGeoTransform(geo_transform(bbox, cell_size))
+    raster.SetProjection(wgs84_wkt())
+    band = raster.GetRasterBand(1)
+    band.SetNoDataValue(-1)
+    band.WriteArray(owner_grid.astype(np.int32))
+
+    vector = ogr.GetDriverByName("Memory").CreateDataSource("")
+    layer = vector.CreateLayer("pieces", geom_type=ogr.wkbPolygon)
+    layer.CreateField(ogr.FieldDefn("mill_oid", ogr.OFTInteger))
+    # the band's nodata mask keeps unreached cells out of the polygons
+    gdal.Polygonize(band, band.GetMaskBand(), layer, 0)
+
+    pieces = {}
+    for feature in layer:
+        mill = feature.GetField("mill_oid")
+        if mill not in pieces:
+            pieces[mill] = ogr.Geometry(ogr.wkbMultiPolygon)
+        pieces[mill].AddGeometry(feature.GetGeometryRef())
+    return {mill: bytes(geom.UnionCascaded().ExportToWkb()) for mill, geom in pieces.items()}
+
+class NetworkCatchments:
+    """Builds the catchments of each mill type"""
+
+    def __init__(self, graph, cost="Length", cell_size=0.01, max_cost=None):
+        self.surface = TravelCostSurface(graph, cost, cell_size, max_cost)
+        self.cell_size = cell_size
+
+    def catchments(self, mills, bbox):
+        """Returns {mill OBJECTID: MultiPolygon WKB}, the cost grid and {edge index: mill OBJECTID} for a set of
+           mills"""
+        labels, owners = self.surface.search(mills)
+        cost_grid, owner_grid = self.surface.rasterize(labels, owners, bbox)
+        polygons = catchment_polygons(owner_grid, bbox, self.cell_size)
+        return polygons, cost_grid, self.surface.edge_owners(labels, owners)
+
+    def write(self, output_path, mills_by_type, bbox):
+        """Writes the catchments of every mill type to the catchments layer and the mill of every reached road to
+           the catchment_roads layer"""
+        fields = [("mill_oid", "INTEGER"), ("mill_type", "TEXT")]
+        # edge ownership is only a pair of ints per road, so it is kept until the polygons are written
+        road_owners = {}
+        with GeoPackageWriter(output_path, "catchments", fields, "MULTIPOLYGON") as writer:
+            for mill_type, mills in mills_by_type.items():
+                polygons, cost_grid, road_owners[mill_type] = self.catchments(mills, bbox)
+                for mill, wkb in sorted(polygons.items()):
+                    writer.add({"mill_oid": mill, "mill_type": mill_type}, wkb)
+                print(f"{mill_type}: {len(polygons)} catchments for {len(mills)} mills, "
+                      f"{np.isfinite(cost_grid).mean():.1%} of the region reached")
+                if self.surface.unsnapped:
+                    print(f"  mills too far from a road: {self.surface.unsnapped}")
+        graph = self.surface.graph
+        with GeoPackageWriter(output_path, "catchment_roads", [("edge_id", "INTEGER")] + fields) as writer:
+            for mill_type, owners in road_owners.items():
+                for idx, mill in sorted(owners.items()):
+                    writer.add({"edge_id": int(graph.edge_ids[idx]), "mill_oid": mill, "mill_type": mill_type},
+                               multilinestring_wkb([graph.edge_coords(idx)]))
+        return output_path
+
+def main():
+    tile_dir = sys.argv[1]
+    sawmills = sys.argv[2]
+    output_path = sys.argv[3]
+    cost = sys.argv[4]
+    cell_size = float(sys.argv[5])
+    bbox = parse_bbox(sys.argv[6])
+    max_cost = None
+    if len(sys.argv) > 7 and sys.argv[7] != "#":
+        max_cost = float(sys.argv[7])
+    type_field = "Mill_Type"
+    if len(sys.argv) > 8:
+        type_field = sys.argv[8]
+
+    graph = TiledRoadGraph(tile_dir, bbox, load_on_demand=False)
+    catchments = NetworkCatchments(graph, cost, cell_size, max_cost)
+    catchments.write(output_path, read_points_by_value(sawmills, type_field), bbox)
+    print(f"Catchments written to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+########################################################################################################################
+# point_layers.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Reads point layers (sawmills, harvest site points) as lon/lat keyed by OBJECTID for the native road graph
+#          tools. Uses arcpy when it is available and OGR otherwise so the tools also run on Linux.
+########################################################################################################################
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+def _iter_points(point_layer, value_field=None):
+    """Yields (OBJECTID, (lon, lat), value of value_field or None) for every point"""
+    if arcpy is not None:
+        fields = ["OID@", "SHAPE@XY"] + ([value_field] if value_field else [])
+        with arcpy.da.SearchCursor(point_layer, fields, spatial_reference=arcpy.SpatialReference(4326)) as sc:
+            for row in sc:
+                if row[1] and row[1][0] is not None:
+                    yield row[0], row[1], row[2] if value_field else None
+        return
+
+    from osgeo import ogr, osr
+    ds = ogr.Open(point_layer)
+    layer = ds.GetLayer(0)
+    wgs84 = osr.SpatialReference()
+    wgs84.ImportFromEPSG(4326)
+    wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    transform = None
+    if layer.GetSpatialRef() is not None:
+        transform = osr.CoordinateTransformation(layer.GetSpatialRef(), wgs84)
+    for feature in layer:
+        geom = feature.GetGeometryRef()
+        if geom is None:
+            continue
+        if transform is not None:
+            geom.Transform(transform)
+        yield feature.GetFID(), (geom.GetX(), geom.GetY()), feature.GetField(value_field) if value_field else None
+
+def read_points(point_layer):
+    """Reads the lon/lat of every point in a layer keyed by OBJECTID"""
+    return {oid: xy for oid, xy, _ in _iter_points(point_layer)}
+
+def read_points_by_value(point_layer, value_field):
+    """Reads the points of a layer grouped by the value of a field, such as sawmills by Mill_Type. Returns
+       {value: {OBJECTID: (lon, lat)}}."""
+    groups = {}
+    for oid, xy, value in _iter_points(point_layer, value_field):
+        groups.setdefault(value, {})[oid] = xy
+    return groups
@@ -0,0 +1,47 @@
+########################################################################################################################
+# raster_writer.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Writes numpy grids to tiled, compressed GeoTIFFs in WGS84 through GDAL
+########################################################################################################################
+
+import numpy as np
+from osgeo import gdal, osr
+
+gdal.UseExceptions()
+
+GDAL_TYPES = {
+    np.dtype(np.float32): gdal.GDT_Float32,
+    np.dtype(np.float64): gdal.GDT_Float64,
+    np.dtype(np.int32): gdal.GDT_Int32,
+    np.dtype(np.uint8): gdal.GDT_Byte
+}
+
+def wgs84_wkt():
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    return srs.ExportToWkt()
+
+def write_geotiff(path, grid, geo_transform, nodata=None, block_size=256):
+    """Writes a 2D array as a single band GeoTIFF with internal tiles and DEFLATE compression"""
+    grid = np.asarray(grid)
+    predictor = "3" if np.issubdtype(grid.dtype, np.floating) else "2"
+    options = [
+        "TILED=YES",
+        f"BLOCKXSIZE={block_size}",
+        f"BLOCKYSIZE={block_size}",
+        "COMPRESS=DEFLATE",
+        f"PREDICTOR={predictor}",
+        "BIGTIFF=IF_SAFER"
+    ]
+    driver = gdal.GetDriverByName("GTiff")
+    ds = driver.Create(path, grid.shape[1], grid.shape[0], 1, GDAL_TYPES[grid.dtype], options=options)
+    ds.SetGeoTransform(geo_transform)
+    ds.SetProjection(wgs84_wkt())
+    band = ds.GetRasterBand(1)
+    if nodata is not None:
+        band.SetNoDataValue(nodata)
+    band.WriteArray(grid)
+    band.FlushCache()
+    ds = None
+    return path
@@ -0,0 +1,224 @@
+########################################################################################################################
+# regression.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Closed form versions of the three circuity regressions of road distance (y) on straight-line distance (x):
+#          quadratic with intercept (b1), linear with intercept (b2) and through the origin (b3, the circuity factor).
+#          Coefficients, standard errors and R² are computed from the sums n, Σx, Σy, Σx², Σxy, Σx³, Σx⁴, Σx²y and Σy²,
+#          vectorized over any leading axes so groups and bootstrap replicates are fitted without a model each.
+#          statsmodels is only used to write the full report. RegressionAccumulator keeps the sums per group while
+#          routes are being solved so the circuity factor can be read at any time.
+########################################################################################################################
+
+import csv
+from functools import partial
+import numpy as np
+from lazy_imports import lazy_import
+
+# only needed for the report
+sm = lazy_import("statsmodels.api")
+
+# order of the sums along the last axis
+SUM_FIELDS = ("n", "x", "y", "xx", "xy", "xxx", "xxxx", "xxy", "yy")
+
+# powers of x in the design matrix of each model
+MODELS = {
+    "quadratic": (0, 1, 2),
+    "linear": (0, 1),
+    "origin": (1,)
+}
+
+def regression_sums(x, y, weights=None):
+    """Sums of x and y along the last axis, stacked on a new last axis in SUM_FIELDS order. With weights every term
+       is weighted, n becomes the sum of the weights and the fits are weighted least squares."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    xx = x * x
+    if weights is not None:
+        w = np.broadcast_to(np.asarray(weights, dtype=np.float64), x.shape)
+        wx = w * x
+        wxx = wx * x
+        return np.stack([
+            w.sum(axis=-1),
+            wx.sum(axis=-1),
+            (w * y).sum(axis=-1),
+            wxx.sum(axis=-1),
+            (wx * y).sum(axis=-1),
+            (wxx * x).sum(axis=-1),
+            (wxx * xx).sum(axis=-1),
+            (wxx * y).sum(axis=-1),
+            (w * y * y).sum(axis=-1)
+        ], axis=-1)
+    return np.stack([
+        np.full(x.shape[:-1], x.shape[-1], dtype=np.float64),
+        x.sum(axis=-1),
+        y.sum(axis=-1),
+        xx.sum(axis=-1),
+        (x * y).sum(axis=-1),
+        (xx * x).sum(axis=-1),
+        (xx * xx).sum(axis=-1),
+        (xx * y).sum(axis=-1),
+        (y * y).sum(axis=-1)
+    ], axis=-1)
+
+def grouped_sums(groups, x, y, group_count, weights=None):
+    """Sums of x and y for every group in one pass. groups holds an integer group index per pair. With weights the
+       sums are weighted like regression_sums. Returns a (group_count, len(SUM_FIELDS)) array."""
+    groups = np.asarray(groups, dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    xx = x * x
+    terms = (None, x, y, xx, x * y, xx * x, xx * xx, xx * y, y * y)
+    if weights is not None:
+        w = np.asarray(weights, dtype=np.float64)
+        terms = [w] + [w * term for term in terms[1:]]
+    return np.stack([np.bincount(groups, weights=term, minlength=group_count) for term in terms], axis=-1)
+
+def fit_from_sums(sums, powers):
+    """Least squares fit of y on the given powers of x. Returns a dictionary with params and bse (coefficients and
+       standard errors in the order of powers), rsquared (uncentered without an intercept, like statsmodels),
+       nobs and df_resid. NaN where the model cannot be fitted."""
+    sums = np.asarray(sums, dtype=np.float64)
+    n, sx, sy, sxx, sxy, sxxx, sxxxx, sxxy, syy = np.moveaxis(sums, -1, 0)
+    x_moments = [n, sx, sxx, sxxx, sxxxx]
+    xy_moments = [sy, sxy, sxxy]
+    k = len(powers)
+    # x is scaled by its mean so the normal equations stay well conditioned
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where((sx != 0) & (n > 0), sx / n, 1.0)
+        xtx = np.stack([
+            np.stack([x_moments[p + q] / s ** (p + q) for q in powers], axis=-1) for p in powers
+        ], axis=-2)
+        xty = np.stack([xy_moments[p] / s ** p for p in powers], axis=-1)
+    shape = np.shape(n)
+    params = np.full(shape + (k,), np.nan)
+    bse = np.full(shape + (k,), np.nan)
+    rss = np.full(shape, np.nan)
+    df_resid = n - k
+    solvable = np.isfinite(xtx).all(axis=(-2, -1)) & (np.abs(np.linalg.det(xtx)) > 1e-12 * np.maximum(n, 1) ** k)
+    if solvable.any():
+        inverse = np.linalg.inv(xtx[solvable])
+        beta = (inverse @ xty[solvable][..., None])[..., 0]
+        rss[solvable] = np.maximum(syy[solvable] - (beta * xty[solvable]).sum(axis=-1), 0)
+        scale = np.asarray([s ** p for p in powers])
+        scale = np.moveaxis(scale, 0, -1)[solvable]
+        params[solvable] = beta / scale
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sigma2 = np.where(df_resid[solvable] > 0, rss[solvable] / df_resid[solvable], np.nan)
+        bse[solvable] = np.sqrt(sigma2[..., None] * np.diagonal(inverse, axis1=-2, axis2=-1)) / scale
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if 0 in powers:
+            rsquared = 1 - rss / (syy - sy * sy / n)
+        else:
+            rsquared = 1 - rss / syy
+    return {"params": params, "bse": bse, "rsquared": rsquared, "nobs": n, "df_resid": df_resid}
+
+def fit_models(sums):
+    """Fits all three models. Returns {model name: fit} with the names of MODELS."""
+    return {name: fit_from_sums(sums, powers) for name, powers in MODELS.items()}
+
+def coefficients_from_sums(sums):
+    """Returns (b1, b2, b3): the x coefficient of the quadratic and linear models with intercept and the slope
+       through the origin"""
+    fits = fit_models(sums)
+    return fits["quadratic"]["params"][..., 1], fits["linear"]["params"][..., 1], fits["origin"]["params"][..., 0]
+
+def circuity_regressions(ed, rd, weights=None):
+    """Returns (b1, b2, b3) for straight-line (ed) and road (rd) distances, weighted by sampling weights if given"""
+    b1, b2, b3 = coefficients_from_sums(regression_sums(ed, rd, weights))
+    return float(b1), float(b2), float(b3)
+
+def write_regression_report(output_name, ed, rd, weights=None):
+    """Writes the statsmodels summaries of the three models and the circuity factor to a text file. The models are
+       fitted with WLS when weights are given."""
+    sl = np.asarray(ed, dtype=np.float64)
+    y = np.asarray(rd, dtype=np.float64)
+    if weights is None:
+        fit = sm.OLS
+    else:
+        fit = partial(sm.WLS, weights=np.asarray(weights, dtype=np.float64))
+    model1 = fit(y, sm.add_constant(np.column_stack((sl, sl ** 2)))).fit()
+    model2 = fit(y, sm.add_constant(sl)).fit()
+    model3 = fit(y, sl).fit()
+    with open(output_name, "w+") as results_file:
+        results_file.write(str(model1.summary(xname=["const", "sl", "sl_sq"], yname="rd")) + "\n")
+        results_file.write(str(model2.summary(xname=["const", "sl"], yname="rd")) + "\n")
+        results_file.write(str(model3.summary(xname=["sl"], yname="rd")) + "\n")
+        results_file.write(f"Circuity factor: {model3.params[0]}")
+
+class RegressionAccumulator:
+    """Running sums of (x, y) pairs per group, updated one pair at a time. The three models can be read for any
+       group at any moment without the data, and accumulators from separate runs merge by adding their sums."""
+
+    def __init__(self, sums=None):
+        # group: sums in SUM_FIELDS order
+        self.sums = {}
+        for group, group_sums in (sums or {}).items():
+            self.sums[group] = np.array(group_sums, dtype=np.float64)
+
+    def add(self, group, x, y):
+        """Adds one pair to a group"""
+        x = float(x)
+        y = float(y)
+        xx = x * x
+        if group not in self.sums:
+            self.sums[group] = np.zeros(len(SUM_FIELDS))
+        self.sums[group] += (1, x, y, xx, x * y, xx * x, xx * xx, xx * y, y * y)
+
+    def update(self, group, x, y):
+        """Adds arrays of pairs to a group"""
+        if len(x):
+            if group not in self.sums:
+                self.sums[group] = np.zeros(len(SUM_FIELDS))
+            self.sums[group] += regression_sums(x, y)
+
+    def count(self, group):
+        return int(self.sums[group][0]) if group in self.sums else 0
+
+    def total(self):
+        """Sums of all groups together"""
+        return sum(self.sums.values(), np.zeros(len(SUM_FIELDS)))
+
+    def fits(self, group=None):
+        """Fits of the three models for a group, or for all groups together when group is None"""
+        if group is None:
+            return fit_models(self.total())
+        return fit_models(self.sums.get(group, np.zeros(len(SUM_FIELDS))))
+
+    def coefficients(self, group=None):
+        """Returns (b1, b2, b3) for a group, or for all groups together when group is None"""
+        fits = self.fits(group)
+        return (
+            float(fits["quadratic"]["params"][1]),
+            float(fits["linear"]["params"][1]),
+            float(fits["origin"]["params"][0])
+        )
+
+    def __add__(self, other):
+        merged = RegressionAccumulator(self.sums)
+        merged += other
+        return merged
+
+    def __iadd__(self, other):
+        for group, group_sums in other.sums.items():
+            if group in self.sums:
+                self.sums[group] = self.sums[group] + group_sums
+            else:
+                self.sums[group] = np.array(group_sums, dtype=np.float64)
+        return self
+
+    def write_csv(self, path):
+        """Writes one row per group: the group followed by its sums"""
+        with open(path, "w", newline="\n") as output_file:
+            out_writer = csv.writer(output_file)
+            out_writer.writerow(("group",) + SUM_FIELDS)
+            for group, group_sums in self.sums.items():
+                out_writer.writerow([group] + [repr(float(value)) for value in group_sums])
+
+    @classmethod
+    def read_csv(cls, path):
+        """Reads an accumulator written by write_csv"""
+        with open(path, "r", newline="\n") as input_file:
+            in_reader = csv.reader(input_file)
+            next(in_reader)
+            return cls({row[0]: [float(value) for value in row[1:]] for row in in_reader})
@@ -0,0 +1,216 @@
+########################################################################################################################
+# result_store.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Typed, columnar store of road distance results with one row per harvest site/sawmill type route. Results
+#          are written to results.parquet when pyarrow is installed, rows are buffered per sawmill type and every row
+#          group holds a single type sorted by district, so reads filtered by type skip the row groups of the other
+#          types. Without pyarrow they go to results.csv with a header. Readers get numpy columns and also accept
+#          directories of the older <type prefix>_distance.csv files.
+########################################################################################################################
+
+import os, csv
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+SM_TYPES = [
+    "Lumber/Solid Wood",
+    "Pellet",
+    "Chip",
+    "Pulp/Paper",
+    "Composite Panel/Engineered Wood Product",
+    "Plywood/Veneer"
+]
+
+# column name and type, time is the travel time of the route and NaN when the solver does not accumulate it, weight
+# is the design weight of a sampled route (the number of routes it stands for) and 1 for routes that were all solved
+SCHEMA = [
+    ("type", "TEXT"),
+    ("hs_oid", "INTEGER"),
+    ("sm_oid", "INTEGER"),
+    ("ed", "DOUBLE"),
+    ("rd", "DOUBLE"),
+    ("time", "DOUBLE"),
+    ("district", "TEXT"),
+    ("status", "TEXT"),
+    ("weight", "DOUBLE")
+]
+
+# values of columns missing from results written before the columns were added
+DEFAULTS = {"weight": "1.0"}
+
+NUMPY_TYPES = {"TEXT": object, "INTEGER": np.int64, "DOUBLE": np.float64}
+
+PARQUET_NAME = "results.parquet"
+CSV_NAME = "results.csv"
+
+def arrow_schema():
+    arrow_types = {"TEXT": pa.string(), "INTEGER": pa.int64(), "DOUBLE": pa.float64()}
+    return pa.schema([(name, arrow_types[column_type]) for name, column_type in SCHEMA])
+
+def legacy_csv_name(sm_type):
+    return f"{sm_type[:3]}_distance.csv"
+
+class ResultWriter:
+    """Buffered writer of distance results to a directory"""
+
+    def __init__(self, output_dir, batch_size=10000):
+        self.batch_size = batch_size
+        # sm_type: [row, ...]
+        self.rows = {}
+        self.count = 0
+        self.writer = None
+        self.output_file = None
+        if pq is not None:
+            self.path = os.path.join(output_dir, PARQUET_NAME)
+            self.writer = pq.ParquetWriter(self.path, arrow_schema())
+        else:
+            self.path = os.path.join(output_dir, CSV_NAME)
+            self.output_file = open(self.path, "w", newline="\n")
+            self.writer = csv.writer(self.output_file)
+            self.writer.writerow([name for name, _ in SCHEMA])
+
+    def add(self, sm_type, hs_oid, sm_oid, ed, rd, time=np.nan, district="", status="ok", weight=1.0):
+        """Queues one result"""
+        rows = self.rows.setdefault(sm_type, [])
+        rows.append((sm_type, int(hs_oid), int(sm_oid), float(ed), float(rd), float(time), district or "", status,
+                     float(weight)))
+        if len(rows) >= self.batch_size:
+            self.flush_type(sm_type)
+
+    def flush_type(self, sm_type):
+        """Writes the queued results of a sawmill type, as one row group sorted by district with pyarrow"""
+        rows = self.rows.pop(sm_type, [])
+        if not rows:
+            return
+        if pq is not None:
+            rows.sort(key=lambda row: row[6])
+            columns = list(zip(*rows))
+            self.writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, arrow_schema())],
+                schema=arrow_schema()
+            ), row_group_size=len(rows))
+        else:
+            self.writer.writerows(rows)
+            self.output_file.flush()
+        self.count += len(rows)
+
+    def flush(self):
+        for sm_type in list(self.rows):
+            self.flush_type(sm_type)
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.flush()
+        if pq is not None:
+            self.writer.close()
+        else:
+            self.output_file.close()
+        self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+def write_results(output_dir, results):
+    """Writes a dictionary of result columns, as returned by read_results, to a directory"""
+    with ResultWriter(output_dir) as writer:
+        for row in zip(*(results[name].tolist() for name, _ in SCHEMA)):
+            writer.add(*row)
+        return writer.path
+
+def _empty_columns(columns):
+    return {name: np.zeros(0, dtype=NUMPY_TYPES[column_type]) for name, column_type in SCHEMA if name in columns}
+
+def _rows_to_columns(rows, columns):
+    """Builds numpy columns from rows given in SCHEMA order"""
+    if not rows:
+        return _empty_columns(columns)
+    values = list(zip(*rows))
+    return {
+        name: np.array(values[i], dtype=NUMPY_TYPES[column_type])
+        for i, (name, column_type) in enumerate(SCHEMA) if name in columns
+    }
+
+def _read_parquet(path, filters, columns):
+    stored = set(pq.read_schema(path).names)
+    table = pq.read_table(path, columns=[name for name in columns if name in stored],
+                          filters=[(name, "=", value) for name, value in filters] or None)
+    results = {}
+    for name in columns:
+        if name not in stored:
+            results[name] = np.full(table.num_rows, float(DEFAULTS[name]))
+            continue
+        column = table.column(name)
+        if column.num_chunks == 1:
+            column = column.chunk(0)
+        # numeric columns without nulls are not copied
+        results[name] = column.to_numpy(zero_copy_only=False)
+    return results
+
+def _read_csv(path, filters, columns):
+    rows = []
+    with open(path, "r", newline="\n") as input_file:
+        in_reader = csv.reader(input_file)
+        header = next(in_reader)
+        positions = [header.index(name) if name in header else None for name, _ in SCHEMA]
+        filter_positions = [(header.index(name), str(value)) for name, value in filters]
+        for line in in_reader:
+            if all(line[i] == value for i, value in filter_positions):
+                rows.append(tuple(line[i] if i is not None else DEFAULTS[name]
+                                  for i, (name, _) in zip(positions, SCHEMA)))
+    return _rows_to_columns(rows, columns)
+
+def _read_legacy(output_dir, filters, columns):
+    """Reads <type prefix>_distance.csv files, rows are hs_oid, sm_oid, ed, rd and an optional district"""
+    wanted = dict(filters)
+    rows = []
+    found = False
+    for sm_type in SM_TYPES:
+        if "type" in wanted and wanted["type"] != sm_type:
+            continue
+        csv_in = os.path.join(output_dir, legacy_csv_name(sm_type))
+        if not os.path.exists(csv_in):
+            continue
+        found = True
+        with open(csv_in, "r", newline="\n") as input_file:
+            for line in csv.reader(input_file):
+                district = line[4] if len(line) > 4 else ""
+                row = (sm_type, line[0], line[1], line[2], line[3], "nan", district, "ok", DEFAULTS["weight"])
+                if all(row[i] == str(wanted[name]) for i, (name, _) in enumerate(SCHEMA) if name in wanted):
+                    rows.append(row)
+    if not found:
+        raise FileNotFoundError(f"No road distance results in {output_dir}")
+    return _rows_to_columns(rows, columns)
+
+def results_path(output_dir):
+    """Path of the result store in a directory, None if there is only legacy CSV data or nothing"""
+    for name in (PARQUET_NAME, CSV_NAME):
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+def read_results(output_dir, sm_type=None, district=None, status="ok", columns=None):
+    """Reads the results in a directory as a dictionary of numpy columns, keeping rows of a sawmill type, a district
+       and a status when they are given. Raises FileNotFoundError if the directory holds no results."""
+    columns = columns or [name for name, _ in SCHEMA]
+    filters = [(name, value) for name, value in (("type", sm_type), ("district", district), ("status", status))
+               if value is not None]
+    path = results_path(output_dir)
+    if path is None:
+        return _read_legacy(output_dir, filters, columns)
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise ImportError(f"pyarrow is needed to read {path}")
+        return _read_parquet(path, filters, columns)
+    return _read_csv(path, filters, columns)
@@ -0,0 +1,445 @@
+########################################################################################################################
+# road_graph.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Native road graph built from the tiled road store created by create_road_tiles.py. Tiles are fixed
+#          lat/lon squares so every physiographic region can share one preprocessed national network. Only the tiles
+#          intersecting a region's boundary are loaded up front, border tiles are loaded when a search reaches them.
+########################################################################################################################
+
+import os, json, math, heapq
+import numpy as np
+from geometry_utils import douglas_peucker, multilinestring_wkb
+
+# coordinates are stored as integers in millionths of a degree so nodes from neighbouring tiles match exactly
+COORD_SCALE = 1000000
+EARTH_RADIUS_MILES = 3958.7613
+TILE_INDEX = "index.json"
+
+def quantize(lon, lat):
+    """Converts a lon/lat pair (or arrays of them) to integer coordinates"""
+    qx = np.rint(np.asarray(lon) * COORD_SCALE).astype(np.int64)
+    qy = np.rint(np.asarray(lat) * COORD_SCALE).astype(np.int64)
+    return qx, qy
+
+def node_key(qx, qy):
+    """Packs quantized coordinates into a single integer node id"""
+    return qx * 4294967296 + (qy + 2147483648)
+
+def node_coords(node):
+    """Unpacks a node id back into lon/lat"""
+    qx, qy = divmod(int(node), 4294967296)
+    return qx / COORD_SCALE, (qy - 2147483648) / COORD_SCALE
+
+def haversine_miles(lon1, lat1, lon2, lat2):
+    """Great circle distance in miles, works on scalars or arrays"""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+def tile_key(lon, lat, tile_size):
+    """Returns the (column, row) of the tile containing a point"""
+    return int(math.floor(lon / tile_size)), int(math.floor(lat / tile_size))
+
+def tile_file_name(key):
+    """File name for a tile"""
+    return f"tile_{key[0]}_{key[1]}.npz"
+
+def tiles_for_bbox(bbox, tile_size):
+    """Lists the tiles intersecting a bounding box [min_lon, min_lat, max_lon, max_lat]"""
+    min_col, min_row = tile_key(bbox[0], bbox[1], tile_size)
+    max_col, max_row = tile_key(bbox[2], bbox[3], tile_size)
+    return [(col, row) for col in range(min_col, max_col + 1) for row in range(min_row, max_row + 1)]
+
+def write_tile(path, edge_ids, source_oids, coords_list, lengths, times, directions):
+    """Writes one tile. Edge vertices are stored as one flat array with offsets so geometry can be rebuilt later."""
+    counts = np.array([len(coords) for coords in coords_list], dtype=np.int64)
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if coords_list:
+        vertices = np.concatenate([np.asarray(coords, dtype=np.float64) for coords in coords_list])
+    else:
+        vertices = np.zeros((0, 2), dtype=np.float64)
+    qx, qy = quantize(vertices[:, 0], vertices[:, 1])
+    np.savez_compressed(
+        path,
+        edge_ids=np.asarray(edge_ids, dtype=np.int64),
+        source_oids=np.asarray(source_oids, dtype=np.int64),
+        offsets=offsets,
+        qx=qx.astype(np.int32),
+        qy=qy.astype(np.int32),
+        lengths=np.asarray(lengths, dtype=np.float64),
+        times=np.asarray(times, dtype=np.float64),
+        directions=np.asarray(directions, dtype=np.int8)
+    )
+
+def read_tile(path):
+    """Reads one tile into a dictionary of arrays"""
+    with np.load(path) as tile:
+        return {name: tile[name] for name in tile.files}
+
+class RoadGraph:
+    """Directed road graph with length and time costs. Edges keep their vertices for geometry reconstruction."""
+
+    def __init__(self, snap_cell_size=0.01):
+        # node: [(neighbour, edge index), ...]
+        self.adj = {}
+        # node: [(neighbour, edge index), ...] of the edges leading into the node, for searches towards sources
+        self.radj = {}
+        self.edge_ids = []
+        self.edge_lengths = []
+        self.edge_times = []
+        self.edge_nodes = []
+        # edge index: (quantized vertex array, start, end)
+        self.edge_vertices = []
+        self.edge_index = {}
+        self.snap_cell_size = snap_cell_size
+        # snapping cell: [node, ...]
+        self.snap_grid = {}
+
+    def add_tile(self, tile):
+        """Adds the edges of a tile to the graph, skipping edges already loaded from a neighbouring tile"""
+        offsets = tile["offsets"]
+        vertices = np.column_stack((tile["qx"], tile["qy"])).astype(np.int64)
+        for i, edge_id in enumerate(tile["edge_ids"].tolist()):
+            if edge_id in self.edge_index:
+                continue
+            start, end = int(offsets[i]), int(offsets[i + 1])
+            self.add_edge(
+                edge_id,
+                vertices,
+                start,
+                end,
+                float(tile["lengths"][i]),
+                float(tile["times"][i]),
+                int(tile["directions"][i])
+            )
+
+    def add_edge(self, edge_id, vertices, start, end, length, time, direction=0):
+        """Adds an edge. Direction is 0 for two-way roads, 1 for travel along the digitized direction only and -1
+           for travel against it only."""
+        u = int(node_key(vertices[start][0], vertices[start][1]))
+        v = int(node_key(vertices[end - 1][0], vertices[end - 1][1]))
+        idx = len(self.edge_ids)
+        self.edge_index[edge_id] = idx
+        self.edge_ids.append(edge_id)
+        self.edge_lengths.append(length)
+        self.edge_times.append(time)
+        self.edge_nodes.append((u, v))
+        self.edge_vertices.append((vertices, start, end))
+        for node in (u, v):
+            if node not in self.adj:
+                self.adj[node] = []
+                self.radj[node] = []
+                lon, lat = node_coords(node)
+                cell = (math.floor(lon / self.snap_cell_size), math.floor(lat / self.snap_cell_size))
+                self.snap_grid.setdefault(cell, []).append(node)
+        if direction >= 0:
+            self.adj[u].append((v, idx))
+            self.radj[v].append((u, idx))
+        if direction <= 0:
+            self.adj[v].append((u, idx))
+            self.radj[u].append((v, idx))
+
+    def neighbours(self, node):
+        """Returns the outgoing (neighbour, edge index) pairs of a node"""
+        return self.adj.get(node, [])
+
+    def incoming(self, node):
+        """Returns the (neighbour, edge index) pairs of the edges that can be travelled into a node"""
+        return self.radj.get(node, [])
+
+    def edge_costs(self, cost):
+        """Returns the cost list for a travel mode"""
+        if cost == "Length":
+            return self.edge_lengths
+        if cost == "Time":
+            return self.edge_times
+        raise ValueError(f"Unknown cost {cost}, expected Length or Time")
+
+    def nearest_node(self, lon, lat, max_distance=None):
+        """Snaps a point to the closest graph node. Returns (node, distance in miles) or (None, None)."""
+        col = math.floor(lon / self.snap_cell_size)
+        row = math.floor(lat / self.snap_cell_size)
+        best_node = None
+        best_dist = None
+        for ring in range(201):
+            for cell in self._ring_cells(col, row, ring):
+                for node in self.snap_grid.get(cell, []):
+                    n_lon, n_lat = node_coords(node)
+                    dist = float(haversine_miles(lon, lat, n_lon, n_lat))
+                    if best_dist is None or dist < best_dist:
+                        best_node = node
+                        best_dist = dist
+            # every node in the outer rings is at least this far away, cells are narrower on the ground in longitude
+            gap = self._ring_gap(lon, lat, col, row, ring)
+            if (best_dist is not None and gap >= best_dist) or (max_distance is not None and gap > max_distance):
+                break
+        if best_node is not None and max_distance is not None and best_dist > max_distance:
+            return None, None
+        return best_node, best_dist
+
+    def _ring_gap(self, lon, lat, col, row, ring):
+        """Shortest distance in miles from a point to the cells outside the square of rings 0 to ring around its
+           cell. The distance to a meridian is asin(cos(lat) sin(d_lon)) and to a parallel the latitude difference."""
+        d_lat = min(lat - (row - ring) * self.snap_cell_size, (row + ring + 1) * self.snap_cell_size - lat)
+        d_lon = min(lon - (col - ring) * self.snap_cell_size, (col + ring + 1) * self.snap_cell_size - lon)
+        lon_gap = math.asin(min(1.0, math.cos(math.radians(lat)) * math.sin(math.radians(min(d_lon, 90.0)))))
+        return EARTH_RADIUS_MILES * min(math.radians(d_lat), lon_gap)
+
+    @staticmethod
+    def _ring_cells(col, row, ring):
+        """Cells on the perimeter of the square ring around a cell"""
+        if ring == 0:
+            return [(col, row)]
+        cells = [(c, r) for c in range(col - ring, col + ring + 1) for r in (row - ring, row + ring)]
+        cells += [(c, r) for c in (col - ring, col + ring) for r in range(row - ring + 1, row + ring)]
+        return cells
+
+    def search(self, sources, cost="Length", max_cost=None, targets=None, reverse=False):
+        """Multi-source Dijkstra. Sources map node to a starting cost (or are a list of nodes starting at 0).
+           Stops at max_cost or once every target is settled. Returns the settled costs, the predecessor
+           (node, edge index) of each node and the source each node was reached from. With reverse the edges are
+           followed against their travel direction, so the costs are those of travelling from each node to its
+           cheapest source."""
+        if not isinstance(sources, dict):
+            sources = {node: 0.0 for node in sources}
+        costs = self.edge_costs(cost)
+        labels = {}
+        pred = {}
+        origin = {}
+        best = {}
+        heap = []
+        for node, start_cost in sources.items():
+            if node not in best or start_cost < best[node]:
+                best[node] = start_cost
+                pred[node] = None
+                origin[node] = node
+                heapq.heappush(heap, (start_cost, node))
+        remaining = set(targets) if targets else None
+        edges_of = self.incoming if reverse else self.neighbours
+        while heap:
+            d, node = heapq.heappop(heap)
+            if node in labels:
+                continue
+            if max_cost is not None and d > max_cost:
+                break
+            labels[node] = d
+            if remaining is not None:
+                remaining.discard(node)
+                if not remaining:
+                    break
+            for nbr, idx in edges_of(node):
+                if nbr in labels:
+                    continue
+                nd = d + costs[idx]
+                if nbr not in best or nd < best[nbr]:
+                    best[nbr] = nd
+                    pred[nbr] = (node, idx)
+                    origin[nbr] = origin[node]
+                    heapq.heappush(heap, (nd, nbr))
+        return labels, {node: pred[node] for node in labels}, {node: origin[node] for node in labels}
+
+    def shortest_path(self, source, target, cost="Length"):
+        """Finds the cheapest path between two nodes. Returns (cost, [edge index, ...]) or (None, None)."""
+        labels, pred, _ = self.search([source], cost, targets=[target])
+        if target not in labels:
+            return None, None
+        edges = []
+        node = target
+        while pred[node] is not None:
+            node, idx = pred[node]
+            edges.append(idx)
+        edges.reverse()
+        return labels[target], edges
+
+    def path_ids(self, source, edges):
+        """Converts the edge indices of a path starting at source into compact signed edge ids, +(id + 1) when the
+           edge is travelled in its digitized direction and -(id + 1) when travelled against it"""
+        signed = np.empty(len(edges), dtype=np.int64)
+        node = source
+        for i, idx in enumerate(edges):
+            u, v = self.edge_nodes[idx]
+            if u == node:
+                signed[i] = self.edge_ids[idx] + 1
+                node = v
+            else:
+                signed[i] = -(self.edge_ids[idx] + 1)
+                node = u
+        return signed
+
+    def edge_coords(self, idx):
+        """Lon/lat vertices of an edge in its digitized direction"""
+        vertices, start, end = self.edge_vertices[idx]
+        return vertices[start:end] / COORD_SCALE
+
+    def load_path(self, source, path_ids):
+        """Makes sure every edge of a path is loaded, they always are in a graph without tiles"""
+        pass
+
+    def route_coords(self, path_ids, tolerance=None):
+        """Rebuilds a route's coordinates from its signed edge ids. A tolerance (in degrees) simplifies the line with
+           Douglas-Peucker."""
+        parts = []
+        for signed_id in np.asarray(path_ids).tolist():
+            coords = self.edge_coords(self.edge_index[abs(signed_id) - 1])
+            if signed_id < 0:
+                coords = coords[::-1]
+            # consecutive edges share their joining vertex
+            if parts:
+                coords = coords[1:]
+            parts.append(coords)
+        if not parts:
+            return np.zeros((0, 2), dtype=np.float64)
+        return douglas_peucker(np.concatenate(parts), tolerance)
+
+class RoutePathStore:
+    """Keeps routes as compact signed edge id sequences (see RoadGraph.path_ids). Geometry is only rebuilt from the
+       graph's edge vertices when it is asked for. The source node of a route lets a tiled graph load the tiles the
+       route passes through."""
+
+    def __init__(self, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.paths = []
+        # source node of every route, 0 when unknown
+        self.sources = []
+        self.attributes = []
+
+    def __len__(self):
+        return len(self.paths)
+
+    def add(self, path_ids, source=None, **attributes):
+        """Stores a route with its source node and attributes"""
+        self.paths.append(np.asarray(path_ids, dtype=np.int64))
+        self.sources.append(int(source) if source is not None else 0)
+        self.attributes.append(attributes)
+
+    def geometry(self, i, graph, tolerance=None):
+        """Rebuilds the coordinates of a stored route"""
+        if self.sources[i]:
+            graph.load_path(self.sources[i], self.paths[i])
+        return graph.route_coords(self.paths[i], tolerance)
+
+    def write_geopackage(self, writer, graph, tolerance=None):
+        """Rebuilds every route and writes it with its attributes to a GeoPackageWriter"""
+        for i in range(len(self.paths)):
+            writer.add(self.attributes[i], multilinestring_wkb([self.geometry(i, graph, tolerance)]))
+
+    def save(self, path):
+        """Saves the edge id sequences as one flat array with offsets"""
+        counts = np.array([len(ids) for ids in self.paths], dtype=np.int64)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        ids = np.concatenate(self.paths) if self.paths else np.zeros(0, dtype=np.int64)
+        np.savez_compressed(
+            path,
+            offsets=offsets,
+            ids=ids,
+            sources=np.array(self.sources, dtype=np.int64),
+            attributes=np.array(json.dumps(self.attributes)),
+            fingerprint=np.array(self.fingerprint or "")
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Loads a store saved with save()"""
+        with np.load(path) as data:
+            store = cls(str(data["fingerprint"]) or None)
+            offsets = data["offsets"]
+            ids = data["ids"]
+            store.paths = [ids[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+            store.sources = data["sources"].tolist()
+            store.attributes = json.loads(str(data["attributes"]))
+        return store
+
+class TiledRoadGraph(RoadGraph):
+    """Road graph backed by a directory of tiles. Tiles intersecting the run's boundary are loaded up front and any
+       border tile reached during a search is loaded on demand. With load_on_demand off, searches stay inside the
+       preloaded tiles."""
+
+    def __init__(self, tile_dir, bbox=None, snap_cell_size=0.01, load_on_demand=True):
+        super().__init__(snap_cell_size)
+        self.tile_dir = tile_dir
+        self.load_on_demand = load_on_demand
+        with open(os.path.join(tile_dir, TILE_INDEX), "r") as f:
+            self.index = json.load(f)
+        self.tile_size = self.index["tile_size"]
+        self.fingerprint = self.index["fingerprint"]
+        self.available_tiles = {tuple(key) for key in self.index["tiles"]}
+        self.loaded_tiles = set()
+        if bbox is not None:
+            self.load_bbox(bbox)
+
+    @classmethod
+    def from_boundary(cls, tile_dir, boundary_fc, snap_cell_size=0.01):
+        """Creates a graph loading the tiles that intersect a boundary feature class, such as the 125-mile buffer
+           from create_boundaries.py"""
+        import arcpy
+        extent = arcpy.Describe(boundary_fc).extent
+        if extent.spatialReference and extent.spatialReference.factoryCode not in (None, 0, 4326):
+            extent = extent.projectAs(arcpy.SpatialReference(4326))
+        bbox = [extent.XMin, extent.YMin, extent.XMax, extent.YMax]
+        return cls(tile_dir, bbox, snap_cell_size)
+
+    def load_tile(self, key):
+        """Loads a tile if it exists and has not been loaded yet"""
+        if key in self.loaded_tiles:
+            return
+        self.loaded_tiles.add(key)
+        if key not in self.available_tiles:
+            return
+        self.add_tile(read_tile(os.path.join(self.tile_dir, tile_file_name(key))))
+
+    def load_bbox(self, bbox):
+        """Loads every tile intersecting a bounding box [min_lon, min_lat, max_lon, max_lat]"""
+        for key in tiles_for_bbox(bbox, self.tile_size):
+            self.load_tile(key)
+
+    def load_path(self, source, path_ids):
+        """Walks a path from its source node, loading the tile of every node on it. Edges are stored in the tiles of
+           both their end points, so this loads every edge of the path."""
+        node = source
+        for signed_id in np.asarray(path_ids).tolist():
+            lon, lat = node_coords(node)
+            self.load_tile(tile_key(lon, lat, self.tile_size))
+            u, v = self.edge_nodes[self.edge_index[abs(signed_id) - 1]]
+            node = v if signed_id > 0 else u
+
+    def neighbours(self, node):
+        """Loads the node's tile before returning its edges so searches can leave the preloaded area"""
+        if self.load_on_demand:
+            lon, lat = node_coords(node)
+            self.load_tile(tile_key(lon, lat, self.tile_size))
+        return self.adj.get(node, [])
+
+    def incoming(self, node):
+        """Loads the node's tile before returning the edges into it"""
+        if self.load_on_demand:
+            lon, lat = node_coords(node)
+            self.load_tile(tile_key(lon, lat, self.tile_size))
+        return self.radj.get(node, [])
+
+    def nearest_node(self, lon, lat, max_distance=None):
+        """Loads the tiles within reach of the point before snapping. The closest node in the point's own tile bounds
+           the search radius, neighbouring tiles inside that radius (or max_distance if smaller) are loaded too since
+           a point near a tile border can be closest to a node across it."""
+        if self.load_on_demand:
+            self.load_tile(tile_key(lon, lat, self.tile_size))
+            _, radius = super().nearest_node(lon, lat)
+            if max_distance is not None:
+                radius = max_distance if radius is None else min(radius, max_distance)
+            if radius is None:
+                # nothing to snap to in the point's tile, try the tiles around it
+                col, row = tile_key(lon, lat, self.tile_size)
+                for key in self._ring_cells(col, row, 1):
+                    self.load_tile(key)
+            else:
+                self.load_bbox(self.radius_bbox(lon, lat, radius))
+        return super().nearest_node(lon, lat, max_distance)
+
+    @staticmethod
+    def radius_bbox(lon, lat, radius):
+        """Bounding box [min_lon, min_lat, max_lon, max_lat] of a circle with a radius in miles"""
+        d_lat = math.degrees(radius / EARTH_RADIUS_MILES)
+        d_lon = d_lat / max(math.cos(math.radians(min(abs(lat) + d_lat, 89.9))), 1e-6)
+        return [lon - d_lon, lat - d_lat, lon + d_lon, lat + d_lat]
@@ -0,0 +1,374 @@
+########################################################################################################################
+# route_collector.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Solves the harvest site/sawmill routes of every sawmill type through a routing backend and records the
+#          results: road distances in the result store, running regression sums, multipliers and success/failure
+#          counts. Sampling stops once the margin of error of each type's mean multiplier is met. Nothing here needs
+#          arcpy, circuity_factor.py adds the ArcGIS inputs and messages on top.
+########################################################################################################################
+
+import csv, os, random, datetime
+from functools import partial
+from sampling import AdaptiveStoppingRule
+from regression import RegressionAccumulator
+from route_executor import RecyclingProcessPool, SamplingScheduler, completed_future
+from routing_backend import RouteSolveError
+from result_store import ResultWriter, SM_TYPES
+from road_graph import RoutePathStore
+
+def run_route_task(backend, task):
+    """Solves a (hs_oid, sm_oid) task. Returns ("ok", road distance, district, route) or ("error", message)."""
+    hs_oid, sm_oid = task
+    try:
+        road_dist, rang_district, route = backend.solve(hs_oid, sm_oid)
+        return "ok", road_dist, rang_district, route
+    except RouteSolveError as e:
+        return "error", str(e)
+
+# routing backend of the current worker process, opened once and reused for every pair
+_worker_backend = None
+
+def init_route_worker(backend):
+    """Sets up a worker process"""
+    global _worker_backend
+    backend.open()
+    _worker_backend = backend
+
+def solve_route_task(task):
+    """Solves a task in a worker process"""
+    return run_route_task(_worker_backend, task)
+
+class RouteCollector:
+    """Solves and records the routes from harvest sites to their nearest sawmill of each type"""
+
+    def __init__(
+            self,
+            backend,
+            sl_dist_csv,
+            output_dir,
+            pairs_per_type,
+            single_sawmill_type="All",
+            keep_output_paths=False,
+            record_district=False,
+            districts=None,
+            workers=1,
+            recycle_after=1000,
+            max_worker_rss_mb=4096
+        ):
+        """pairs_per_type is the minimum sample size of each type or "All" to route every harvest site. districts maps
+           hs_oid to its ranger district."""
+        self.backend = backend
+        self.sl_dist_csv = sl_dist_csv
+        self.output_dir = output_dir
+        self.pairs_per_type = pairs_per_type
+        self.calculate_all = pairs_per_type == "All"
+        self.single_sawmill_type = single_sawmill_type
+        self.keep_output_paths = keep_output_paths
+        self.record_district = record_district
+        self.districts = districts or {}
+        self.workers = workers
+        # worker processes are replaced after this many pairs or once one uses more memory than this
+        self.recycle_after = recycle_after
+        self.max_worker_rss_mb = max_worker_rss_mb
+        self.executor = None
+        # kept routes are written to one GeoPackage layer instead of a feature class per route
+        self.route_writer = None
+        # routes the backend returns as edge ids, their geometry is rebuilt once solving is done
+        self.route_paths = RoutePathStore()
+        # road distance results of every sawmill type, see result_store.py
+        self.result_writer = None
+
+        # sm_type: {hs_oid: (sm_oid, straight line distance)}
+        self.dist_id_dict = {sm_type: {} for sm_type in SM_TYPES}
+        # (hs_oid, sm_oid): [sm_type, ...], a sawmill with several types is the nearest mill for more than one type
+        self.unique_pairs = {}
+        # (hs_oid, sm_oid): (road distance, route) or the error message, kept for pairs shared by several types. The
+        # route is (None, None, travel time) unless routes are kept, then it holds the backend's route so the kept
+        # path is written for every type sharing the pair
+        self.pair_results = {}
+        # sm_type: [multiplier, ...]
+        self.multi_dict = {sm_type: [] for sm_type in SM_TYPES}
+        # sawmill types whose sample size was raised above pairs_per_type
+        self.size_increased = set()
+
+        # running regression sums of the solved routes by sawmill type and by ranger district
+        self.type_sums = RegressionAccumulator()
+        self.district_sums = RegressionAccumulator()
+
+        # string for printing to log file
+        self.log_str = ""
+        # counts for successful/failed calculations
+        self.calc_counts = {sm_type: 0 for sm_type in SM_TYPES + ["All"]}
+        self.dist_fail_counts = {sm_type: 0 for sm_type in SM_TYPES + ["All"]}
+        self.con_fail_counts = {sm_type: 0 for sm_type in SM_TYPES + ["All"]}
+
+    def print_arc(self, string, warning=False):
+        """Prints a message and adds it to the log"""
+        print(string)
+        self.log_str = self.log_str + string + "\n"
+
+    def read_sl_distance_csv(self):
+        """Reads in from straight line distance csv file"""
+        sl_in = open(self.sl_dist_csv, "r", newline="\n")
+        sl_reader = csv.reader(sl_in)
+        for row in sl_reader:
+            self.dist_id_dict[row[0]][row[1]] = (row[2], row[3])
+        sl_in.close()
+
+        # remove all other sawmill types from dictionaries if desired
+        if self.single_sawmill_type != "All":
+            temp_dict = self.dist_id_dict[self.single_sawmill_type]
+            self.dist_id_dict = {self.single_sawmill_type: temp_dict}
+            self.multi_dict = {self.single_sawmill_type: []}
+        self.build_unique_pairs()
+
+    def build_unique_pairs(self):
+        """Finds the unique harvest site/sawmill pairs across all sawmill types"""
+        self.unique_pairs = {}
+        total = 0
+        for sm_type in self.dist_id_dict:
+            for hs_oid in self.dist_id_dict[sm_type]:
+                pair = (hs_oid, self.dist_id_dict[sm_type][hs_oid][0])
+                self.unique_pairs.setdefault(pair, []).append(sm_type)
+                total += 1
+        self.print_arc(f"{len(self.unique_pairs)} unique harvest site/sawmill pairs for {total} sawmill type entries")
+
+    def create_executor(self):
+        """Creates the pool of worker processes used to solve routes, a single worker included. The pool is recycled
+           to keep the solver's memory growth out of long runs and rebuilt if a worker crashes, results come back to
+           this process which keeps the writers and counters."""
+        return RecyclingProcessPool(
+            self.workers,
+            initializer=init_route_worker,
+            initargs=(self.backend,),
+            max_tasks=self.recycle_after * self.workers if self.recycle_after else None,
+            max_rss_mb=self.max_worker_rss_mb
+        )
+
+    def submit_pair(self, task):
+        """Submits a (hs_oid, sm_oid) task. Pairs already solved for another sawmill type reuse the earlier
+           result."""
+        cached = self.pair_results.get(task)
+        if isinstance(cached, str):
+            return completed_future(("error", cached))
+        if cached is not None:
+            road_dist, route = cached
+            return completed_future(("ok", road_dist, self.districts.get(task[0], ""), route))
+        return self.executor.submit(solve_route_task, task)
+
+    def cache_result(self, task, result):
+        """Keeps the road distance and time (or the error) of a pair another sawmill type will draw too, with the
+           route itself when routes are kept"""
+        if len(self.unique_pairs.get(task, ())) < 2 or task in self.pair_results:
+            return
+        if result[0] == "error":
+            self.pair_results[task] = result[1]
+        elif self.keep_output_paths:
+            self.pair_results[task] = (result[1], result[3])
+        else:
+            self.pair_results[task] = (result[1], (None, None, result[3][2]))
+
+    def record_route(self, sm_type, hs_oid, road_dist, rang_district, route=None):
+        """Checks a solved route and stores it in the result store and the sawmill type's multiplier list. Returns
+           the multiplier."""
+        if road_dist == 0:
+            self.con_fail_counts[sm_type] += 1
+            self.con_fail_counts["All"] += 1
+            raise RouteSolveError("Solve resulted in failure")
+        if road_dist > 120:
+            self.dist_fail_counts[sm_type] += 1
+            self.dist_fail_counts["All"] += 1
+            raise RouteSolveError("Route is longer than 120 miles")
+        self.result_writer.add(
+            sm_type,
+            hs_oid,
+            self.dist_id_dict[sm_type][hs_oid][0],
+            self.dist_id_dict[sm_type][hs_oid][1],
+            road_dist,
+            route[2] if route is not None and route[2] is not None else float("nan"),
+            rang_district if self.record_district else ""
+        )
+        if route is not None and route[0] is not None and self.route_writer is not None:
+            geometry, total_length, total_time = route
+            attributes = {
+                "hs_oid": int(hs_oid),
+                "sm_oid": int(self.dist_id_dict[sm_type][hs_oid][0]),
+                "type": sm_type,
+                "length": total_length,
+                "time": total_time,
+                "cost": road_dist
+            }
+            if isinstance(geometry, bytes):
+                self.route_writer.add(attributes, geometry)
+            else:
+                source, path_ids = geometry
+                self.route_paths.add(path_ids, source, **attributes)
+        multiplier = road_dist / float(self.dist_id_dict[sm_type][hs_oid][1])
+        self.multi_dict[sm_type].append(multiplier)
+        self.type_sums.add(sm_type, self.dist_id_dict[sm_type][hs_oid][1], road_dist)
+        if self.record_district and rang_district:
+            self.district_sums.add(rang_district, self.dist_id_dict[sm_type][hs_oid][1], road_dist)
+        self.calc_counts[sm_type] += 1
+        self.calc_counts["All"] += 1
+        return multiplier
+
+    def record_failure(self, sm_type, hs_oid, error):
+        """Counts and reports a failed route for a sawmill type"""
+        if str(error) != "Route is longer than 120 miles" and str(error) != "Solve resulted in failure":
+            self.con_fail_counts[sm_type] += 1
+            self.con_fail_counts["All"] += 1
+        warning = f"{sm_type}:{hs_oid},{self.dist_id_dict[sm_type][hs_oid][0]} failed: {str(error)}"
+        self.print_arc(warning, True)
+        self.result_writer.add(
+            sm_type,
+            hs_oid,
+            self.dist_id_dict[sm_type][hs_oid][0],
+            self.dist_id_dict[sm_type][hs_oid][1],
+            float("nan"),
+            status="failed"
+        )
+
+    def handle_sampled_route(self, sm_type, stopping_rule, task, result):
+        """Records a route drawn for a sawmill type while sampling. Returns the multiplier or None on failure."""
+        hs_oid = task[0]
+        self.cache_result(task, result)
+        try:
+            if result[0] == "error":
+                raise RouteSolveError(result[1])
+            multiplier = self.record_route(sm_type, hs_oid, result[1], result[2], result[3])
+        except RouteSolveError as e:
+            self.record_failure(sm_type, hs_oid, e)
+            return None
+        count = stopping_rule.count + 1
+        if sm_type not in self.size_increased and count >= self.pairs_per_type:
+            sample_size = stopping_rule.required_size()
+            if sample_size > self.pairs_per_type:
+                self.size_increased.add(sm_type)
+                self.print_arc(f"Calculated sample size for {sm_type} is greater than {self.pairs_per_type}.")
+                self.print_arc(f"New sample size for {sm_type} is {sample_size}.")
+        if count % 5 == 0:
+            self.print_arc(f"{count} calculations done for {sm_type}. {self.running_cf(sm_type)}")
+        return multiplier
+
+    def running_cf(self, sm_type):
+        """Describes the circuity factor of the routes solved so far for a sawmill type and for all types"""
+        b3 = self.type_sums.coefficients(sm_type)[2]
+        total_b3 = self.type_sums.coefficients()[2]
+        return f"Running circuity factor: {b3:.4f} ({total_b3:.4f} for all types)"
+
+    def write_running_sums(self):
+        """Writes the regression sums so results of separate runs can be merged"""
+        self.type_sums.write_csv(os.path.join(self.output_dir, "type_regression_sums.csv"))
+        if self.record_district:
+            self.district_sums.write_csv(os.path.join(self.output_dir, "district_regression_sums.csv"))
+
+    def calculate_road_distances_with_sampling(self):
+        """Calculates the road distances using sampling. Routes are solved in batches by the worker pool and
+           accepted in the order they were drawn, so the sample is the same as solving them one at a time."""
+        # Z-score and margin of error values
+        z = 1.96
+        E = 0.1
+
+        self.print_arc("Starting Road Distance Calculations")
+        self.size_increased = set()
+        for sm_type in self.dist_id_dict:
+            self.print_arc(f"Starting Calculations for {sm_type}")
+            oid_list = list(self.dist_id_dict[sm_type].keys())
+            rand_id_list = random.sample(oid_list, len(oid_list))
+            tasks = [(rand_id, self.dist_id_dict[sm_type][rand_id][0]) for rand_id in rand_id_list]
+            # running statistics of the multipliers, the required sample size is re-evaluated after every route
+            stopping_rule = AdaptiveStoppingRule(self.pairs_per_type, z, E)
+            scheduler = SamplingScheduler(self.submit_pair, self.workers)
+            scheduler.run(
+                tasks,
+                partial(self.handle_sampled_route, sm_type, stopping_rule),
+                stopping_rule
+            )
+            if not stopping_rule.done():
+                self.print_arc("No more IDs to try, sample size could not be reached", True)
+            msg = f"{sm_type} calculations have been completed. Sample size has been set to {stopping_rule.count}."
+            self.print_arc(msg)
+
+    def handle_all_sites_route(self, counts, task, result):
+        """Records a solved pair for every sawmill type sharing it. Returns 1 if the route was solved."""
+        hs_oid = task[0]
+        for sm_type in self.unique_pairs[task]:
+            try:
+                if result[0] == "error":
+                    raise RouteSolveError(result[1])
+                self.record_route(sm_type, hs_oid, result[1], result[2], result[3])
+            except RouteSolveError as e:
+                self.record_failure(sm_type, hs_oid, e)
+                continue
+            counts[sm_type] += 1
+            if counts[sm_type] % 5 == 0:
+                self.print_arc(f"{counts[sm_type]} calculations done for {sm_type}. {self.running_cf(sm_type)}")
+        if result[0] == "error":
+            return None
+        return 1
+
+    def calculate_road_distances_all_sites(self):
+        """Calculates the road distances for every harvest site. Each unique harvest site/sawmill pair is solved once
+           and the result is written out for every sawmill type sharing the pair."""
+        self.print_arc("Starting Road Distance Calculations")
+        counts = {sm_type: 0 for sm_type in self.dist_id_dict}
+        tasks = list(self.unique_pairs.keys())
+        scheduler = SamplingScheduler(self.submit_pair, self.workers)
+        solved = scheduler.run(tasks, partial(self.handle_all_sites_route, counts))
+        self.print_arc(f"{solved} of {len(tasks)} unique pairs solved.")
+
+        for sm_type in self.dist_id_dict:
+            msg = f"{sm_type} calculations have been completed. Sample size has been set to {counts[sm_type]}."
+            self.print_arc(msg)
+
+    def collect_road_distances(self):
+        """Solves the routes of every sawmill type and writes the results to the output directory"""
+        self.executor = self.create_executor()
+        if self.keep_output_paths:
+            # GDAL is only needed when routes are kept
+            from geopackage_writer import GeoPackageWriter
+            self.route_writer = GeoPackageWriter(
+                os.path.join(self.output_dir, "routes.gpkg"),
+                "routes",
+                [("hs_oid", "INTEGER"), ("sm_oid", "INTEGER"), ("type", "TEXT"), ("length", "DOUBLE"),
+                 ("time", "DOUBLE"), ("cost", "DOUBLE")]
+            )
+        self.result_writer = ResultWriter(self.output_dir)
+        try:
+            if self.calculate_all:
+                self.calculate_road_distances_all_sites()
+            else:
+                self.calculate_road_distances_with_sampling()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+            if self.executor.recycle_count:
+                self.print_arc(f"Worker processes recycled {self.executor.recycle_count} times")
+            if self.executor.broken_count:
+                self.print_arc(f"Worker pool rebuilt {self.executor.broken_count} times after a worker crashed", True)
+            if self.route_writer is not None:
+                if len(self.route_paths):
+                    self.backend.write_route_paths(self.route_paths, self.route_writer)
+                self.route_writer.close()
+                self.print_arc(f"Kept routes written to {os.path.join(self.output_dir, 'routes.gpkg')}")
+            self.result_writer.close()
+            self.print_arc(f"Road distances written to {self.result_writer.path}")
+            self.write_running_sums()
+
+    def print_counts(self):
+        """Prints successful and failed calculation counts"""
+        self.print_arc("Success/Fail counts:")
+        self.print_arc("Key: distance failure count / connectivity failure count / success count")
+        for sm_type in self.calc_counts:
+            pass_count = self.calc_counts[sm_type]
+            con_fail_count = self.con_fail_counts[sm_type]
+            dist_fail_count = self.dist_fail_counts[sm_type]
+            total = pass_count + con_fail_count + dist_fail_count
+            count_str = f"{sm_type}: {dist_fail_count} / {con_fail_count} / {pass_count} ({total} total calculations)"
+            self.print_arc(count_str)
+
+    def print_log(self):
+        """Prints log"""
+        log_file = os.path.join(self.output_dir, f"log_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log")
+        with open(log_file, "w") as f:
+            f.write(self.log_str)
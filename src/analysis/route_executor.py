@@ -0,0 +1,230 @@
+########################################################################################################################
+# route_executor.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Runs route solves on a pool of worker processes. Routes are dispatched in batches and their results are
+#          accepted in the order they were drawn, so adaptive sampling collects exactly the same sample as the
+#          sequential loop while every worker stays busy. Worker pools can be recycled after a number of pairs or
+#          once a worker's memory grows past a limit, and are rebuilt when a worker dies.
+########################################################################################################################
+
+import math, os, threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, InvalidStateError
+from concurrent.futures.process import BrokenProcessPool
+
+class InlineExecutor:
+    """Runs tasks in the calling process. Used when only one worker is requested."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+def completed_future(result):
+    """Returns a future that already holds a result, for routes that do not need to be solved again"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+def process_rss_mb():
+    """Resident memory of the current process in MB, or None when it cannot be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1048576
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _run_measured(fn, args):
+    """Runs a task in a worker and reports the worker's memory with the result"""
+    return fn(*args), process_rss_mb()
+
+class _PoolFuture(Future):
+    """Future handed out by RecyclingProcessPool, cancelling it also cancels the task in the pool"""
+
+    def __init__(self):
+        super().__init__()
+        self.inner = None
+
+    def cancel(self):
+        if self.inner is not None:
+            self.inner.cancel()
+        return super().cancel()
+
+class RecyclingProcessPool:
+    """Process pool that is replaced with a fresh one after max_tasks tasks or when a worker reports more than
+       max_rss_mb of resident memory. Tasks already running finish in the old pool, new tasks go to the new one.
+       When a worker dies (a crash in the solver or the system killing it) the pool is rebuilt and the tasks it
+       still had are submitted again, up to max_retries times each. Results are returned to the parent, so writers
+       and counters stay in the calling process."""
+
+    def __init__(self, max_workers, initializer=None, initargs=(), max_tasks=None, max_rss_mb=None, max_retries=2):
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.max_tasks = max_tasks
+        self.max_rss_mb = max_rss_mb
+        self.max_retries = max_retries
+        self.lock = threading.Lock()
+        self.pool = None
+        self.pool_tasks = 0
+        self.retire = False
+        self.old_pools = []
+        self.recycle_count = 0
+        self.broken_count = 0
+        self.closed = False
+        self.peak_rss_mb = 0
+
+    def new_pool(self):
+        if self.pool is not None:
+            # let submitted tasks finish, the old workers exit once they are done
+            self.pool.shutdown(wait=False)
+            self.old_pools.append(self.pool)
+            self.recycle_count += 1
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=self.initializer,
+            initargs=self.initargs
+        )
+        self.pool_tasks = 0
+        self.retire = False
+
+    def drop_broken_pool(self, pool):
+        """Stops using a pool whose worker died, the next task starts a new one. Called with the lock held."""
+        if pool is self.pool:
+            self.old_pools.append(pool)
+            self.pool = None
+            self.broken_count += 1
+
+    def submit(self, fn, *args):
+        outer = _PoolFuture()
+        self.dispatch(fn, args, outer, 0)
+        return outer
+
+    def dispatch(self, fn, args, outer, attempt):
+        """Sends a task to the current pool, starting a new one when it is due for recycling or broken"""
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            if self.pool is None or self.retire or (self.max_tasks and self.pool_tasks >= self.max_tasks):
+                self.new_pool()
+            try:
+                inner = self.pool.submit(_run_measured, fn, args)
+            except BrokenProcessPool:
+                # the pool broke before its failed tasks were reported
+                self.drop_broken_pool(self.pool)
+                self.new_pool()
+                inner = self.pool.submit(_run_measured, fn, args)
+            self.pool_tasks += 1
+            pool = self.pool
+        outer.inner = inner
+        inner.add_done_callback(lambda f: self.task_done(pool, f, outer, fn, args, attempt))
+
+    def task_done(self, pool, inner, outer, fn, args, attempt):
+        if inner.cancelled():
+            return
+        try:
+            error = inner.exception()
+            if isinstance(error, BrokenProcessPool) and attempt < self.max_retries and not outer.cancelled():
+                # every task still in the broken pool lands here and is resubmitted to a fresh one
+                with self.lock:
+                    self.drop_broken_pool(pool)
+                try:
+                    self.dispatch(fn, args, outer, attempt + 1)
+                    return
+                except RuntimeError:
+                    # shut down in the meantime
+                    pass
+            if error is None:
+                result, rss = inner.result()
+                if rss is not None:
+                    with self.lock:
+                        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+                        if self.max_rss_mb and rss > self.max_rss_mb and pool is self.pool:
+                            self.retire = True
+                outer.set_result(result)
+            else:
+                outer.set_exception(error)
+        except InvalidStateError:
+            # cancelled by the caller while the task was finishing
+            pass
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self.lock:
+            self.closed = True
+            pools = self.old_pools + ([self.pool] if self.pool is not None else [])
+            self.pool = None
+            self.old_pools = []
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+class SamplingScheduler:
+    """Keeps a worker pool busy with route tasks. With a stopping rule, the number of routes in flight is based on
+       the sample size still needed (from the running variance) plus a small over-provision, and outstanding work is
+       cancelled once the rule is satisfied. Results are always handled in task order."""
+
+    def __init__(self, submit, workers=1, over_provision=0.25):
+        self.submit = submit
+        self.workers = max(1, int(workers))
+        self.over_provision = over_provision
+        if self.workers == 1:
+            self.max_in_flight = 1
+        else:
+            self.max_in_flight = self.workers + math.ceil(self.workers * self.over_provision)
+        self.discarded = 0
+
+    def target_in_flight(self, stopping_rule, attempts, successes):
+        """Number of routes to keep in flight"""
+        if stopping_rule is None:
+            return self.max_in_flight
+        needed = stopping_rule.required_size() - stopping_rule.count
+        # scale by the observed success rate so failed routes are replaced ahead of time
+        success_rate = successes / attempts if attempts else 1.0
+        expected = math.ceil(needed / max(success_rate, 0.05))
+        return max(1, min(self.max_in_flight, expected + math.ceil(expected * self.over_provision)))
+
+    def run(self, tasks, handle_result, stopping_rule=None):
+        """Solves tasks until they run out or the stopping rule is met. handle_result(task, result) is called in
+           task order and returns the sampled value (or None when the route failed)."""
+        pending = deque()
+        task_iter = iter(tasks)
+        exhausted = False
+        attempts = 0
+        successes = 0
+        try:
+            while True:
+                if stopping_rule is not None and stopping_rule.done():
+                    break
+                target = self.target_in_flight(stopping_rule, attempts, successes)
+                while not exhausted and len(pending) < target:
+                    task = next(task_iter, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    pending.append((task, self.submit(task)))
+                if not pending:
+                    break
+                task, future = pending.popleft()
+                value = handle_result(task, future.result())
+                attempts += 1
+                if value is not None:
+                    successes += 1
+                    if stopping_rule is not None:
+                        stopping_rule.update(value)
+        finally:
+            # routes drawn after the stopping point are not part of the sample
+            for task, future in pending:
+                future.cancel()
+                self.discarded += 1
+        return successes
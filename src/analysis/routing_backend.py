@@ -0,0 +1,113 @@
+########################################################################################################################
+# routing_backend.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Interface for solving harvest site/sawmill routes plus a pure Python backend on the native road graph.
+#          A backend is opened once per worker and reused for every pair it solves. The Network Analyst backend lives
+#          in circuity_factor.py, this module does not need arcpy so the routing loop can run and be benchmarked on
+#          Linux.
+########################################################################################################################
+
+from road_graph import TiledRoadGraph
+
+class RouteSolveError(Exception):
+    """Raised when a pair cannot be routed"""
+    pass
+
+class RoutingBackend:
+    """Solves routes between harvest sites and sawmills given by OBJECTID. open() sets up anything expensive (solver
+       layers, graphs) and is called once in the process that does the solving."""
+
+    def open(self):
+        """Prepares the backend for solving"""
+        pass
+
+    def solve(self, hs_oid, sm_oid):
+        """Returns (road distance in miles, ranger district, route) where route is (geometry, length, time) of the
+           solved route. The geometry is None unless routes are kept, otherwise it is WKB or anything
+           write_route_paths turns into geometry. length and time are None when the solver cannot accumulate them.
+           Raises RouteSolveError if there is no route."""
+        raise NotImplementedError
+
+    def write_route_paths(self, paths, writer):
+        """Rebuilds the geometry of routes kept in a RoutePathStore and writes them to a GeoPackageWriter. Called in
+           the parent process once solving is done."""
+        raise NotImplementedError
+
+    def close(self):
+        """Releases anything set up in open()"""
+        pass
+
+class GraphRoutingBackend(RoutingBackend):
+    """Routes on the native road graph. Points are snapped to the nearest graph node and the distance from the
+       harvest site to its node is added to the route like the Near step of the Network Analyst backend. Kept
+       routes are returned as their source node and signed edge ids (RoadGraph.path_ids), a few bytes per edge
+       instead of the vertices, and rebuilt in the parent by write_route_paths."""
+
+    def __init__(
+            self,
+            site_coords,
+            mill_coords,
+            cost="Length",
+            tile_dir=None,
+            bbox=None,
+            graph=None,
+            districts=None,
+            keep_output_paths=False,
+            snap_tolerance=3.8
+        ):
+        """site_coords and mill_coords map OBJECTID to (lon, lat). Either a loaded graph or a tile directory (and
+           optional bounding box of tiles to preload) is needed. snap_tolerance is in miles (20000 feet)."""
+        self.site_coords = site_coords
+        self.mill_coords = mill_coords
+        self.cost = cost
+        self.tile_dir = tile_dir
+        self.bbox = bbox
+        self.graph = graph
+        self.districts = districts or {}
+        self.keep_output_paths = keep_output_paths
+        self.snap_tolerance = snap_tolerance
+        # OBJECTID: (node, snap distance)
+        self.snapped = {}
+
+    def __getstate__(self):
+        # worker processes load their own graph in open() instead of receiving a pickled one
+        state = self.__dict__.copy()
+        if self.tile_dir is not None:
+            state["graph"] = None
+        state["snapped"] = {}
+        return state
+
+    def open(self):
+        if self.graph is None:
+            self.graph = TiledRoadGraph(self.tile_dir, self.bbox)
+
+    def snap(self, key, coords):
+        """Snaps a point to the graph once and remembers the result"""
+        if key not in self.snapped:
+            self.snapped[key] = self.graph.nearest_node(coords[0], coords[1], self.snap_tolerance)
+        return self.snapped[key]
+
+    def solve(self, hs_oid, sm_oid):
+        if hs_oid not in self.site_coords or sm_oid not in self.mill_coords:
+            raise RouteSolveError("Solve resulted in a failure")
+        start, start_dist = self.snap(("hs", hs_oid), self.site_coords[hs_oid])
+        end, _ = self.snap(("sm", sm_oid), self.mill_coords[sm_oid])
+        if start is None or end is None:
+            raise RouteSolveError("Solve resulted in a failure")
+        total_cost, edges = self.graph.shortest_path(start, end, self.cost)
+        if total_cost is None:
+            raise RouteSolveError("Solve resulted in a failure")
+        length = sum(self.graph.edge_lengths[idx] for idx in edges)
+        time = sum(self.graph.edge_times[idx] for idx in edges)
+        path = None
+        if self.keep_output_paths:
+            path = (start, self.graph.path_ids(start, edges))
+        return length + start_dist, self.districts.get(hs_oid, ""), (path, length, time)
+
+    def write_route_paths(self, paths, writer):
+        self.open()
+        paths.write_geopackage(writer, self.graph)
+
+    def close(self):
+        self.snapped = {}
@@ -0,0 +1,157 @@
+########################################################################################################################
+# sampling.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Streaming statistics for adaptive sampling. Keeps a running mean/variance of multipliers (Welford) so the
+#          required sample size n = z^2 * sigma^2 / E^2 can be re-evaluated after every completed route. Also
+#          stratified sampling of already calculated routes: group statistics, Neyman allocation, per-stratum draws
+#          and a weighted median for design weighted estimates.
+########################################################################################################################
+
+import math
+import numpy as np
+
+def required_sample_size(std_dev, z=1.96, e=0.1):
+    """Sample size needed to estimate a mean within margin of error e"""
+    return math.ceil((z ** 2 * float(std_dev) ** 2) / e ** 2)
+
+class RunningStats:
+    """Online mean and variance using Welford's algorithm. O(1) per update."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value):
+        """Adds a value"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        """Combines the statistics of another accumulator into this one"""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+        self.count = total
+        return self
+
+    @property
+    def variance(self):
+        """Population variance, same as np.var with the default ddof=0"""
+        if self.count == 0:
+            return 0.0
+        return self.m2 / self.count
+
+    @property
+    def std(self):
+        """Population standard deviation, same as np.std"""
+        return math.sqrt(self.variance)
+
+class AdaptiveStoppingRule:
+    """Decides when enough samples have been collected. At least min_samples are always taken, after that sampling
+       stops as soon as the running standard deviation says the margin of error e is met."""
+
+    def __init__(self, min_samples, z=1.96, e=0.1):
+        self.min_samples = min_samples
+        self.z = z
+        self.e = e
+        self.stats = RunningStats()
+
+    @property
+    def count(self):
+        return self.stats.count
+
+    def update(self, value):
+        """Adds the multiplier of a completed route"""
+        self.stats.update(value)
+
+    def required_size(self):
+        """Current estimate of the sample size needed, never below min_samples"""
+        if self.stats.count < self.min_samples:
+            return self.min_samples
+        return max(self.min_samples, required_sample_size(self.stats.std, self.z, self.e))
+
+    def done(self):
+        """True once the target precision is met"""
+        return self.stats.count >= self.required_size()
+
+def group_stats(groups, values, group_count):
+    """Size, mean and population standard deviation of the values in every group, groups holds an integer group
+       index per value"""
+    groups = np.asarray(groups, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.bincount(groups, minlength=group_count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.bincount(groups, weights=values, minlength=group_count) / counts
+        squares = np.bincount(groups, weights=values * values, minlength=group_count) / counts
+    stds = np.sqrt(np.maximum(squares - means * means, 0))
+    return counts, np.nan_to_num(means), np.nan_to_num(stds)
+
+def stratified_sample_size(sizes, stds, z=1.96, e=0.1):
+    """Sample size needed to estimate the mean of all strata together within margin of error e when the sample is
+       allocated by Neyman's rule, with the finite population correction"""
+    sizes = np.asarray(sizes, dtype=np.float64)
+    total = sizes.sum()
+    if total == 0:
+        return 0
+    weights = sizes / total
+    spread = (weights * stds).sum()
+    return math.ceil(spread ** 2 / (e ** 2 / z ** 2 + (weights * np.asarray(stds) ** 2).sum() / total))
+
+def neyman_allocation(sizes, stds, budget):
+    """Splits a sample budget across strata in proportion to stratum size times standard deviation. Every non-empty
+       stratum gets at least one sample while the budget allows, no stratum gets more than its size and what a full
+       stratum cannot take goes to the others."""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    weights = sizes * np.asarray(stds, dtype=np.float64)
+    budget = min(int(budget), int(sizes.sum()))
+    allocation = np.zeros(len(sizes), dtype=np.int64)
+    nonempty = np.flatnonzero(sizes > 0)
+    allocation[nonempty[:budget]] = 1
+    remaining = budget - int(allocation.sum())
+    while remaining > 0:
+        capacity = sizes - allocation
+        open_strata = capacity > 0
+        open_weights = np.where(open_strata, weights, 0)
+        if open_weights.sum() == 0:
+            # strata without spread are filled in proportion to what is left of them
+            open_weights = np.where(open_strata, capacity, 0).astype(np.float64)
+        share = remaining * open_weights / open_weights.sum()
+        add = np.minimum(np.floor(share).astype(np.int64), capacity)
+        if add.sum() == 0:
+            # the last samples go to the largest remainders
+            order = np.argsort(-(share - np.floor(share)), kind="stable")
+            add[order[open_strata[order]][:remaining]] = 1
+        allocation += add
+        remaining -= int(add.sum())
+    return allocation
+
+def stratified_sample(groups, allocation, rng):
+    """Draws allocation[g] indices of every group g without replacement, one permutation per group. Returns the
+       indices of each group as a list of arrays."""
+    groups = np.asarray(groups, dtype=np.int64)
+    order = np.argsort(groups, kind="stable")
+    members = np.split(order, np.cumsum(np.bincount(groups, minlength=len(allocation)))[:-1])
+    return [rng.permutation(indices)[:size] for indices, size in zip(members, allocation)]
+
+def weighted_median(values, weights):
+    """Median of values with sampling weights, the value at half of the total weight. Equal weights give the same
+       result as statistics.median. NaN for no values."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return math.nan
+    order = np.argsort(values, kind="stable")
+    values = values[order]
+    cumulative = np.cumsum(np.asarray(weights, dtype=np.float64)[order])
+    half = cumulative[-1] / 2
+    i = int(np.searchsorted(cumulative, half))
+    # exactly half of the weight on either side falls between two values
+    if i + 1 < len(values) and math.isclose(cumulative[i], half):
+        return float((values[i] + values[i + 1]) / 2)
+    return float(values[i])
@@ -0,0 +1,142 @@
+########################################################################################################################
+# service_area.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Service areas (isochrones) on the native road graph. One bounded Dijkstra is run up to the largest cutoff
+#          and every cutoff is cut from the same set of labels, so extra breaks cost no extra search. Polygons are
+#          hulls around the reached road segments, concave with shapely installed and convex otherwise.
+########################################################################################################################
+
+import numpy as np
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+class ServiceAreaError(Exception):
+    """Raised when a service area cannot be calculated for a point"""
+    pass
+
+def partial_line(coords, fraction):
+    """Cuts a line given as an (n, 2) array at a fraction of its length"""
+    steps = np.hypot(*np.diff(coords, axis=0).T)
+    total = steps.sum()
+    if total == 0 or fraction >= 1:
+        return coords
+    distance = max(fraction, 0) * total
+    walked = np.concatenate(([0], np.cumsum(steps)))
+    i = int(np.searchsorted(walked, distance, side="right")) - 1
+    i = min(i, len(steps) - 1)
+    t = (distance - walked[i]) / steps[i] if steps[i] else 0
+    end = coords[i] + t * (coords[i + 1] - coords[i])
+    return np.vstack((coords[:i + 1], end))
+
+def reached_coords(graph, labels, cost, cutoff):
+    """Vertices of every road segment reachable within the cutoff. Edges leaving the reached area are cut where the
+       cutoff falls along them."""
+    costs = graph.edge_costs(cost)
+    parts = []
+    for node, node_cost in labels.items():
+        if node_cost > cutoff:
+            continue
+        for _, idx in graph.neighbours(node):
+            coords = graph.edge_coords(idx)
+            if graph.edge_nodes[idx][0] != node:
+                coords = coords[::-1]
+            edge_cost = costs[idx]
+            if node_cost + edge_cost > cutoff:
+                coords = partial_line(coords, (cutoff - node_cost) / edge_cost)
+            parts.append(coords)
+    if not parts:
+        return np.zeros((0, 2), dtype=np.float64)
+    return np.unique(np.concatenate(parts).round(7), axis=0)
+
+def convex_hull(points):
+    """Convex hull of an (n, 2) array with the monotone chain algorithm. Returns a closed counter-clockwise ring."""
+    points = np.unique(np.asarray(points, dtype=np.float64), axis=0)
+    if len(points) < 3:
+        return points
+
+    def half(chain_points):
+        chain = []
+        for p in chain_points:
+            while len(chain) >= 2:
+                o, a = chain[-2], chain[-1]
+                if (a[0] - o[0]) * (p[1] - o[1]) - (a[1] - o[1]) * (p[0] - o[0]) > 0:
+                    break
+                chain.pop()
+            chain.append(p)
+        return chain
+
+    lower = half(points)
+    upper = half(points[::-1])
+    ring = np.array(lower[:-1] + upper[:-1])
+    return np.vstack((ring, ring[:1]))
+
+def hull_polygons(points, hull="concave", concave_ratio=0.3):
+    """Builds the service area polygons from reached points as a list of polygons, each a list of rings. Concave
+       hulls need shapely, without it the convex hull is used."""
+    if len(points) < 3:
+        return []
+    if hull == "concave" and shapely is not None:
+        geom = shapely.concave_hull(shapely.MultiPoint(points), ratio=concave_ratio)
+        polygons = getattr(geom, "geoms", [geom])
+        return [
+            [np.asarray(p.exterior.coords)] + [np.asarray(ring.coords) for ring in p.interiors]
+            for p in polygons if p.geom_type == "Polygon" and not p.is_empty
+        ]
+    ring = convex_hull(points)
+    if len(ring) < 4:
+        return []
+    return [[ring]]
+
+class ServiceAreaSolver:
+    """Calculates service areas for several cutoffs around a point on a RoadGraph"""
+
+    def __init__(self, graph, cost="Length", snap_tolerance=3.8, concave_ratio=0.3, cache=None):
+        """Cutoffs are in the cost's units, miles for Length and hours for Time. snap_tolerance is in miles. An
+           IsochroneCache is only used with graphs that have a network fingerprint."""
+        self.graph = graph
+        self.cost = cost
+        self.snap_tolerance = snap_tolerance
+        self.concave_ratio = concave_ratio
+        self.cache = cache
+        self.fingerprint = getattr(graph, "fingerprint", None)
+
+    def snap(self, lon, lat):
+        """Returns the graph node of a point"""
+        start, _ = self.graph.nearest_node(lon, lat, self.snap_tolerance)
+        if start is None:
+            raise ServiceAreaError(f"No road within {self.snap_tolerance} miles of {lat}, {lon}")
+        return start
+
+    def search(self, start, max_cutoff):
+        """Runs one search from a node bounded by the largest cutoff"""
+        labels, _, _ = self.graph.search([start], self.cost, max_cost=max_cutoff)
+        return labels
+
+    def solve(self, lon, lat, cutoffs, hull="concave"):
+        """Returns [(cutoff, polygons), ...] in ascending cutoff order. Each area covers everything up to its cutoff
+           like Network Analyst's disk polygons."""
+        cutoffs = sorted(cutoffs)
+        start = self.snap(lon, lat)
+        use_cache = self.cache is not None and self.fingerprint is not None
+        hull_key = "convex"
+        if hull == "concave" and shapely is not None:
+            hull_key = f"concave_{self.concave_ratio}"
+        found = self.cache.get(self.fingerprint, self.cost, start, hull_key, cutoffs) if use_cache else {}
+        missing = [cutoff for cutoff in cutoffs if cutoff not in found]
+        if missing:
+            labels = self.search(start, missing[-1])
+            new_areas = []
+            for cutoff in missing:
+                points = reached_coords(self.graph, labels, self.cost, cutoff)
+                polygons = hull_polygons(points, hull, self.concave_ratio)
+                if not polygons:
+                    raise ServiceAreaError(f"Service area for cutoff {cutoff} is empty")
+                new_areas.append((cutoff, polygons))
+            if use_cache:
+                self.cache.put(self.fingerprint, self.cost, start, hull_key, new_areas)
+            found.update(new_areas)
+        return [(cutoff, found[cutoff]) for cutoff in cutoffs]
@@ -0,0 +1,232 @@
+########################################################################################################################
+# travel_cost_surface.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Creates a raster of road miles (or hours) to the nearest sawmill of each type. One multi-source search
+#          from every mill of a type, following one-way roads against their direction, labels the whole road network
+#          with the cost of driving to the nearest mill. The labels are interpolated along the roads and rasterized
+#          onto a grid, and cells off the network are filled with a straight-line connector cost to the closest
+#          labelled cell.
+# Usage: <road tile directory> <sawmills> <output directory> <travel mode> <cell size in degrees>
+#        <min lon,min lat,max lon,max lat> [<max cost>] [<mill type field>]
+########################################################################################################################
+
+import sys, os, math, re
+import numpy as np
+from road_graph import TiledRoadGraph, EARTH_RADIUS_MILES, haversine_miles
+from point_layers import read_points_by_value
+
+MILES_PER_DEGREE = EARTH_RADIUS_MILES * math.pi / 180
+NODATA = -9999.0
+
+# the 8 neighbouring cells as (row offset, column offset)
+NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+def grid_shape(bbox, cell_size):
+    """Rows and columns of a grid covering a bounding box [min_lon, min_lat, max_lon, max_lat]"""
+    cols = max(1, int(math.ceil((bbox[2] - bbox[0]) / cell_size)))
+    rows = max(1, int(math.ceil((bbox[3] - bbox[1]) / cell_size)))
+    return rows, cols
+
+def geo_transform(bbox, cell_size):
+    """GDAL geotransform of a north-up grid"""
+    return bbox[0], cell_size, 0.0, bbox[3], 0.0, -cell_size
+
+def shift(grid, dr, dc, fill):
+    """Returns grid moved by (dr, dc) cells, so out[r, c] = grid[r - dr, c - dc]"""
+    out = np.full_like(grid, fill)
+    rows, cols = grid.shape
+    out[max(dr, 0):rows + min(dr, 0), max(dc, 0):cols + min(dc, 0)] = \
+        grid[max(-dr, 0):rows + min(-dr, 0), max(-dc, 0):cols + min(-dc, 0)]
+    return out
+
+class TravelCostSurface:
+    """Rasterizes multi-source search labels from a set of mills on a RoadGraph"""
+
+    def __init__(
+            self,
+            graph,
+            cost="Length",
+            cell_size=0.01,
+            max_cost=None,
+            connector_speed=15.0,
+            max_connector=3.8,
+            snap_tolerance=3.8
+        ):
+        """cell_size is in degrees. Off-network travel is costed at connector_speed (mph) for Time and is limited to
+           max_connector miles, like the snapping tolerance used when routing."""
+        self.graph = graph
+        self.cost = cost
+        self.cell_size = cell_size
+        self.max_cost = max_cost
+        self.connector_speed = connector_speed
+        self.max_connector = max_connector
+        self.snap_tolerance = snap_tolerance
+        self.unsnapped = []
+
+    def connector_cost(self, miles):
+        """Cost of travelling off the network"""
+        if self.cost == "Time":
+            return miles / self.connector_speed
+        return miles
+
+    def search(self, mills):
+        """Runs one multi-source search from every mill against the travel direction of the roads. Returns the
+           node labels, the cost of driving from each node to its nearest mill, and the mill each node belongs to."""
+        sources = {}
+        source_mill = {}
+        self.unsnapped = []
+        for oid, (lon, lat) in mills.items():
+            node, dist = self.graph.nearest_node(lon, lat, self.snap_tolerance)
+            if node is None:
+                self.unsnapped.append(oid)
+                continue
+            start_cost = self.connector_cost(dist)
+            if node not in sources or start_cost < sources[node]:
+                sources[node] = start_cost
+                source_mill[node] = oid
+        if not sources:
+            return {}, {}
+        labels, _, origin = self.graph.search(sources, self.cost, max_cost=self.max_cost, reverse=True)
+        return labels, {node: source_mill[origin[node]] for node in labels}
+
+    def edge_samples(self, labels, owners):
+        """Points along every edge that can be driven into a labelled node, no more than half a cell apart, with the
+           cost of driving from them through that node to its mill. Returns (lon, lat, cost, mill) arrays."""
+        costs = self.graph.edge_costs(self.cost)
+        spacing = self.cell_size / 2
+        parts = []
+        for node, node_cost in labels.items():
+            for _, idx in self.graph.incoming(node):
+                coords = self.graph.edge_coords(idx)
+                if self.graph.edge_nodes[idx][0] != node:
+                    coords = coords[::-1]
+                along = np.concatenate(([0], np.cumsum(np.hypot(*np.diff(coords, axis=0).T))))
+                positions = np.linspace(0, along[-1], int(math.ceil(along[-1] / spacing)) + 1)
+                sample_cost = node_cost + costs[idx] * (positions / along[-1] if along[-1] else positions)
+                if self.max_cost is not None:
+                    positions = positions[sample_cost <= self.max_cost]
+                    sample_cost = sample_cost[sample_cost <= self.max_cost]
+                lon = np.interp(positions, along, coords[:, 0])
+                lat = np.interp(positions, along, coords[:, 1])
+                parts.append((lon, lat, sample_cost, np.full(len(positions), owners[node], dtype=np.int64)))
+        if not parts:
+            return [np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64)]
+        return [np.concatenate(arrays) for arrays in zip(*parts)]
+
+    def edge_owners(self, labels, owners):
+        """Assigns every reached edge to the mill of the cheapest labelled end it can be driven into. Returns
+           {edge index: mill OBJECTID}."""
+        best = {}
+        for node, node_cost in labels.items():
+            for _, idx in self.graph.incoming(node):
+                if idx not in best or node_cost < best[idx][0]:
+                    best[idx] = (node_cost, owners[node])
+        return {idx: mill for idx, (_, mill) in best.items()}
+
+    def rasterize(self, labels, owners, bbox):
+        """Puts the cheapest cost reached along the roads in each cell on a grid and fills off-network cells.
+           Returns the cost grid (inf where unreached) and the grid of owning mill OBJECTIDs (-1 where unreached)."""
+        rows, cols = grid_shape(bbox, self.cell_size)
+        cost_grid = np.full((rows, cols), np.inf)
+        owner_grid = np.full((rows, cols), -1, dtype=np.int64)
+        walked = np.full((rows, cols), np.inf)
+        if labels:
+            lon, lat, values, mill_ids = self.edge_samples(labels, owners)
+            col = np.floor((lon - bbox[0]) / self.cell_size).astype(np.int64)
+            row = np.floor((bbox[3] - lat) / self.cell_size).astype(np.int64)
+            inside = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+            lon, lat, col, row = lon[inside], lat[inside], col[inside], row[inside]
+            values, mill_ids = values[inside], mill_ids[inside]
+            center_lon = bbox[0] + (col + 0.5) * self.cell_size
+            center_lat = bbox[3] - (row + 0.5) * self.cell_size
+            to_center = haversine_miles(lon, lat, center_lon, center_lat)
+            totals = values + self.connector_cost(to_center)
+            # keep the cheapest point of every cell
+            flat = row * cols + col
+            order = np.lexsort((totals, flat))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = flat[order][1:] != flat[order][:-1]
+            keep = order[first]
+            cost_grid.flat[flat[keep]] = totals[keep]
+            owner_grid.flat[flat[keep]] = mill_ids[keep]
+            walked.flat[flat[keep]] = to_center[keep]
+        self.fill_connectors(cost_grid, owner_grid, walked, bbox)
+        return cost_grid, owner_grid
+
+    def fill_connectors(self, cost_grid, owner_grid, walked, bbox):
+        """Spreads costs into cells without roads one neighbour step at a time until max_connector miles have been
+           walked off the network. Updates the grids in place."""
+        rows, cols = cost_grid.shape
+        row_lat = bbox[3] - (np.arange(rows) + 0.5) * self.cell_size
+        dy = self.cell_size * MILES_PER_DEGREE
+        dx = (self.cell_size * MILES_PER_DEGREE * np.cos(np.radians(row_lat)))[:, None]
+        step_count = int(math.ceil(self.max_connector / min(dy, float(dx.min())))) + 1
+        for _ in range(step_count):
+            changed = False
+            for dr, dc in NEIGHBOURS:
+                step_miles = np.hypot(dc * dx, dr * dy)
+                new_walked = shift(walked, dr, dc, np.inf) + step_miles
+                new_cost = shift(cost_grid, dr, dc, np.inf) + self.connector_cost(step_miles)
+                better = (new_cost < cost_grid) & (new_walked <= self.max_connector)
+                if better.any():
+                    changed = True
+                    cost_grid[better] = new_cost[better]
+                    walked[better] = new_walked[better]
+                    owner_grid[better] = shift(owner_grid, dr, dc, -1)[better]
+            if not changed:
+                break
+
+    def surface(self, mills, bbox):
+        """Returns the (cost grid, owner grid) for a set of mills over a bounding box"""
+        labels, owners = self.search(mills)
+        return self.rasterize(labels, owners, bbox)
+
+    def write(self, path, cost_grid, bbox):
+        """Writes a cost grid as a tiled, compressed GeoTIFF"""
+        from raster_writer import write_geotiff
+        grid = np.where(np.isfinite(cost_grid), cost_grid, NODATA).astype(np.float32)
+        return write_geotiff(path, grid, geo_transform(bbox, self.cell_size), NODATA)
+
+def type_file_name(prefix, mill_type, extension):
+    """File name for a mill type, such as travel_cost_pulp_paper.tif"""
+    slug = re.sub(r"[^a-z0-9]+", "_", str(mill_type).lower()).strip("_")
+    return f"{prefix}_{slug}{extension}"
+
+def parse_bbox(bbox):
+    """Parses 'min lon,min lat,max lon,max lat'"""
+    values = [float(value) for value in bbox.split(",")]
+    if len(values) != 4 or values[0] >= values[2] or values[1] >= values[3]:
+        raise ValueError(f"Invalid bounding box {bbox}, expected min lon,min lat,max lon,max lat")
+    return values
+
+def main():
+    tile_dir = sys.argv[1]
+    sawmills = sys.argv[2]
+    output_dir = sys.argv[3]
+    cost = sys.argv[4]
+    cell_size = float(sys.argv[5])
+    bbox = parse_bbox(sys.argv[6])
+    max_cost = None
+    if len(sys.argv) > 7 and sys.argv[7] != "#":
+        max_cost = float(sys.argv[7])
+    type_field = "Mill_Type"
+    if len(sys.argv) > 8:
+        type_field = sys.argv[8]
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # searches stay inside the region so an unbounded search does not load the whole network
+    graph = TiledRoadGraph(tile_dir, bbox, load_on_demand=False)
+    surface = TravelCostSurface(graph, cost, cell_size, max_cost)
+    for mill_type, mills in read_points_by_value(sawmills, type_field).items():
+        cost_grid, _ = surface.surface(mills, bbox)
+        output_path = os.path.join(output_dir, type_file_name("travel_cost", mill_type, ".tif"))
+        path = surface.write(output_path, cost_grid, bbox)
+        print(f"{mill_type}: {len(mills)} mills, {np.isfinite(cost_grid).mean():.1%} of cells reached, written to "
+              f"{path}")
+        if surface.unsnapped:
+            print(f"  mills too far from a road: {surface.unsnapped}")
+
+if __name__ == "__main__":
+    main()
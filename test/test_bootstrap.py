@@ -0,0 +1,68 @@
+########################################################################################################################
+# test_bootstrap.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the vectorized bootstrap in bootstrap.py
+########################################################################################################################
+
+import unittest
+import sys, os
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+import bootstrap
+
+class TestBootstrap(unittest.TestCase):
+    def setUp(self):
+        data_rng = np.random.default_rng(1)
+        self.samples = [1 + data_rng.random(n) for n in [30, 5, 12]]
+
+    def test_matches_loop(self):
+        replicates = bootstrap.bootstrap_means(self.samples, 20, np.random.default_rng(7), max_elements=1)
+        rng = np.random.default_rng(7)
+        for i in range(20):
+            resampled = [sample[rng.integers(0, len(sample), size=(1, len(sample)))[0]] for sample in self.samples]
+            expected = [values.mean() for values in resampled] + [np.concatenate(resampled).mean()]
+            np.testing.assert_allclose(replicates[i], expected)
+
+    def test_seeded_and_empty_samples(self):
+        samples = self.samples + [[]]
+        first = bootstrap.bootstrap_means(samples, 500, np.random.default_rng(3))
+        second = bootstrap.bootstrap_means(samples, 500, np.random.default_rng(3))
+        self.assertEqual(first.shape, (500, 5))
+        np.testing.assert_array_equal(first, second)
+        self.assertTrue(np.isnan(first[:, 3]).all())
+        self.assertFalse(np.isnan(first[:, 4]).any())
+
+    def test_weighted_means(self):
+        weights = [np.where(sample > 1.5, 9.0, 1.0) for sample in self.samples]
+        replicates = bootstrap.bootstrap_means(self.samples, 2000, np.random.default_rng(4), weights=weights)
+        for k, sample in enumerate(self.samples):
+            self.assertAlmostEqual(replicates[:, k].mean(), np.average(sample, weights=weights[k]), delta=0.02)
+        self.assertAlmostEqual(replicates[:, -1].mean(),
+                               np.average(np.concatenate(self.samples), weights=np.concatenate(weights)), delta=0.01)
+
+    def test_parallel_reproducible(self):
+        first, entropy = bootstrap.parallel_bootstrap(bootstrap.bootstrap_means, self.samples, 1001, 11, workers=3)
+        second, _ = bootstrap.parallel_bootstrap(bootstrap.bootstrap_means, self.samples, 1001, entropy, workers=3)
+        self.assertEqual(first.shape, (1001, 4))
+        np.testing.assert_array_equal(first, second)
+        lower, upper = bootstrap.percentile_intervals(first, 0.9)
+        self.assertTrue((lower < first.mean(axis=0)).all() and (first.mean(axis=0) < upper).all())
+        self.assertAlmostEqual(np.mean(first[:, 0] < lower[0]), 0.05, delta=0.01)
+
+    def test_regression_pooled_sums(self):
+        ed = [10 + 50 * sample for sample in self.samples]
+        pairs = [(x, 1.4 * x + sample) for x, sample in zip(ed, self.samples)]
+        replicates = bootstrap.bootstrap_regression(pairs, 50, np.random.default_rng(5))
+        self.assertEqual(replicates.shape, (50, 4, 3))
+        rng = np.random.default_rng(5)
+        resampled = []
+        for x, y in pairs:
+            idx = rng.integers(0, len(x), size=(50, len(x)))[0]
+            resampled.append((x[idx], y[idx]))
+        x = np.concatenate([pair[0] for pair in resampled])
+        y = np.concatenate([pair[1] for pair in resampled])
+        self.assertAlmostEqual(replicates[0, -1, 2], x @ y / (x @ x))
+
+if __name__ == '__main__':
+    unittest.main()
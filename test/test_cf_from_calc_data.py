@@ -0,0 +1,101 @@
+########################################################################################################################
+# test_cf_from_calc_data.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests that the design weighted estimates of cf_from_calc_data.py recover the values of the population
+########################################################################################################################
+
+import unittest
+import sys, os, statistics, tempfile, shutil
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+from cf_from_calc_data import CfFromDataCalculator
+from regression import circuity_regressions
+from result_store import write_results, read_results
+import sampling
+
+class TestCfFromDataCalculator(unittest.TestCase):
+    def setUp(self):
+        # a large district with tight multipliers around 1.2 and a small one spread around 2.0, so Neyman allocation
+        # samples the small district about ten times more often
+        rng = np.random.default_rng(3)
+        sizes = {"A": 9000, "B": 1000}
+        ed = rng.uniform(5, 100, sum(sizes.values()))
+        multipliers = np.concatenate([rng.normal(1.2, 0.05, sizes["A"]), rng.normal(2.0, 0.5, sizes["B"])])
+        multipliers = np.maximum(multipliers, 1.0)
+        self.ed = ed
+        self.rd = ed * multipliers
+        self.multipliers = multipliers
+        count = len(ed)
+        self.csv_dir = tempfile.mkdtemp()
+        write_results(self.csv_dir, {
+            "type": np.array(["Chip"] * count, dtype=object),
+            "hs_oid": np.arange(count),
+            "sm_oid": np.zeros(count, dtype=np.int64),
+            "ed": self.ed,
+            "rd": self.rd,
+            "time": np.full(count, np.nan),
+            "district": np.array(["A"] * sizes["A"] + ["B"] * sizes["B"], dtype=object),
+            "status": np.array(["ok"] * count, dtype=object),
+            "weight": np.ones(count)
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.csv_dir)
+
+    def test_weighted_estimates_recover_population(self):
+        calculator = CfFromDataCalculator(self.csv_dir, self.csv_dir, seed_val=11, render_histograms=False, budget=1000)
+        calculator.import_distance_results()
+        calculator.collect_samples()
+        samples = calculator.samples_dict["Chip"]
+        weights = calculator.weights_dict["Chip"]
+        ed_list = [sample[2] for sample in samples]
+        rd_list = [sample[3] for sample in samples]
+        sampled_b = [sample for sample in samples if sample[5] == "B"]
+        self.assertGreater(len(sampled_b), len(samples) / 3)
+        # the design weights add up to the population
+        self.assertAlmostEqual(sum(weights), len(self.ed))
+
+        _, b1, b2, b3, mean_multiplier, median_multiplier = calculator.estimate(
+            "Chip", ed_list, rd_list, weights, []
+        )
+        population = circuity_regressions(self.ed, self.rd)
+        self.assertAlmostEqual(mean_multiplier, self.multipliers.mean(), delta=0.02)
+        self.assertAlmostEqual(median_multiplier, np.median(self.multipliers), delta=0.01)
+        self.assertAlmostEqual(b3, population[2], delta=0.03)
+        self.assertAlmostEqual(b2, population[1], delta=0.05)
+        self.assertAlmostEqual(b1, population[0], delta=0.1)
+        # without the weights the oversampled district pulls the estimates up
+        unweighted = np.array(rd_list) / np.array(ed_list)
+        self.assertGreater(unweighted.mean() - self.multipliers.mean(), 0.2)
+        self.assertGreater(circuity_regressions(ed_list, rd_list)[2] - population[2], 0.2)
+
+    def test_exported_sample_keeps_weights(self):
+        out_dir = os.path.join(self.csv_dir, "sample")
+        os.makedirs(out_dir)
+        calculator = CfFromDataCalculator(self.csv_dir, out_dir, seed_val=11, render_histograms=False, budget=1000)
+        calculator.import_distance_results()
+        calculator.collect_samples()
+        calculator.export_sampling_results()
+        exported = read_results(out_dir, sm_type="Chip")
+        self.assertEqual(len(exported["rd"]), len(calculator.samples_dict["Chip"]))
+        self.assertAlmostEqual(exported["weight"].sum(), len(self.ed))
+        # the exported multipliers give the population mean only with their weights
+        multipliers = exported["rd"] / exported["ed"]
+        self.assertAlmostEqual(np.average(multipliers, weights=exported["weight"]), self.multipliers.mean(), delta=0.02)
+
+        # sampling the weighted sample again keeps standing for the whole population
+        resampler = CfFromDataCalculator(out_dir, out_dir, seed_val=5, render_histograms=False, budget=300)
+        resampler.import_distance_results()
+        resampler.collect_samples()
+        self.assertAlmostEqual(sum(resampler.weights_dict["Chip"]), len(self.ed), delta=len(self.ed) * 0.05)
+
+    def test_weighted_median(self):
+        values = [3.0, 1.0, 4.0, 2.0]
+        self.assertEqual(sampling.weighted_median(values, [1, 1, 1, 1]), statistics.median(values))
+        self.assertEqual(sampling.weighted_median(values[:3], [2, 2, 2]), statistics.median(values[:3]))
+        self.assertEqual(sampling.weighted_median(values, [1, 10, 1, 1]), 1.0)
+        self.assertTrue(np.isnan(sampling.weighted_median([], [])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+########################################################################################################################
+# test_district_cf.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests compiling the road distance results of several directories in district_cf.py
+########################################################################################################################
+
+import unittest
+import sys, os, shutil, tempfile
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+from district_cf import DistrictCF
+from result_store import ResultWriter
+
+class TestDistrictCF(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.csv_dirs = [os.path.join(self.root, "first"), os.path.join(self.root, "second")]
+        for csv_dir in self.csv_dirs:
+            os.makedirs(csv_dir)
+        with ResultWriter(self.csv_dirs[0]) as writer:
+            writer.add("Chip", 1, 10, 2.0, 2.6, district="North")
+            writer.add("Chip", 2, 10, 4.0, 5.0, district="South")
+            writer.add("Pellet", 3, 11, 3.0, 4.0, district="North")
+            writer.add("Pellet", 4, 11, 1.0, 1.5)
+        with ResultWriter(self.csv_dirs[1]) as writer:
+            # the first row repeats a row of the first directory
+            writer.add("Chip", 1, 10, 2.0, 2.6, district="North")
+            writer.add("Chip", 5, 12, 5.0, 6.0, district="East")
+            # a sampled route standing for three routes
+            writer.add("Chip", 6, 12, 6.0, 7.5, district="North", weight=3.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_compile_data(self):
+        district_cf = DistrictCF(os.path.join(self.root, "out"), None, self.csv_dirs)
+        district_cf.compile_data()
+        frame = district_cf.frame
+        # directories are read in order and each directory by sawmill type, pellet before chip
+        self.assertEqual(district_cf.districts, ["North", "", "South", "East"])
+        self.assertEqual(frame["hs_oid"].tolist(), [3, 4, 1, 2, 5, 6])
+        self.assertEqual([district_cf.districts[i] for i in frame["district"]],
+                         ["North", "", "North", "South", "East", "North"])
+        self.assertEqual([district_cf.sm_types[i] for i in frame["type"]], ["Pellet"] * 2 + ["Chip"] * 4)
+        self.assertEqual(frame["rd"].dtype, np.float64)
+
+        district_cf.build_results_dict()
+        cf, count = district_cf.get_district_results_dict()["Chip"]["North"]
+        ed, rd, weights = np.array([2.0, 6.0]), np.array([2.6, 7.5]), np.array([1.0, 3.0])
+        self.assertEqual(count, 2)
+        self.assertAlmostEqual(cf, (weights * ed * rd).sum() / (weights * ed * ed).sum())
+        self.assertEqual(district_cf.get_district_results_dict()["Pellet"][""], (1.5, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+########################################################################################################################
+# test_geojson_writer.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the streaming GeoJSON writer in geojson_writer.py
+########################################################################################################################
+
+import unittest
+import sys, os, json, tempfile, shutil
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+from geojson_writer import GeoJSONWriter, multipolygon_geometry
+
+class TestGeoJSONWriter(unittest.TestCase):
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        ring = np.array([[0, 0], [1, 0], [1, 1], [0, 0]], dtype=float)
+        self.features = [({"ToBreak": cutoff}, multipolygon_geometry([[ring * cutoff]])) for cutoff in [1, 2, 3]]
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_feature_collection(self):
+        path = os.path.join(self.out_dir, "breaks.geojson")
+        with GeoJSONWriter(path) as writer:
+            for properties, geometry in self.features:
+                writer.add(properties, geometry)
+        with open(path) as f:
+            collection = json.load(f)
+        self.assertEqual([feature["properties"]["ToBreak"] for feature in collection["features"]], [1, 2, 3])
+        self.assertEqual(collection["features"][2]["geometry"]["coordinates"][0][0][2], [3, 3])
+
+    def test_newline_delimited(self):
+        path = os.path.join(self.out_dir, "breaks.geojsonl")
+        with GeoJSONWriter(path, newline_delimited=True) as writer:
+            for properties, geometry in self.features:
+                writer.add(properties, geometry)
+        with open(path) as f:
+            features = [json.loads(line) for line in f]
+        self.assertEqual(len(features), 3)
+        self.assertEqual(features[0]["geometry"]["type"], "MultiPolygon")
+
+if __name__ == '__main__':
+    unittest.main()
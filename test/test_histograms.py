@@ -0,0 +1,44 @@
+########################################################################################################################
+# test_histograms.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the histogram bin counts in histograms.py
+########################################################################################################################
+
+import unittest
+import sys, os
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+import histograms
+
+class TestHistograms(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.ed = 1 + 80 * rng.random(500)
+        self.rd = self.ed * (1.2 + 0.3 * rng.random(500))
+
+    def test_distance_histogram(self):
+        page = histograms.distance_histogram(self.rd, "Road Distance", "Chip")
+        counts, edges = np.histogram(self.rd, bins=40)
+        np.testing.assert_allclose(page["edges"], edges)
+        self.assertEqual(page["counts"], [counts.tolist()])
+        self.assertEqual(page["title"], "Histogram of Road Distance for Chip")
+
+    def test_overlaid_histogram_shares_edges(self):
+        page = histograms.overlaid_histogram([self.rd, self.ed], ["Road Distance", "Euclidean Distance"], "Chip", 60)
+        self.assertEqual(len(page["edges"]), 61)
+        self.assertEqual(page["edges"][0], min(self.ed.min(), self.rd.min()))
+        self.assertEqual(page["edges"][-1], max(self.ed.max(), self.rd.max()))
+        self.assertEqual([sum(counts) for counts in page["counts"]], [500, 500])
+
+    def test_json_round_trip(self):
+        pages = [histograms.distance_histogram(self.ed, "Euclidean Distance", "Pellet")]
+        path = os.path.join(os.path.dirname(__file__), "test_histograms.json")
+        try:
+            histograms.write_histograms(path, pages)
+            self.assertEqual(histograms.read_histograms(path), pages)
+        finally:
+            os.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
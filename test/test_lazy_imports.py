@@ -0,0 +1,27 @@
+########################################################################################################################
+# test_lazy_imports.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the deferred imports in lazy_imports.py
+########################################################################################################################
+
+import unittest
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+import lazy_imports
+
+class TestLazyImports(unittest.TestCase):
+    def test_imported_on_first_use(self):
+        sys.modules.pop("colorsys", None)
+        colorsys = lazy_imports.lazy_import("colorsys")
+        self.assertFalse(lazy_imports.is_loaded("colorsys"))
+        self.assertEqual(colorsys.rgb_to_hsv(1, 0, 0), (0, 1, 1))
+        self.assertTrue(lazy_imports.is_loaded("colorsys"))
+        self.assertIs(lazy_imports.lazy_import("colorsys"), sys.modules["colorsys"])
+
+    def test_regression_does_not_load_statsmodels(self):
+        import regression
+        self.assertFalse(lazy_imports.is_loaded("statsmodels"))
+
+if __name__ == '__main__':
+    unittest.main()
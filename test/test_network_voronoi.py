@@ -0,0 +1,74 @@
+########################################################################################################################
+# test_network_voronoi.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the network Voronoi catchments of network_voronoi.py on a road between two mills, needs GDAL
+########################################################################################################################
+
+import unittest
+import sys, os, tempfile, shutil
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+from road_graph import RoadGraph, quantize
+
+try:
+    from osgeo import ogr
+    from network_voronoi import NetworkCatchments
+except ImportError:
+    ogr = None
+
+@unittest.skipIf(ogr is None, "GDAL is not installed")
+class TestNetworkCatchments(unittest.TestCase):
+    def setUp(self):
+        # the two mill road of test_travel_cost_surface.py, ten 1 mile edges along lat 0.05 from lon 0 to 1
+        self.graph = RoadGraph()
+        for i in range(10):
+            qx, qy = quantize(np.array([i / 10, (i + 1) / 10]), np.array([0.05, 0.05]))
+            self.graph.add_edge(i, np.column_stack((qx, qy)), 0, 2, 1.0, 0.02)
+        self.bbox = [0.0, 0.0, 1.0, 0.1]
+        self.mills = {11: (0.0, 0.05), 12: (1.0, 0.05)}
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_one_polygon_per_mill_split_at_midpoint(self):
+        polygons, _, _ = NetworkCatchments(self.graph, "Length", cell_size=0.05).catchments(self.mills, self.bbox)
+        self.assertEqual(sorted(polygons), [11, 12])
+        envelopes = {}
+        for mill, wkb in polygons.items():
+            geom = ogr.ForceToMultiPolygon(ogr.CreateGeometryFromWkb(wkb))
+            self.assertEqual(geom.GetGeometryCount(), 1)
+            envelopes[mill] = geom.GetEnvelope()
+        # envelopes are (min lon, max lon, min lat, max lat)
+        self.assertAlmostEqual(envelopes[11][0], 0.0)
+        self.assertAlmostEqual(envelopes[11][1], 0.5)
+        self.assertAlmostEqual(envelopes[12][0], 0.5)
+        self.assertAlmostEqual(envelopes[12][1], 1.0)
+
+    def test_write_catchments_and_road_owners(self):
+        output_path = os.path.join(self.output_dir, "catchments.gpkg")
+        NetworkCatchments(self.graph, "Length", cell_size=0.05).write(output_path, {"Chip": self.mills}, self.bbox)
+        data_source = ogr.Open(output_path)
+        catchments = [(feature.GetField("mill_oid"), feature.GetField("mill_type"))
+                      for feature in data_source.GetLayerByName("catchments")]
+        self.assertEqual(sorted(catchments), [(11, "Chip"), (12, "Chip")])
+        roads = {feature.GetField("edge_id"): feature.GetField("mill_oid")
+                 for feature in data_source.GetLayerByName("catchment_roads")}
+        self.assertEqual(roads, {i: 11 if i < 5 else 12 for i in range(10)})
+
+    def test_oneway_road_goes_to_the_mill_it_can_drive_to(self):
+        # edge 3 from lon 0.3 to 0.4 can only be driven east, so sites past lon 0.3 cannot drive to mill 11
+        graph = RoadGraph()
+        for i in range(10):
+            qx, qy = quantize(np.array([i / 10, (i + 1) / 10]), np.array([0.05, 0.05]))
+            graph.add_edge(i, np.column_stack((qx, qy)), 0, 2, 1.0, 0.02, direction=1 if i == 3 else 0)
+        polygons, _, edge_owners = NetworkCatchments(graph, "Length", cell_size=0.05).catchments(self.mills, self.bbox)
+        self.assertEqual(edge_owners, {i: 11 if i < 3 else 12 for i in range(10)})
+        envelopes = {mill: ogr.CreateGeometryFromWkb(wkb).GetEnvelope() for mill, wkb in polygons.items()}
+        # the split moves from the midpoint to the start of the one-way road
+        self.assertLessEqual(envelopes[11][1], 0.35 + 1e-9)
+        self.assertGreaterEqual(envelopes[12][0], 0.3 - 1e-9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+########################################################################################################################
+# test_regression.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the closed form circuity regressions in regression.py
+########################################################################################################################
+
+import unittest
+import sys, os
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+import regression
+
+class TestRegression(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = 1 + 80 * rng.random(300)
+        self.y = 4 + 1.3 * self.x + 0.002 * self.x ** 2 + rng.normal(0, 3, 300)
+
+    def test_matches_least_squares(self):
+        b1, b2, b3 = regression.coefficients_from_sums(regression.regression_sums(self.x, self.y))
+        ones = np.ones_like(self.x)
+        quadratic = np.linalg.lstsq(np.column_stack((ones, self.x, self.x ** 2)), self.y, rcond=None)[0]
+        linear = np.linalg.lstsq(np.column_stack((ones, self.x)), self.y, rcond=None)[0]
+        self.assertAlmostEqual(float(b1), quadratic[1], places=8)
+        self.assertAlmostEqual(float(b2), linear[1], places=8)
+        self.assertAlmostEqual(float(b3), self.x @ self.y / (self.x @ self.x), places=12)
+
+    def test_vectorized_over_replicates(self):
+        idx = np.random.default_rng(1).integers(0, 300, size=(4, 300))
+        b1, b2, b3 = regression.coefficients_from_sums(regression.regression_sums(self.x[idx], self.y[idx]))
+        for i in range(4):
+            x, y = self.x[idx[i]], self.y[idx[i]]
+            self.assertAlmostEqual(b3[i], x @ y / (x @ x))
+            self.assertAlmostEqual(b2[i], np.polyfit(x, y, 1)[0])
+            self.assertAlmostEqual(b1[i], np.polyfit(x, y, 2)[1])
+
+    def test_standard_errors_and_r_squared(self):
+        fits = regression.fit_models(regression.regression_sums(self.x, self.y))
+        ones = np.ones_like(self.x)
+        designs = {
+            "quadratic": np.column_stack((ones, self.x, self.x ** 2)),
+            "linear": np.column_stack((ones, self.x)),
+            "origin": self.x[:, None]
+        }
+        for name, X in designs.items():
+            beta = np.linalg.lstsq(X, self.y, rcond=None)[0]
+            resid = self.y - X @ beta
+            sigma2 = resid @ resid / (len(self.y) - X.shape[1])
+            bse = np.sqrt(sigma2 * np.diag(np.linalg.inv(X.T @ X)))
+            total = self.y @ self.y if name == "origin" else ((self.y - self.y.mean()) ** 2).sum()
+            np.testing.assert_allclose(fits[name]["params"], beta, rtol=1e-7)
+            np.testing.assert_allclose(fits[name]["bse"], bse, rtol=1e-5)
+            self.assertAlmostEqual(float(fits[name]["rsquared"]), 1 - resid @ resid / total, places=8)
+            self.assertEqual(float(fits[name]["df_resid"]), len(self.y) - X.shape[1])
+
+    def test_grouped_sums(self):
+        groups = np.random.default_rng(2).integers(0, 5, size=300)
+        sums = regression.grouped_sums(groups, self.x, self.y, 6)
+        for group in range(5):
+            np.testing.assert_allclose(sums[group], regression.regression_sums(self.x[groups == group],
+                                                                                self.y[groups == group]))
+        np.testing.assert_array_equal(sums[5], np.zeros(len(regression.SUM_FIELDS)))
+        weights = np.arange(300) % 4 + 1.0
+        weighted = regression.grouped_sums(groups, self.x, self.y, 6, weights)
+        np.testing.assert_allclose(weighted[2], regression.regression_sums(self.x[groups == 2], self.y[groups == 2],
+                                                                           weights[groups == 2]))
+
+    def test_accumulator(self):
+        first = regression.RegressionAccumulator()
+        second = regression.RegressionAccumulator()
+        for i, (x, y) in enumerate(zip(self.x, self.y)):
+            (first if i < 100 else second).add("Pellet" if i % 2 else "Chip", x, y)
+        merged = first + second
+        self.assertEqual(merged.count("Chip") + merged.count("Pellet"), 300)
+        np.testing.assert_allclose(merged.total(), regression.regression_sums(self.x, self.y))
+        expected = regression.circuity_regressions(self.x[1::2], self.y[1::2])
+        np.testing.assert_allclose(merged.coefficients("Pellet"), expected, rtol=1e-9)
+        self.assertEqual(first.count("Pellet"), 50)
+
+        path = os.path.join(os.path.dirname(__file__), "test_sums.csv")
+        try:
+            merged.write_csv(path)
+            read = regression.RegressionAccumulator.read_csv(path)
+        finally:
+            os.remove(path)
+        np.testing.assert_array_equal(read.sums["Chip"], merged.sums["Chip"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+########################################################################################################################
+# test_result_store.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests writing and filtered reading of road distance results in result_store.py
+########################################################################################################################
+
+import unittest
+import sys, os, shutil, tempfile
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+import result_store
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_round_trip_and_filters(self):
+        with result_store.ResultWriter(self.output_dir, batch_size=2) as writer:
+            writer.add("Chip", 1, 10, 3.0, 4.5, district="A")
+            writer.add("Pellet", 2, 11, 7.0, 8.5, 0.2, "B")
+            writer.add("Chip", 3, 10, 1.0, float("nan"), status="failed")
+            writer.add("Chip", 4, 12, 2.0, 3.0, district="B", weight=2.5)
+        results = result_store.read_results(self.output_dir)
+        self.assertEqual(sorted(results["hs_oid"].tolist()), [1, 2, 4])
+        self.assertEqual(results["ed"].dtype, np.float64)
+
+        chip_b = result_store.read_results(self.output_dir, sm_type="Chip", district="B", columns=["hs_oid", "rd"])
+        self.assertEqual(set(chip_b), {"hs_oid", "rd"})
+        self.assertEqual(chip_b["hs_oid"].tolist(), [4])
+        self.assertEqual(sorted(results["weight"].tolist()), [1.0, 1.0, 2.5])
+        failed = result_store.read_results(self.output_dir, status="failed")
+        self.assertTrue(np.isnan(failed["rd"][0]))
+
+        chip = result_store.read_results(self.output_dir, sm_type="Chip", columns=["rd"])
+        self.assertEqual(sorted(chip["rd"].tolist()), [3.0, 4.5])
+        self.assertEqual(len(result_store.read_results(self.output_dir, sm_type="Pulp/Paper")["rd"]), 0)
+
+    @unittest.skipIf(result_store.pq is None, "pyarrow is not installed")
+    def test_row_groups_hold_one_type(self):
+        with result_store.ResultWriter(self.output_dir, batch_size=3) as writer:
+            for i in range(10):
+                writer.add(["Chip", "Pellet", "Pulp/Paper"][i % 3], i, 10, 1.0, 1.5, district="AB"[i % 2])
+        metadata = result_store.pq.ParquetFile(os.path.join(self.output_dir, result_store.PARQUET_NAME)).metadata
+        type_column = [name for name, _ in result_store.SCHEMA].index("type")
+        district_column = [name for name, _ in result_store.SCHEMA].index("district")
+        self.assertEqual(metadata.num_row_groups, 4)
+        for i in range(metadata.num_row_groups):
+            statistics = metadata.row_group(i).column(type_column).statistics
+            self.assertEqual(statistics.min, statistics.max)
+        # the Chip rows are sorted by district within their row group
+        first = metadata.row_group(0).column(district_column).statistics
+        self.assertEqual((first.min, first.max), ("A", "B"))
+
+    def test_reads_legacy_csv(self):
+        with open(os.path.join(self.output_dir, "Chi_distance.csv"), "w", newline="\n") as output_file:
+            output_file.write("1,10,3.5,4.5,A\n2,11,1.5,2.0,B\n")
+        with open(os.path.join(self.output_dir, "Pel_distance.csv"), "w", newline="\n") as output_file:
+            output_file.write("3,12,2.5,3.0\n")
+        results = result_store.read_results(self.output_dir)
+        self.assertEqual(results["type"].tolist(), ["Pellet", "Chip", "Chip"])
+        self.assertEqual(results["district"].tolist(), ["", "A", "B"])
+        district_b = result_store.read_results(self.output_dir, district="B")
+        self.assertEqual(district_b["rd"].tolist(), [2.0])
+
+    def test_csv_without_weight_column(self):
+        with open(os.path.join(self.output_dir, result_store.CSV_NAME), "w", newline="\n") as output_file:
+            output_file.write("type,hs_oid,sm_oid,ed,rd,time,district,status\nChip,1,10,3.0,4.5,nan,A,ok\n")
+        results = result_store.read_results(self.output_dir, sm_type="Chip")
+        self.assertEqual(results["weight"].tolist(), [1.0])
+
+    def test_missing_results(self):
+        with self.assertRaises(FileNotFoundError):
+            result_store.read_results(self.output_dir)
+
+if __name__ == '__main__':
+    unittest.main()
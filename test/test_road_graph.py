@@ -0,0 +1,174 @@
+########################################################################################################################
+# test_road_graph.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the tiled road store and the native road graph in road_graph.py
+########################################################################################################################
+
+import unittest
+import sys, os, tempfile, shutil
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+import road_graph
+from geometry_utils import multilinestring_wkb
+from create_road_tiles import RoadTileBuilder
+from routing_backend import GraphRoutingBackend, RouteSolveError
+from route_executor import InlineExecutor, SamplingScheduler
+
+class TestRoadGraph(unittest.TestCase):
+    def setUp(self):
+        self.tile_dir = tempfile.mkdtemp()
+        builder = RoadTileBuilder(self.tile_dir, tile_size=1.0)
+        # a line of roads crossing from tile (-90, 35) into tile (-89, 35)
+        builder.add_road(1, [(-90.5, 35.5), (-90.2, 35.5)], 10.0, 0.2)
+        builder.add_road(2, [(-90.2, 35.5), (-90.1, 35.6), (-89.8, 35.5)], 20.0, 0.3)
+        builder.add_road(3, [(-89.8, 35.5), (-89.5, 35.5)], 5.0, 0.1, direction=1)
+        # the same road coming from an overlapping region
+        builder.add_road(7, [(-90.5, 35.5), (-90.2, 35.5)], 10.0, 0.2)
+        self.builder = builder
+        self.index = builder.write()
+
+    def tearDown(self):
+        shutil.rmtree(self.tile_dir)
+
+    def test_duplicate_roads_skipped(self):
+        self.assertEqual(self.builder.edge_count, 3)
+        self.assertEqual(self.builder.duplicate_count, 1)
+        self.assertEqual(sorted(map(tuple, self.index["tiles"])), [(-91, 35), (-90, 35)])
+
+    def test_duplicate_and_reversed_roads_skipped(self):
+        tile_dir = os.path.join(self.tile_dir, "dedup")
+        builder = RoadTileBuilder(tile_dir, tile_size=1.0)
+        builder.add_road(1, [(-90.5, 35.5), (-90.4, 35.6), (-90.2, 35.5)], 12.0, 0.2)
+        builder.add_road(2, [(-90.5, 35.5), (-90.4, 35.6), (-90.2, 35.5)], 12.0, 0.2)
+        builder.add_road(3, [(-90.2, 35.5), (-90.4, 35.6), (-90.5, 35.5)], 12.0, 0.2)
+        # a oneway road and the same road digitized the other way with its direction flipped
+        builder.add_road(4, [(-90.2, 35.2), (-90.5, 35.2)], 8.0, 0.1, direction=1)
+        builder.add_road(5, [(-90.5, 35.2), (-90.2, 35.2)], 8.0, 0.1, direction=-1)
+        # oneway in the opposite direction is a different road
+        builder.add_road(6, [(-90.5, 35.2), (-90.2, 35.2)], 8.0, 0.1, direction=1)
+        # same end points and length but another path
+        builder.add_road(7, [(-90.5, 35.5), (-90.4, 35.4), (-90.2, 35.5)], 12.0, 0.2)
+        builder.write()
+        self.assertEqual(builder.edge_count, 4)
+        self.assertEqual(builder.duplicate_count, 3)
+        tile = road_graph.read_tile(os.path.join(tile_dir, road_graph.tile_file_name((-91, 35))))
+        self.assertEqual(tile["source_oids"].tolist(), [1, 4, 6, 7])
+        graph = road_graph.TiledRoadGraph(tile_dir, bbox=[-90.9, 35.1, -90.1, 35.9])
+        start, _ = graph.nearest_node(-90.5, 35.2)
+        end, _ = graph.nearest_node(-90.2, 35.2)
+        self.assertAlmostEqual(graph.shortest_path(start, end)[0], 8.0)
+        self.assertAlmostEqual(graph.shortest_path(end, start)[0], 8.0)
+        # one oneway edge out of each end
+        self.assertEqual((len(graph.neighbours(start)), len(graph.neighbours(end))), (1, 1))
+
+    def test_border_tiles_loaded_during_search(self):
+        graph = road_graph.TiledRoadGraph(self.tile_dir, bbox=[-90.9, 35.1, -90.1, 35.9])
+        self.assertEqual(graph.loaded_tiles, {(-91, 35)})
+        start, _ = graph.nearest_node(-90.5, 35.5)
+        end, _ = graph.nearest_node(-89.5, 35.5)
+        cost, edges = graph.shortest_path(start, end, "Length")
+        self.assertAlmostEqual(cost, 35.0)
+        self.assertEqual([graph.edge_ids[idx] for idx in edges], [0, 1, 2])
+        self.assertIn((-90, 35), graph.loaded_tiles)
+
+    def test_nearest_node_across_tile_border(self):
+        tile_dir = os.path.join(self.tile_dir, "border")
+        builder = RoadTileBuilder(tile_dir, tile_size=1.0)
+        builder.add_road(1, [(-90.3, 35.5), (-90.05, 35.5)], 15.0, 0.2)
+        builder.add_road(2, [(-89.5, 35.5), (-89.2, 35.5)], 17.0, 0.2)
+        builder.write()
+        graph = road_graph.TiledRoadGraph(tile_dir)
+        # the point's own tile only holds the road half a degree away
+        node, dist = graph.nearest_node(-89.97, 35.5)
+        self.assertEqual(road_graph.node_coords(node), (-90.05, 35.5))
+        self.assertAlmostEqual(dist, float(road_graph.haversine_miles(-89.97, 35.5, -90.05, 35.5)))
+        self.assertEqual(graph.loaded_tiles, {(-91, 35), (-90, 35)})
+        self.assertEqual(graph.nearest_node(-89.97, 35.5, max_distance=1.0), (None, None))
+
+    def test_nearest_node_at_high_latitude(self):
+        # at 70 degrees a snapping cell is a third as wide on the ground as it is tall, so the closest node sits three
+        # rings west of the point while a farther one is in the first ring north
+        graph = road_graph.RoadGraph()
+        qx, qy = road_graph.quantize(np.array([0.0005, -0.0235]), np.array([70.0195, 70.005]))
+        graph.add_edge(0, np.column_stack((qx, qy)), 0, 2, 1.0, 0.02)
+        node, dist = graph.nearest_node(0.0005, 70.005)
+        self.assertEqual(road_graph.node_coords(node), (-0.0235, 70.005))
+        self.assertAlmostEqual(dist, float(road_graph.haversine_miles(0.0005, 70.005, -0.0235, 70.005)))
+        self.assertLess(dist, float(road_graph.haversine_miles(0.0005, 70.005, 0.0005, 70.0195)))
+
+    def test_oneway_restriction(self):
+        graph = road_graph.TiledRoadGraph(self.tile_dir, bbox=[-91.0, 35.0, -89.0, 36.0])
+        start, _ = graph.nearest_node(-89.5, 35.5)
+        end, _ = graph.nearest_node(-90.5, 35.5)
+        cost, edges = graph.shortest_path(start, end, "Time")
+        self.assertIsNone(cost)
+        cost, edges = graph.shortest_path(end, start, "Time")
+        self.assertAlmostEqual(cost, 0.6)
+
+    def test_route_geometry_rebuilt_from_edge_ids(self):
+        graph = road_graph.TiledRoadGraph(self.tile_dir, bbox=[-91.0, 35.0, -89.0, 36.0])
+        start, _ = graph.nearest_node(-89.8, 35.5)
+        end, _ = graph.nearest_node(-90.5, 35.5)
+        cost, edges = graph.shortest_path(start, end, "Length")
+        path_ids = graph.path_ids(start, edges)
+        self.assertEqual(path_ids.tolist(), [-2, -1])
+        coords = graph.route_coords(path_ids)
+        self.assertEqual(coords.round(6).tolist(),
+                         [[-89.8, 35.5], [-90.1, 35.6], [-90.2, 35.5], [-90.5, 35.5]])
+        simplified = graph.route_coords(path_ids, tolerance=0.2)
+        self.assertEqual(simplified.round(6).tolist(), [[-89.8, 35.5], [-90.5, 35.5]])
+
+        store = road_graph.RoutePathStore(graph.fingerprint)
+        store.add(path_ids, hs_oid=4, sm_oid=9)
+        store_path = os.path.join(self.tile_dir, "routes.npz")
+        store.save(store_path)
+        loaded = road_graph.RoutePathStore.load(store_path)
+        self.assertEqual(loaded.fingerprint, graph.fingerprint)
+        self.assertEqual(loaded.attributes, [{"hs_oid": 4, "sm_oid": 9}])
+        self.assertEqual(loaded.geometry(0, graph).round(6).tolist(), coords.round(6).tolist())
+
+    def test_graph_backend_with_scheduler(self):
+        sites = {"1": (-90.5, 35.5), "2": (-89.5, 35.5)}
+        mills = {"5": (-89.8, 35.5)}
+        backend = GraphRoutingBackend(sites, mills, tile_dir=self.tile_dir, districts={"1": "North"},
+                                      keep_output_paths=True)
+        backend.open()
+        executor = InlineExecutor()
+        results = []
+
+        def handle_result(task, result):
+            results.append(result)
+            return result
+
+        submit = lambda task: executor.submit(backend.solve, *task)
+        scheduler = SamplingScheduler(submit)
+        scheduler.run([("1", "5")], handle_result)
+        road_dist, district, route = results[0]
+        self.assertAlmostEqual(road_dist, 30.0)
+        self.assertEqual(district, "North")
+        self.assertAlmostEqual(route[2], 0.5)
+        # kept routes come back as their source node and edge ids, a graph without preloaded tiles rebuilds them
+        source, path_ids = route[0]
+        self.assertEqual(path_ids.tolist(), [1, 2])
+        store = road_graph.RoutePathStore()
+        store.add(path_ids, source, hs_oid=1)
+        written = []
+        writer = type("ListWriter", (), {"add": lambda self, attributes, wkb: written.append((attributes, wkb))})()
+        store.write_geopackage(writer, road_graph.TiledRoadGraph(self.tile_dir))
+        self.assertEqual(written, [({"hs_oid": 1}, multilinestring_wkb([backend.graph.route_coords(path_ids)]))])
+        self.assertEqual(backend.graph.route_coords(path_ids).round(6).tolist(),
+                         [[-90.5, 35.5], [-90.2, 35.5], [-90.1, 35.6], [-89.8, 35.5]])
+        # travel time is returned even when the route geometry is not kept
+        backend.keep_output_paths = False
+        _, _, route = backend.solve("1", "5")
+        self.assertIsNone(route[0])
+        self.assertAlmostEqual(route[2], 0.5)
+        # the only road out of site 2 is oneway away from the mill
+        backend.cost = "Time"
+        with self.assertRaises(RouteSolveError):
+            backend.solve("2", "5")
+        backend.close()
+
+if __name__ == '__main__':
+    unittest.main()
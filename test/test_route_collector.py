@@ -0,0 +1,155 @@
+########################################################################################################################
+# test_route_collector.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests routing and recording harvest site/sawmill pairs in route_collector.py with a stand-in backend
+########################################################################################################################
+
+import unittest
+import sys, os, csv, random, shutil, tempfile
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+from route_collector import RouteCollector
+from routing_backend import RoutingBackend, RouteSolveError
+from regression import circuity_regressions, RegressionAccumulator
+from result_store import read_results, ResultWriter
+from sampling import AdaptiveStoppingRule
+
+class FakeBackend(RoutingBackend):
+    """Looks road distances up in a dictionary. Solves run in worker processes, so they are logged to a file."""
+
+    def __init__(self, distances, districts, log_path):
+        self.distances = distances
+        self.districts = districts
+        self.log_path = log_path
+
+    @property
+    def solved(self):
+        if not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path, "r") as log_file:
+            return [tuple(line.split()) for line in log_file]
+
+    def solve(self, hs_oid, sm_oid):
+        with open(self.log_path, "a") as log_file:
+            log_file.write(f"{hs_oid} {sm_oid}\n")
+        if (hs_oid, sm_oid) not in self.distances:
+            raise RouteSolveError("Solve resulted in a failure")
+        road_dist = self.distances[(hs_oid, sm_oid)]
+        return road_dist, self.districts.get(hs_oid, ""), (None, road_dist, road_dist / 50)
+
+class TestRouteCollector(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.sl_dist_csv = os.path.join(self.output_dir, "sl_distances.csv")
+        distances = {}
+        rng = random.Random(5)
+        with open(self.sl_dist_csv, "w", newline="\n") as output_file:
+            out_writer = csv.writer(output_file)
+            for site in range(1, 41):
+                ed = 5.0 + site
+                # odd sites share their chip mill with pellet, even sites have a separate pellet mill
+                for sm_type, mill in (("Chip", "10"), ("Pellet", "10" if site % 2 else "11")):
+                    out_writer.writerow([sm_type, str(site), mill, ed])
+                    distances[(str(site), mill)] = ed * rng.uniform(1.25, 1.35)
+        # one pair without a route and one too long
+        del distances[("7", "10")]
+        distances[("8", "10")] = 150.0
+        self.districts = {str(site): "North" if site <= 20 else "South" for site in range(1, 41)}
+        self.backend = FakeBackend(distances, self.districts, os.path.join(self.output_dir, "solved.txt"))
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def collector(self, pairs_per_type):
+        collector = RouteCollector(
+            self.backend,
+            self.sl_dist_csv,
+            self.output_dir,
+            pairs_per_type,
+            record_district=True,
+            districts=self.districts
+        )
+        collector.print_arc = lambda string, warning=False: None
+        collector.read_sl_distance_csv()
+        collector.collect_road_distances()
+        return collector
+
+    def test_all_sites_solve_each_pair_once(self):
+        collector = self.collector("All")
+        self.assertEqual(len(self.backend.solved), 60)
+        self.assertEqual(len(set(self.backend.solved)), 60)
+        self.assertEqual(collector.pair_results, {})
+        self.assertEqual(collector.calc_counts["Chip"], 38)
+        self.assertEqual(collector.calc_counts["Pellet"], 39)
+        self.assertEqual(collector.dist_fail_counts["Chip"], 1)
+        self.assertEqual(collector.con_fail_counts["All"], 2)
+
+        results = read_results(self.output_dir)
+        self.assertEqual(len(results["rd"]), 77)
+        np.testing.assert_allclose(results["time"], results["rd"] / 50)
+        self.assertEqual(len(read_results(self.output_dir, status="failed")["hs_oid"]), 3)
+        chip = read_results(self.output_dir, sm_type="Chip")
+        self.assertAlmostEqual(collector.type_sums.coefficients("Chip")[2],
+                               circuity_regressions(chip["ed"], chip["rd"])[2])
+        self.assertEqual(sorted(collector.district_sums.sums), ["North", "South"])
+        saved = RegressionAccumulator.read_csv(os.path.join(self.output_dir, "type_regression_sums.csv"))
+        np.testing.assert_allclose(saved.sums["Pellet"], collector.type_sums.sums["Pellet"])
+
+    def test_sampling_reuses_shared_pairs(self):
+        random.seed(2)
+        collector = self.collector(30)
+        self.assertEqual(len(self.backend.solved), len(set(self.backend.solved)))
+        # only pairs shared by chip and pellet are kept, as (road distance, route holding only the time) or the error
+        # message
+        for (hs_oid, sm_oid), cached in collector.pair_results.items():
+            self.assertEqual(sm_oid, "10")
+            self.assertTrue(int(hs_oid) % 2)
+            if hs_oid == "7":
+                self.assertEqual(cached, "Solve resulted in a failure")
+            else:
+                self.assertEqual(cached, (self.backend.distances[(hs_oid, sm_oid)],
+                                          (None, None, self.backend.distances[(hs_oid, sm_oid)] / 50)))
+        # pellet is sampled before chip, chip takes the shared pairs pellet already solved from the cache
+        chip = read_results(self.output_dir, sm_type="Chip")
+        self.assertGreaterEqual(len(chip["rd"]), 30)
+        reused = [hs_oid for hs_oid in chip["hs_oid"].tolist() if (str(hs_oid), "10") in collector.pair_results]
+        self.assertTrue(reused)
+        # routes taken from the cache keep their time and district
+        np.testing.assert_allclose(chip["time"], chip["rd"] / 50)
+        self.assertEqual(chip["district"].tolist(), [self.districts[str(hs_oid)] for hs_oid in chip["hs_oid"]])
+        all_rows = read_results(self.output_dir, status=None)
+        self.assertLess(len(self.backend.solved), len(all_rows["hs_oid"]))
+
+    def test_kept_route_written_for_every_type_sharing_a_pair(self):
+        collector = RouteCollector(self.backend, self.sl_dist_csv, self.output_dir, 30, keep_output_paths=True)
+        collector.print_arc = lambda string, warning=False: None
+        collector.read_sl_distance_csv()
+        written = []
+        collector.route_writer = type("ListWriter", (), {"add": lambda self, *feature: written.append(feature)})()
+        collector.result_writer = ResultWriter(self.output_dir)
+        # site 1 shares mill 10 between chip and pellet, the graph backend returns kept routes as edge ids
+        task = ("1", "10")
+        path = (5, np.array([3, -4], dtype=np.int64))
+        result = ("ok", 7.0, "", (path, 6.5, 0.14))
+        collector.handle_sampled_route("Pellet", AdaptiveStoppingRule(30), task, result)
+        cached = collector.submit_pair(task).result()
+        self.assertEqual(cached[3][0], path)
+        collector.handle_sampled_route("Chip", AdaptiveStoppingRule(30), task, cached)
+        collector.result_writer.close()
+        self.assertEqual([attributes["type"] for attributes in collector.route_paths.attributes], ["Pellet", "Chip"])
+        self.assertEqual(collector.route_paths.sources, [5, 5])
+        self.assertEqual([ids.tolist() for ids in collector.route_paths.paths], [[3, -4], [3, -4]])
+        self.assertEqual(collector.route_paths.attributes[1]["length"], 6.5)
+        # WKB routes from the ArcGIS backend are written straight away for both types
+        task = ("3", "10")
+        result = ("ok", 9.0, "", (b"wkb", 8.5, 0.2))
+        collector.result_writer = ResultWriter(self.output_dir)
+        collector.handle_sampled_route("Pellet", AdaptiveStoppingRule(30), task, result)
+        collector.handle_sampled_route("Chip", AdaptiveStoppingRule(30), task, collector.submit_pair(task).result())
+        collector.result_writer.close()
+        self.assertEqual([(attributes["type"], wkb) for attributes, wkb in written],
+                         [("Pellet", b"wkb"), ("Chip", b"wkb")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+########################################################################################################################
+# test_route_executor.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the batch sampling scheduler in route_executor.py
+########################################################################################################################
+
+import unittest
+import sys, os, random, shutil, tempfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+from route_executor import InlineExecutor, RecyclingProcessPool, SamplingScheduler
+from sampling import AdaptiveStoppingRule
+
+def solve(task):
+    """Stand-in route solve, every seventh route fails"""
+    if task % 7 == 0:
+        return None
+    return 1.0 + (task * 37 % 101) / 50
+
+def crash_once(marker, value):
+    """Kills its worker process the first time it runs"""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return value
+
+def crash():
+    os._exit(1)
+
+class TestSamplingScheduler(unittest.TestCase):
+    def run_sampling(self, executor, workers):
+        accepted = []
+
+        def handle_result(task, result):
+            if result is not None:
+                accepted.append(task)
+            return result
+
+        rule = AdaptiveStoppingRule(30)
+        tasks = random.Random(3).sample(range(1, 2000), 1999)
+        scheduler = SamplingScheduler(lambda task: executor.submit(solve, task), workers)
+        scheduler.run(tasks, handle_result, rule)
+        return accepted, rule
+
+    def test_parallel_sample_matches_sequential(self):
+        sequential, sequential_rule = self.run_sampling(InlineExecutor(), 1)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            parallel, parallel_rule = self.run_sampling(executor, 4)
+        self.assertTrue(sequential_rule.done())
+        self.assertEqual(sequential, parallel)
+        self.assertAlmostEqual(sequential_rule.stats.mean, parallel_rule.stats.mean)
+
+    def test_runs_all_tasks_without_stopping_rule(self):
+        results = []
+        scheduler = SamplingScheduler(lambda task: InlineExecutor().submit(solve, task), 3)
+        solved = scheduler.run(range(1, 50), lambda task, result: results.append(task) or result)
+        self.assertEqual(results, list(range(1, 50)))
+        self.assertEqual(solved, 49 - 7)
+
+class TestRecyclingProcessPool(unittest.TestCase):
+    def test_pool_recycled_after_task_limit(self):
+        pool = RecyclingProcessPool(2, max_tasks=4)
+        try:
+            scheduler = SamplingScheduler(lambda task: pool.submit(solve, task), 2)
+            results = []
+            scheduler.run(range(1, 20), lambda task, result: results.append(result) or result)
+        finally:
+            pool.shutdown()
+        self.assertEqual(results, [solve(task) for task in range(1, 20)])
+        self.assertGreaterEqual(pool.recycle_count, 4)
+
+    def test_pool_recycled_over_memory_limit(self):
+        pool = RecyclingProcessPool(1, max_rss_mb=0.001)
+        try:
+            first = pool.submit(solve, 1).result()
+            second = pool.submit(solve, 2).result()
+        finally:
+            pool.shutdown()
+        self.assertEqual((first, second), (solve(1), solve(2)))
+        if pool.peak_rss_mb:
+            self.assertEqual(pool.recycle_count, 1)
+
+    def test_broken_pool_rebuilt_and_tasks_resubmitted(self):
+        marker_dir = tempfile.mkdtemp()
+        pool = RecyclingProcessPool(2)
+        try:
+            futures = [pool.submit(solve, task) for task in range(1, 6)]
+            futures.append(pool.submit(crash_once, os.path.join(marker_dir, "crashed"), "solved"))
+            futures += [pool.submit(solve, task) for task in range(6, 12)]
+            results = [future.result(timeout=60) for future in futures]
+        finally:
+            pool.shutdown()
+            shutil.rmtree(marker_dir)
+        self.assertEqual(results, [solve(task) for task in range(1, 6)] + ["solved"] +
+                         [solve(task) for task in range(6, 12)])
+        self.assertGreaterEqual(pool.broken_count, 1)
+
+    def test_task_that_always_crashes_gives_up(self):
+        pool = RecyclingProcessPool(1, max_retries=1)
+        try:
+            with self.assertRaises(BrokenProcessPool):
+                pool.submit(crash).result(timeout=60)
+            # the pool keeps working after giving up on the task
+            self.assertEqual(pool.submit(solve, 3).result(timeout=60), solve(3))
+        finally:
+            pool.shutdown()
+        self.assertEqual(pool.broken_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
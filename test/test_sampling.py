@@ -0,0 +1,78 @@
+########################################################################################################################
+# test_sampling.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the streaming statistics used for adaptive sampling in sampling.py
+########################################################################################################################
+
+import unittest
+import sys, os, random
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+import sampling
+
+class TestSampling(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [rng.uniform(1.0, 2.0) for _ in range(500)]
+
+    def test_running_stats_match_numpy(self):
+        stats = sampling.RunningStats()
+        for value in self.values:
+            stats.update(value)
+        self.assertAlmostEqual(stats.mean, np.mean(self.values))
+        self.assertAlmostEqual(stats.std, np.std(self.values))
+
+    def test_merge(self):
+        first = sampling.RunningStats()
+        second = sampling.RunningStats()
+        for value in self.values[:120]:
+            first.update(value)
+        for value in self.values[120:]:
+            second.update(value)
+        first.merge(second)
+        self.assertEqual(first.count, len(self.values))
+        self.assertAlmostEqual(first.variance, np.var(self.values))
+
+    def test_stopping_rule(self):
+        rule = sampling.AdaptiveStoppingRule(30)
+        count = 0
+        for value in self.values:
+            if rule.done():
+                break
+            rule.update(value)
+            count += 1
+        std = np.std(self.values[:count])
+        self.assertGreaterEqual(count, 30)
+        self.assertGreaterEqual(count, sampling.required_sample_size(std))
+        # one sample earlier the rule was not yet satisfied
+        previous = max(30, sampling.required_sample_size(np.std(self.values[:count - 1])))
+        self.assertLess(count - 1, previous)
+
+    def test_group_stats(self):
+        groups = np.arange(len(self.values)) % 3
+        counts, means, stds = sampling.group_stats(groups, self.values, 4)
+        for group in range(3):
+            values = np.array(self.values)[groups == group]
+            self.assertEqual(counts[group], len(values))
+            self.assertAlmostEqual(means[group], values.mean())
+            self.assertAlmostEqual(stds[group], values.std())
+        self.assertEqual((counts[3], means[3], stds[3]), (0, 0, 0))
+
+    def test_neyman_allocation(self):
+        # proportional to size times standard deviation
+        np.testing.assert_array_equal(sampling.neyman_allocation([100, 100, 200], [0.2, 0.1, 0.1], 40), [16, 8, 16])
+        # a stratum is never sampled beyond its size and strata without spread still get one sample
+        np.testing.assert_array_equal(sampling.neyman_allocation([5, 100, 50], [3.0, 0.1, 0.0], 20), [5, 14, 1])
+        self.assertEqual(sampling.neyman_allocation([5, 7], [1.0, 1.0], 100).tolist(), [5, 7])
+
+    def test_stratified_sample(self):
+        groups = np.arange(len(self.values)) % 4
+        drawn = sampling.stratified_sample(groups, [10, 0, 3, 125], np.random.default_rng(0))
+        self.assertEqual([len(indices) for indices in drawn], [10, 0, 3, 125])
+        for group, indices in enumerate(drawn):
+            self.assertTrue((groups[indices] == group).all())
+            self.assertEqual(len(set(indices.tolist())), len(indices))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+########################################################################################################################
+# test_service_area.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the native service areas in service_area.py
+########################################################################################################################
+
+import unittest
+import sys, os, tempfile, shutil
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+from road_graph import RoadGraph, quantize
+from service_area import ServiceAreaSolver, convex_hull, partial_line
+from isochrone_cache import IsochroneCache
+
+def add_road(graph, edge_id, coords, length, time=0.1):
+    qx, qy = quantize(np.array([c[0] for c in coords]), np.array([c[1] for c in coords]))
+    graph.add_edge(edge_id, np.column_stack((qx, qy)), 0, len(coords), length, time)
+
+class TestServiceArea(unittest.TestCase):
+    def setUp(self):
+        # a cross of four 10 mile roads meeting at (0, 0)
+        self.graph = RoadGraph()
+        for edge_id, end in enumerate([(1, 0), (0, 1), (-1, 0), (0, -1)]):
+            add_road(self.graph, edge_id, [(0, 0), end], 10.0)
+
+    def test_partial_line(self):
+        coords = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0]])
+        self.assertEqual(partial_line(coords, 0.75).tolist(), [[0, 0], [1, 0], [1, 0.5]])
+
+    def test_convex_hull(self):
+        points = np.array([[0, 0], [2, 0], [2, 2], [0, 2], [1, 1], [1, 0]])
+        ring = convex_hull(points)
+        self.assertEqual(ring.tolist(), [[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]])
+
+    def test_cutoffs_share_one_search(self):
+        solver = ServiceAreaSolver(self.graph)
+        calls = []
+        search = solver.search
+        solver.search = lambda start, max_cutoff: calls.append(max_cutoff) or search(start, max_cutoff)
+        areas = solver.solve(0.001, 0.001, [10, 5], hull="convex")
+        self.assertEqual(calls, [10])
+        self.assertEqual([cutoff for cutoff, _ in areas], [5, 10])
+        small = areas[0][1][0][0]
+        large = areas[1][1][0][0]
+        self.assertAlmostEqual(np.abs(small[:, 0]).max(), 0.5)
+        self.assertAlmostEqual(np.abs(large[:, 0]).max(), 1.0)
+
+    def test_cached_breaks_skip_search(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            self.graph.fingerprint = "test"
+            cache = IsochroneCache(os.path.join(cache_dir, "cache.sqlite"))
+            solver = ServiceAreaSolver(self.graph, cache=cache)
+            calls = []
+            search = solver.search
+            solver.search = lambda start, max_cutoff: calls.append(max_cutoff) or search(start, max_cutoff)
+            first = solver.solve(0.001, 0.001, [5, 10], hull="convex")
+            # a nearby point on the same node asking for a subset of the breaks
+            cached = solver.solve(0.002, 0.0, [10], hull="convex")
+            solver.solve(0.001, 0.001, [5, 8], hull="convex")
+            cache.close()
+        finally:
+            shutil.rmtree(cache_dir)
+        self.assertEqual(calls, [10, 8])
+        self.assertEqual(cached[0][1][0][0].tolist(), first[1][1][0][0].tolist())
+
+if __name__ == '__main__':
+    unittest.main()
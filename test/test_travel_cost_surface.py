@@ -0,0 +1,76 @@
+########################################################################################################################
+# test_travel_cost_surface.py
+# Author: James Jin
+# unity ID: cjjin
+# Purpose: Tests the gridded travel cost surface in travel_cost_surface.py
+########################################################################################################################
+
+import unittest
+import sys, os
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "analysis")))
+from road_graph import RoadGraph, quantize
+from travel_cost_surface import TravelCostSurface, shift
+
+class TestTravelCostSurface(unittest.TestCase):
+    def setUp(self):
+        # one east-west road along lat 0.05 from lon 0 to 1 split into 0.1 degree edges of 1 mile each
+        self.graph = RoadGraph()
+        for i in range(10):
+            qx, qy = quantize(np.array([i / 10, (i + 1) / 10]), np.array([0.05, 0.05]))
+            self.graph.add_edge(i, np.column_stack((qx, qy)), 0, 2, 1.0, 0.02)
+        self.bbox = [0.0, 0.0, 1.0, 0.1]
+        self.mills = {11: (0.0, 0.05), 12: (1.0, 0.05)}
+
+    def test_shift(self):
+        grid = np.arange(4).reshape(2, 2)
+        self.assertEqual(shift(grid, 0, 1, -1).tolist(), [[-1, 0], [-1, 2]])
+
+    def test_nearest_mill_costs(self):
+        surface = TravelCostSurface(self.graph, "Length", cell_size=0.05, max_connector=10)
+        cost_grid, owner_grid = surface.surface(self.mills, self.bbox)
+        self.assertEqual(cost_grid.shape, (2, 20))
+        self.assertTrue(np.isfinite(cost_grid).all())
+        # cost rises towards the middle of the road and each half belongs to its closest mill
+        self.assertLess(cost_grid[1, 0], cost_grid[1, 8])
+        self.assertEqual(owner_grid[1, :9].tolist(), [11] * 9)
+        self.assertEqual(owner_grid[1, 11:].tolist(), [12] * 9)
+        self.assertEqual(owner_grid[0, 0], 11)
+
+    def test_edge_owners(self):
+        surface = TravelCostSurface(self.graph, "Length", cell_size=0.05)
+        labels, owners = surface.search(self.mills)
+        edge_owners = surface.edge_owners(labels, owners)
+        # the road is split at its midpoint, each edge going to the mill of its cheaper end
+        self.assertEqual([edge_owners[idx] for idx in range(10)], [11] * 5 + [12] * 5)
+
+    def test_oneway_costs_towards_mill(self):
+        # a short one-way road from the mill to node B and a longer two-way detour back
+        graph = RoadGraph()
+        qx, qy = quantize(np.array([0.0, 0.1]), np.array([0.05, 0.05]))
+        graph.add_edge(0, np.column_stack((qx, qy)), 0, 2, 1.0, 0.02, direction=1)
+        qx, qy = quantize(np.array([0.0, 0.05, 0.1]), np.array([0.05, 0.09, 0.05]))
+        graph.add_edge(1, np.column_stack((qx, qy)), 0, 3, 5.0, 0.1)
+        node_b = max(graph.adj)
+        surface = TravelCostSurface(graph, "Length", cell_size=0.05)
+        labels, _ = surface.search({11: (0.0, 0.05)})
+        # driving from B to the mill has to take the detour, only the way out of the mill is 1 mile
+        self.assertAlmostEqual(labels[node_b], 5.0)
+        self.assertAlmostEqual(graph.search({min(graph.adj): 0.0})[0][node_b], 1.0)
+        # points on the one-way road can only be driven on through B, so they cost more than B itself
+        lon, lat, costs, _ = surface.edge_samples(labels, {node: 11 for node in labels})
+        on_one_way = np.isclose(lat, 0.05) & (lon > 0.0) & (lon < 0.1)
+        self.assertTrue(on_one_way.any())
+        self.assertTrue((costs[on_one_way] > 5.0).all())
+
+    def test_connector_limit(self):
+        surface = TravelCostSurface(self.graph, "Length", cell_size=0.05, max_connector=0.1)
+        cost_grid, owner_grid = surface.surface({11: (0.0, 0.05)}, [0.0, -1.0, 1.0, 0.1])
+        # only the cells holding the road are reached, the rest are farther than the connector limit
+        self.assertTrue(np.isfinite(cost_grid[1]).all())
+        self.assertTrue(np.isinf(cost_grid[0]).all())
+        self.assertTrue(np.isinf(cost_grid[2:]).all())
+        self.assertEqual(owner_grid[2, 0], -1)
+
+if __name__ == '__main__':
+    unittest.main()